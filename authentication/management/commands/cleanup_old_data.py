@@ -9,6 +9,7 @@
 警告：此操作不可逆，请谨慎使用！建议先使用 --dry-run 预览。
 """
 import os
+import shutil
 import logging
 from datetime import timedelta
 from django.core.management.base import BaseCommand
@@ -292,6 +293,19 @@ class Command(BaseCommand):
                     self.style.WARNING(f'     ⚠️  文件删除失败: {file_path} - {str(e)}')
                 )
 
+        # 段落音频下载缓存（音频拼接时生成）、解码 PCM 缓存（视频合成时生成）
+        for cache in ('segment_cache', 'pcm_cache'):
+            shutil.rmtree(
+                os.path.join(settings.MEDIA_ROOT, 'audio', cache, str(project.id)),
+                ignore_errors=True
+            )
+        # 时间窗口预览视频、HLS 分片、多语言视频
+        for subdir in ('preview', 'hls', 'multilang'):
+            shutil.rmtree(
+                os.path.join(settings.MEDIA_ROOT, 'videos', subdir, str(project.id)),
+                ignore_errors=True
+            )
+
     def _get_file_size(self, file_path):
         """获取文件大小（字节）"""
         try:
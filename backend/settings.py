@@ -296,6 +296,51 @@ AUTH_USER_MODEL = 'authentication.User'
 # 批量翻译请求间隔（秒），控制API调用频率以避免过载
 BATCH_TRANSLATE_REQUEST_INTERVAL = 1.0  # 默认每秒1个请求
 
+# 内部音频工作格式（拼接音频、两步合成的混合音频等中间产物）：flac / wav / mp3
+# 中间产物使用无损格式，只在最终交付（视频AAC音轨）时编码一次
+AUDIO_WORKING_FORMAT = os.getenv('AUDIO_WORKING_FORMAT', 'flac')
+
+# 重任务资源准入控制（人声分离 / 人脸检测 / 视频合成）
+# 容量取自容器cgroup限制，预留部分内存给gunicorn等常驻进程
+ADMISSION_MEMORY_RESERVE_GB = float(os.getenv('ADMISSION_MEMORY_RESERVE_GB', '1.5'))
+ADMISSION_LEDGER_PATH = os.getenv('ADMISSION_LEDGER_PATH', '/tmp/minimax_dubbing_admission.json')
+
+# 常驻 Demucs 模型服务 socket（manage.py run_separation_server）；服务未运行时人声分离回退为命令行方式
+SEPARATION_SERVER_SOCKET = os.getenv('SEPARATION_SERVER_SOCKET', '/tmp/minimax_dubbing_separation.sock')
+
+# 分块人声分离：按窗口（秒）逐段推理并重叠交叉淡化，峰值内存与音频时长无关；设为0时整段推理
+SEPARATION_CHUNK_SECONDS = float(os.getenv('SEPARATION_CHUNK_SECONDS', '60')) or None
+SEPARATION_OVERLAP_SECONDS = float(os.getenv('SEPARATION_OVERLAP_SECONDS', '5'))
+# 分块窗口的并行工作进程数（每个进程各加载一份模型）；0 表示按容器 CPU 配额和可用内存自动确定
+SEPARATION_WORKERS = int(os.getenv('SEPARATION_WORKERS', '0'))
+
+# 人声分离结果缓存（按提取音频内容哈希 + 模型参数寻址，LRU 淘汰）；磁盘预算为0时禁用
+SEPARATION_CACHE_DIR = os.getenv('SEPARATION_CACHE_DIR', str(MEDIA_ROOT / 'cache' / 'separation'))
+SEPARATION_CACHE_MAX_GB = float(os.getenv('SEPARATION_CACHE_MAX_GB', '20'))
+
+# 人声分离质量档位：fast / balanced / best，auto 按音频时长、排队任务数和项目截止时间自动选择
+# 未设置截止时间时，时间预算为 音频时长 × SEPARATION_TIME_BUDGET_RATIO
+SEPARATION_PROFILE = os.getenv('SEPARATION_PROFILE', 'auto')
+SEPARATION_TIME_BUDGET_RATIO = float(os.getenv('SEPARATION_TIME_BUDGET_RATIO', '1.5'))
+
+# 语音区间分离：只对字幕段落（前后各加余量秒数）运行Demucs，其余部分原音直通到背景音
+SEPARATION_SPEECH_ONLY = os.getenv('SEPARATION_SPEECH_ONLY', 'False').lower() == 'true'
+SEPARATION_SPEECH_PADDING = float(os.getenv('SEPARATION_SPEECH_PADDING', '1.0'))
+
+# ASR 上传音频格式：上传前下混为单声道、重采样到16kHz并编码（mp3 / opus / wav），original 表示上传原文件
+ASR_UPLOAD_FORMAT = os.getenv('ASR_UPLOAD_FORMAT', 'mp3')
+# 长音频分块识别：按静音切分为不超过该时长（秒）的块并发识别；设为0时整段识别
+ASR_CHUNK_SECONDS = float(os.getenv('ASR_CHUNK_SECONDS', '240'))
+ASR_MAX_CONCURRENCY = int(os.getenv('ASR_MAX_CONCURRENCY', '4'))
+
+# 时间窗口预览渲染：最长窗口（秒）、起点对齐关键帧的最大提前量（秒，超过则重新编码视频）、排队超时（秒）
+PREVIEW_MAX_WINDOW_SECONDS = int(os.getenv('PREVIEW_MAX_WINDOW_SECONDS', '120'))
+PREVIEW_KEYFRAME_TOLERANCE = float(os.getenv('PREVIEW_KEYFRAME_TOLERANCE', '2.0'))
+PREVIEW_ADMISSION_TIMEOUT = 30
+
+# HLS 打包分片时长（秒），实际按关键帧切分
+HLS_SEGMENT_SECONDS = int(os.getenv('HLS_SEGMENT_SECONDS', '6'))
+
 # Celery配置
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
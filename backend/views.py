@@ -9,6 +9,10 @@ from django.http import FileResponse, Http404, HttpResponse
 from django.views.decorators.http import require_http_methods
 from ranged_response import RangedFileResponse
 
+# HLS 播放列表和 fMP4 分片（mimetypes 默认不识别）
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/iso.segment', '.m4s')
+
 
 @require_http_methods(["GET", "HEAD"])
 def serve_media_with_range(request, path):
@@ -65,8 +69,11 @@ def serve_media_with_range(request, path):
     filename = os.path.basename(file_path)
     response['Content-Disposition'] = f'inline; filename="{filename}"'
 
-    # 添加缓存控制
-    response['Cache-Control'] = 'public, max-age=3600'
+    # 添加缓存控制：HLS 目录按版本命名、内容不变，可长期缓存
+    if path.startswith('videos/hls/'):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
 
     # 声明支持 Range 请求
     response['Accept-Ranges'] = 'bytes'
@@ -1,5 +1,6 @@
 import { ref } from 'vue'
 import api from '../utils/api'
+import { waitForMediaJob, describeMediaJob } from '../utils/mediaJob'
 import { ElMessage, ElMessageBox, ElLoading } from 'element-plus'
 import type { Segment } from './useProjectData'
 
@@ -74,18 +75,24 @@ export function useAudioOperations(projectId: number) {
         background: 'rgba(0, 0, 0, 0.7)'
       })
 
-      const response = await api.post(`/projects/${projectId}/concatenate_audio/`)
-      concatenatedAudioUrl.value = response.data.audio_url
-      audioKey.value++
-
-      ElMessage.success('音频合成完成')
-      console.log('音频合成完成', { audioUrl: response.data.audio_url })
+      try {
+        // 拼接由后台媒体worker执行，提交后轮询任务状态
+        const response = await api.post(`/projects/${projectId}/concatenate_audio/`)
+        const result = await waitForMediaJob(projectId, response.data.task_id, (job) => {
+          loadingInstance.setText(`正在合成音频：${describeMediaJob(job)}`)
+        })
+        concatenatedAudioUrl.value = result.audio_url
+        audioKey.value++
 
-      loadingInstance.close()
-      return response.data
-    } catch (error) {
+        ElMessage.success('音频合成完成')
+        console.log('音频合成完成', { audioUrl: result.audio_url })
+        return result
+      } finally {
+        loadingInstance.close()
+      }
+    } catch (error: any) {
       console.error('音频合成失败', error)
-      ElMessage.error('音频合成失败')
+      ElMessage.error(error.response?.data?.error || error.message || '音频合成失败')
       throw error
     }
   }
@@ -117,7 +124,7 @@ export function useAudioOperations(projectId: number) {
     try {
       const link = document.createElement('a')
       link.href = audioUrl
-      link.download = filename || 'audio.mp3'
+      link.download = filename || audioUrl.split('/').pop()?.split('?')[0] || 'audio.mp3'
       document.body.appendChild(link)
       link.click()
       document.body.removeChild(link)
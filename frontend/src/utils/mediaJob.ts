@@ -0,0 +1,62 @@
+import api from './api'
+
+/**
+ * 媒体任务（音频拼接、视频合成、ASR识别）状态
+ */
+export interface MediaJobStatus {
+  success: boolean
+  task_id: string
+  task_type: string
+  status: 'pending' | 'running' | 'completed' | 'failed' | 'cancelled' | 'timeout'
+  current_step: string
+  progress: number
+  queue_position: number
+  result: Record<string, any>
+  error: string
+}
+
+const FINISHED_STATUSES = ['completed', 'failed', 'cancelled', 'timeout']
+
+/**
+ * 等待媒体worker执行完成
+ *
+ * 提交接口返回 task_id 后轮询 media_job_status，完成时返回任务结果，失败或取消时抛出错误。
+ *
+ * @param projectId 项目ID
+ * @param taskId 提交接口返回的 task_id
+ * @param onProgress 进度回调（排队位置、当前步骤）
+ * @param intervalMs 轮询间隔（毫秒）
+ */
+export const waitForMediaJob = async (
+  projectId: number | string,
+  taskId: string,
+  onProgress?: (status: MediaJobStatus) => void,
+  intervalMs = 2000
+): Promise<Record<string, any>> => {
+  while (true) {
+    const response = await api.get(`/projects/${projectId}/media_job_status/`, {
+      params: { task_id: taskId }
+    })
+    const job: MediaJobStatus = response.data
+    onProgress?.(job)
+
+    if (FINISHED_STATUSES.includes(job.status)) {
+      if (job.status === 'completed') {
+        return job.result
+      }
+      throw new Error(job.error || (job.status === 'cancelled' ? '任务已取消' : '任务执行失败'))
+    }
+
+    await new Promise(resolve => setTimeout(resolve, intervalMs))
+  }
+}
+
+/**
+ * 媒体任务进度提示文本
+ */
+export const describeMediaJob = (job: MediaJobStatus): string => {
+  if (job.status === 'pending') {
+    return job.queue_position > 1 ? `排队中（前面还有 ${job.queue_position - 1} 个任务）...` : '等待处理...'
+  }
+  return job.current_step || '处理中...'
+}
@@ -0,0 +1,107 @@
+"""
+媒体worker进程
+
+从数据库认领并执行媒体任务（音频拼接、视频合成、ASR识别），与gunicorn请求进程分离：
+- 每个worker进程同一时间只执行一个任务，吞吐量通过增加进程数扩展（supervisord numprocs）
+- worker身份默认取 supervisord 的进程名，重启后会把自己上次未完成的任务重新放回队列
+- 收到 SIGTERM/SIGINT 时中止当前任务并放回队列，由其他worker或重启后的自己继续执行
+"""
+import os
+import signal
+import socket
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from projects.media_jobs import WORKER_SHUTDOWN_REASON, claim_next_job, requeue_orphaned_jobs, run_media_job
+from services.utils.cancellation import cancellation_registry
+
+
+class Command(BaseCommand):
+    help = '启动媒体worker进程，执行音频拼接、视频合成、ASR识别任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            help='worker标识（默认使用supervisord进程名，或 主机名:进程号）'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='队列为空时的轮询间隔（秒，默认1）'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='执行完队列中的一个任务后退出（调试用）'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = (
+            options['worker_id']
+            or os.getenv('SUPERVISOR_PROCESS_NAME')
+            or f"{socket.gethostname()}:{os.getpid()}"
+        )
+        poll_interval = options['poll_interval']
+        stopping = threading.Event()
+        current = {'task_id': None}
+
+        wakeup_read, wakeup_write = os.pipe()
+
+        def shutdown(signum, frame):
+            # 信号处理函数只写管道：取消要获取锁并执行回调（终止子进程组、关闭socket），
+            # 主线程被信号打断时可能正持有同一把锁，在这里执行会死锁
+            try:
+                os.write(wakeup_write, b'x')
+            except OSError:
+                pass
+
+        def shutdown_watcher():
+            os.read(wakeup_read, 1)
+            self.stdout.write(self.style.WARNING(f'[{worker_id}] 收到停止信号，正在退出...'))
+            stopping.set()
+            task_id = current['task_id']
+            # 任务刚认领、令牌尚未创建时重试，直到取消成功或任务已结束
+            while task_id and current['task_id'] == task_id:
+                if cancellation_registry.cancel(task_id, WORKER_SHUTDOWN_REASON):
+                    break
+                time.sleep(0.1)
+
+        threading.Thread(target=shutdown_watcher, daemon=True, name='media-worker-shutdown').start()
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        requeue_orphaned_jobs(worker_id)
+        self.stdout.write(self.style.SUCCESS(f'[{worker_id}] 媒体worker已启动'))
+
+        while not stopping.is_set():
+            close_old_connections()
+            monitor = claim_next_job(worker_id)
+            if monitor is None:
+                if options['once']:
+                    break
+                stopping.wait(poll_interval)
+                continue
+
+            current['task_id'] = monitor.task_id
+            if stopping.is_set():
+                # 认领后才收到停止信号：放回队列
+                current['task_id'] = None
+                requeue_orphaned_jobs(worker_id)
+                break
+            started = time.monotonic()
+            self.stdout.write(f'[{worker_id}] 执行任务 {monitor.task_id} ({monitor.task_type})')
+            try:
+                run_media_job(monitor, worker_id)
+            finally:
+                current['task_id'] = None
+            self.stdout.write(f'[{worker_id}] 任务 {monitor.task_id} 结束，耗时 {time.monotonic() - started:.1f}s')
+
+            if options['once']:
+                break
+
+        close_old_connections()
+        self.stdout.write(f'[{worker_id}] 媒体worker已退出')
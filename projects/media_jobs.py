@@ -0,0 +1,663 @@
+"""
+媒体任务（音频拼接、视频合成、ASR识别）
+
+这些任务需要数分钟的CPU/IO时间，不再在gunicorn请求线程中同步执行：
+- 接口只做参数校验，调用 submit_media_job 写入一条 pending 状态的 TaskMonitor 记录并立即返回 task_id
+- 独立的媒体worker进程（manage.py run_media_worker，由supervisord按 numprocs 启动多个）
+  从数据库认领任务并执行，吞吐量随worker进程数扩展
+- 进度、结果写回 TaskMonitor，前端通过 media_job_status 接口或 progress_stream（SSE）获取
+"""
+import logging
+import os
+from typing import Callable, Dict, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from services.audio_engine.formats import WORKING_FORMATS, working_extension
+from services.utils.cancellation import CancellationToken, OperationCancelled, cancellation_registry
+from services.utils.progress_reporter import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+# worker进程停止时取消当前任务使用的原因，此类任务放回队列而不是标记为已取消
+WORKER_SHUTDOWN_REASON = 'media worker 停止'
+
+
+class MediaJobError(Exception):
+    """媒体任务失败（错误信息直接展示给用户）"""
+    pass
+
+
+def submit_media_job(project, job_type: str, payload: Dict):
+    """
+    提交媒体任务
+
+    同一项目同类型的任务正在排队或执行时，直接返回该任务，不重复提交。
+
+    Args:
+        project: 项目
+        job_type: 任务类型（MEDIA_JOB_HANDLERS 中的键）
+        payload: 任务参数（JSON可序列化）
+
+    Returns:
+        (TaskMonitor, 是否新建)
+    """
+    import uuid
+    from system_monitor.models import TaskMonitor
+
+    if job_type not in MEDIA_JOB_HANDLERS:
+        raise ValueError(f"未知的媒体任务类型: {job_type}")
+
+    with transaction.atomic():
+        existing = TaskMonitor.objects.filter(
+            project_id=project.id,
+            task_type=job_type,
+            status__in=ACTIVE_STATUSES
+        ).first()
+        if existing:
+            return existing, False
+
+        monitor = TaskMonitor.objects.create(
+            task_id=f"{job_type}_{project.id}_{uuid.uuid4().hex[:8]}",
+            task_type=job_type,
+            project_id=project.id,
+            project_name=project.name,
+            status='pending',
+            current_step='排队等待媒体处理进程...',
+            payload=payload
+        )
+
+    logger.info(f"[媒体任务] 已提交 {monitor.task_id}")
+    return monitor, True
+
+
+def claim_next_job(worker_id: str):
+    """
+    认领最早提交的待执行媒体任务
+
+    多个worker进程并发认领时，以 status='pending' 为条件的 UPDATE 保证每个任务只被一个worker认领。
+
+    Returns:
+        TaskMonitor 或 None
+    """
+    from system_monitor.models import TaskMonitor
+
+    candidates = TaskMonitor.objects.filter(
+        status='pending',
+        task_type__in=list(MEDIA_JOB_HANDLERS)
+    ).order_by('created_at').values_list('pk', flat=True)[:5]
+
+    for pk in candidates:
+        claimed = TaskMonitor.objects.filter(pk=pk, status='pending').update(
+            status='running',
+            worker_id=worker_id,
+            start_time=timezone.now(),
+            current_step='开始处理...',
+            updated_at=timezone.now()
+        )
+        if claimed:
+            return TaskMonitor.objects.get(pk=pk)
+    return None
+
+
+def requeue_orphaned_jobs(worker_id: str) -> int:
+    """
+    worker启动时，将上次以同一身份认领但未完成的任务放回队列（进程被杀或重启）
+
+    Returns:
+        重新排队的任务数
+    """
+    from system_monitor.models import TaskMonitor
+
+    count = TaskMonitor.objects.filter(
+        status='running',
+        worker_id=worker_id,
+        task_type__in=list(MEDIA_JOB_HANDLERS)
+    ).update(status='pending', worker_id='', current_step='worker重启，重新排队...', updated_at=timezone.now())
+    if count:
+        logger.warning(f"[媒体任务] {worker_id} 重新排队了 {count} 个未完成的任务")
+    return count
+
+
+def run_media_job(monitor, worker_id: str) -> None:
+    """
+    执行已认领的媒体任务，结果和状态写回 TaskMonitor
+
+    Args:
+        monitor: 已认领（running）的 TaskMonitor
+        worker_id: 当前worker标识（日志用）
+    """
+    from system_monitor.models import TaskMonitor
+    from .models import Project
+
+    task_id = monitor.task_id
+    handler = MEDIA_JOB_HANDLERS[monitor.task_type]
+    cancel_token = cancellation_registry.create(
+        task_id,
+        source=lambda: TaskMonitor.objects.filter(task_id=task_id, status='cancelled').exists()
+    )
+    reporter = ProgressReporter(monitor)
+    logger.info(f"[媒体任务] {worker_id} 开始执行 {task_id}")
+
+    try:
+        project = Project.objects.get(id=monitor.project_id)
+        result = handler(project, monitor.payload or {}, reporter, cancel_token)
+        cancel_token.raise_if_cancelled()
+        # 条件更新：巡检线程发现取消之前，取消接口可能已写入 cancelled，不能被覆盖为 completed
+        if reporter.finish('completed', expected_status='running',
+                           end_time=timezone.now(), result=result, current_step='处理完成'):
+            logger.info(f"[媒体任务] {task_id} 执行完成")
+        else:
+            logger.info(f"[媒体任务] {task_id} 执行完成前已被取消（当前状态 {monitor.status}），不覆盖")
+
+    except OperationCancelled:
+        if cancel_token.reason == WORKER_SHUTDOWN_REASON:
+            reporter.finish('pending', expected_status='running',
+                            worker_id='', start_time=None, current_step='worker重启，重新排队...')
+            logger.info(f"[媒体任务] {task_id} 因worker停止重新排队")
+        else:
+            reporter.finish('cancelled', end_time=timezone.now(), current_step='已取消')
+            logger.info(f"[媒体任务] {task_id} 已取消")
+
+    except Project.DoesNotExist:
+        reporter.finish('failed', expected_status='running',
+                        end_time=timezone.now(), error_message='项目不存在或已删除')
+
+    except MediaJobError as e:
+        logger.error(f"[媒体任务] {task_id} 失败: {e}")
+        reporter.finish('failed', expected_status='running', end_time=timezone.now(), error_message=str(e))
+
+    except Exception as e:
+        logger.error(f"[媒体任务] {task_id} 执行异常: {e}", exc_info=True)
+        reporter.finish('failed', expected_status='running',
+                        end_time=timezone.now(), error_message=f"处理失败: {str(e)}")
+
+    finally:
+        cancellation_registry.remove(task_id)
+
+
+def _step(reporter: ProgressReporter, cancel_token: CancellationToken, index: int, total: int, message: str):
+    """进入下一个处理步骤：检查取消并更新进度"""
+    cancel_token.raise_if_cancelled()
+    reporter.update(total_segments=total, completed_segments=index, current_step=message)
+
+
+def _build_url(payload: Dict, path: str) -> str:
+    """用提交时记录的请求地址生成绝对URL（worker进程没有request对象）"""
+    base_url = payload.get('base_url', '')
+    return f"{base_url.rstrip('/')}{path}" if base_url else path
+
+
+# ==================== 任务处理函数 ====================
+
+def concatenate_audio_job(project, payload: Dict, reporter: ProgressReporter, cancel_token: CancellationToken) -> Dict:
+    """拼接项目中所有音频段落为完整音频文件"""
+    from django.conf import settings
+    from services.audio_processor import AudioProcessor
+
+    trace_id = payload.get('trace_id', '')
+    _step(reporter, cancel_token, 0, 2, '准备音频段落...')
+
+    segments = project.segments.filter(
+        translated_audio_url__isnull=False
+    ).exclude(
+        translated_audio_url__exact=''
+    ).order_by('index')
+
+    audio_segments = [{
+        'start_time': segment.start_time,
+        'end_time': segment.end_time,
+        'audio_url': segment.translated_audio_url,
+        'index': segment.index
+    } for segment in segments]
+
+    if not audio_segments:
+        raise MediaJobError('没有可用的音频段落进行拼接')
+
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'concatenated')
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 使用项目ID确保文件名唯一且固定
+    safe_project_name = "".join(c for c in project.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    # 拼接结果是合成视频的中间产物，使用内部无损工作格式（settings.AUDIO_WORKING_FORMAT）
+    output_filename = f"project_{project.id}_{safe_project_name}_complete{working_extension()}"
+    output_path = os.path.join(output_dir, output_filename)
+
+    _step(reporter, cancel_token, 1, 2, f'拼接 {len(audio_segments)} 个音频段落...')
+    processor = AudioProcessor()
+    # 项目级下载缓存：再次拼接时只下载重新生成过的段落
+    cache_dir = os.path.join(settings.MEDIA_ROOT, 'audio', 'segment_cache', str(project.id))
+    if not processor.concatenate_audios(
+        audio_segments=audio_segments,
+        output_path=output_path,
+        trace_id=trace_id,
+        cache_dir=cache_dir,
+        cancel_token=cancel_token
+    ):
+        raise MediaJobError('音频拼接失败，请查看日志')
+
+    # 清理切换工作格式前遗留的其他格式拼接文件
+    stem = os.path.splitext(output_path)[0]
+    for ext in (spec['extension'] for spec in WORKING_FORMATS.values()):
+        if stem + ext != output_path and os.path.exists(stem + ext):
+            os.remove(stem + ext)
+
+    audio_url = _build_url(payload, f'/media/concatenated/{output_filename}')
+    project.concatenated_audio_url = audio_url
+    project.save(update_fields=['concatenated_audio_url'])
+
+    logger.info(f"[{trace_id}] 音频拼接成功并保存到项目: {audio_url}")
+    return {
+        'audio_url': audio_url,
+        'segments_count': len(audio_segments),
+        'trace_id': trace_id,
+        'message': f'成功拼接{len(audio_segments)}个音频段落'
+    }
+
+
+def synthesize_video_job(project, payload: Dict, reporter: ProgressReporter, cancel_token: CancellationToken) -> Dict:
+    """混合翻译音频和背景音，替换原始视频音轨生成最终视频"""
+    from django.conf import settings
+    from django.core.files import File
+    from services.audio_processor import AudioProcessor
+    from services.video_processor import VideoProcessor
+
+    trace_id = payload.get('trace_id', '')
+    translated_audio_path = payload['translated_audio_path']
+    background_audio_path = payload['background_audio_path']
+    video_path = payload['video_path']
+
+    # ffmpeg 进度（百分比和编码速度）附加在当前步骤描述后
+    stage = {'message': ''}
+
+    def on_ffmpeg_progress(fraction: float, text: str):
+        reporter.update(current_step=f"{stage['message']} {text}")
+
+    video_processor = VideoProcessor(cancel_token=cancel_token, progress_callback=on_ffmpeg_progress)
+    if not video_processor.check_ffmpeg():
+        raise MediaJobError('ffmpeg 未安装或不可用')
+
+    # 单次合成时混合音频只是预览（MP3）；两步合成时是中间产物，使用内部无损工作格式
+    single_pass = payload.get('mode', 'single_pass') == 'single_pass'
+    mixed_audio_filename = f"project_{project.id}_mixed_{trace_id}{'.mp3' if single_pass else working_extension()}"
+    mixed_audio_path = os.path.join(settings.MEDIA_ROOT, 'audio', 'mixed', mixed_audio_filename)
+    os.makedirs(os.path.dirname(mixed_audio_path), exist_ok=True)
+
+    final_video_filename = f"project_{project.id}_final_{trace_id}.mp4"
+    final_video_path = os.path.join(settings.MEDIA_ROOT, 'videos', 'final', final_video_filename)
+    os.makedirs(os.path.dirname(final_video_path), exist_ok=True)
+
+    translated_volume = payload.get('translated_volume', 1.0)
+    background_volume = payload.get('background_volume', 0.3)
+
+    # 解码后的配音/背景音 PCM 缓存：只调整音量重新合成时不再解码
+    pcm_cache_dir = os.path.join(settings.MEDIA_ROOT, 'audio', 'pcm_cache', str(project.id))
+
+    # 可选：合成后打包 HLS（多一个步骤）
+    package_hls = bool(payload.get('package_hls', False))
+    total_steps = (1 if single_pass else 2) + (1 if package_hls else 0)
+
+    if single_pass:
+        # 单次 ffmpeg：滤镜混音后直接编码 AAC 写入视频，同时输出预览用的混合音频
+        stage['message'] = '混音并合成最终视频'
+        _step(reporter, cancel_token, 0, total_steps, stage['message'])
+        logger.info(f"[{trace_id}] 单次合成: 混音 + 合成视频")
+
+        success, error_msg = video_processor.mix_and_mux(
+            video_path=video_path,
+            voice_audio_path=translated_audio_path,
+            background_audio_path=background_audio_path,
+            output_path=final_video_path,
+            voice_volume=translated_volume,
+            background_volume=background_volume,
+            mixed_audio_output_path=mixed_audio_path,
+            trace_id=trace_id,
+            pcm_cache_dir=pcm_cache_dir
+        )
+        cancel_token.raise_if_cancelled()
+        if not success:
+            raise MediaJobError(error_msg)
+
+    else:
+        # 两步合成：先混合为中间音频文件，再替换视频音轨
+        _step(reporter, cancel_token, 0, total_steps, '步骤 1/2: 混合音频轨道')
+        logger.info(f"[{trace_id}] 步骤 1/2: 混合音频轨道")
+
+        success = AudioProcessor().mix_audio_tracks(
+            translated_audio_path=translated_audio_path,
+            background_audio_path=background_audio_path,
+            output_path=mixed_audio_path,
+            translated_volume=translated_volume,
+            background_volume=background_volume,
+            trace_id=trace_id,
+            cancel_token=cancel_token,
+            pcm_cache_dir=pcm_cache_dir
+        )
+        if not success:
+            raise MediaJobError('音频混合失败')
+
+        stage['message'] = '步骤 2/2: 合成最终视频'
+        _step(reporter, cancel_token, 1, total_steps, stage['message'])
+        logger.info(f"[{trace_id}] 步骤 2/2: 合成最终视频")
+
+        success, error_msg = video_processor.replace_audio(
+            video_path=video_path,
+            audio_path=mixed_audio_path,
+            output_path=final_video_path,
+            trace_id=trace_id
+        )
+        cancel_token.raise_if_cancelled()
+        if not success:
+            raise MediaJobError(error_msg)
+
+    # 保存混合音频路径（预览区试听）
+    with open(mixed_audio_path, 'rb') as f:
+        project.mixed_audio_path.save(mixed_audio_filename, File(f), save=False)
+
+    with open(final_video_path, 'rb') as f:
+        project.final_video_path.save(final_video_filename, File(f), save=False)
+    # 旧的 HLS 分片对应上一版视频
+    _clear_hls(project)
+    project.save()
+    logger.info(f"[{trace_id}] 视频合成成功")
+
+    result = {
+        'message': '视频合成成功',
+        'mixed_audio_url': _build_url(payload, project.mixed_audio_path.url),
+        'final_video_url': _build_url(payload, project.final_video_path.url)
+    }
+    if package_hls:
+        stage['message'] = '打包 HLS 分片'
+        _step(reporter, cancel_token, total_steps - 1, total_steps, stage['message'])
+        _package_hls(project, video_processor, payload.get('include_original_audio', True), trace_id, cancel_token)
+        result['hls_master_url'] = _build_url(payload, project.hls_master_url)
+    return result
+
+
+def _clear_hls(project) -> None:
+    """删除项目的 HLS 分片（不保存项目）"""
+    import shutil
+    from django.conf import settings
+
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, 'videos', 'hls', str(project.id)), ignore_errors=True)
+    project.hls_master_path = ''
+
+
+def _package_hls(project, video_processor, include_original: bool, trace_id: str, cancel_token: CancellationToken) -> None:
+    """
+    将项目最终视频打包为 HLS（配音音轨为默认，可选附加原声音轨），保存主播放列表路径
+
+    每次打包写入新的目录（以 trace_id 命名），分片URL随版本变化，CDN/nginx 可长期缓存。
+    """
+    import shutil
+    import uuid
+    from django.conf import settings
+    from services.utils.media_languages import language_tag
+
+    final_video_path = project.final_video_path.path
+    renditions = [{
+        'path': final_video_path,
+        'name': 'dubbed',
+        'language': language_tag(project.target_lang),
+        'default': True
+    }]
+    if include_original and project.video_file_path and video_processor.probe_audio_codec(project.video_file_path.path):
+        renditions.append({
+            'path': project.video_file_path.path,
+            'name': 'original',
+            'language': language_tag(project.source_lang)
+        })
+
+    hls_root = os.path.join(settings.MEDIA_ROOT, 'videos', 'hls', str(project.id))
+    version = trace_id or uuid.uuid4().hex[:8]
+    output_dir = os.path.join(hls_root, version)
+    success, error_msg = video_processor.package_hls(
+        final_video_path,
+        renditions,
+        output_dir,
+        segment_seconds=getattr(settings, 'HLS_SEGMENT_SECONDS', 6),
+        trace_id=trace_id
+    )
+    if not success:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        cancel_token.raise_if_cancelled()
+        raise MediaJobError(error_msg)
+
+    for name in os.listdir(hls_root):
+        if name != version:
+            shutil.rmtree(os.path.join(hls_root, name), ignore_errors=True)
+
+    project.hls_master_path = os.path.relpath(
+        os.path.join(output_dir, 'master.m3u8'), settings.MEDIA_ROOT
+    ).replace(os.sep, '/')
+    project.save(update_fields=['hls_master_path'])
+
+
+def package_hls_job(project, payload: Dict, reporter: ProgressReporter, cancel_token: CancellationToken) -> Dict:
+    """将已合成的最终视频打包为 HLS 分片（视频流复制，音轨可切换）"""
+    from services.video_processor import VideoProcessor
+
+    trace_id = payload.get('trace_id', '')
+    if not project.final_video_path:
+        raise MediaJobError('请先合成最终视频')
+
+    def on_ffmpeg_progress(fraction: float, text: str):
+        reporter.update(current_step=f"打包 HLS 分片 {text}")
+
+    video_processor = VideoProcessor(cancel_token=cancel_token, progress_callback=on_ffmpeg_progress)
+    if not video_processor.check_ffmpeg():
+        raise MediaJobError('ffmpeg 未安装或不可用')
+
+    _step(reporter, cancel_token, 0, 1, '打包 HLS 分片')
+    _package_hls(project, video_processor, payload.get('include_original_audio', True), trace_id, cancel_token)
+
+    return {
+        'message': 'HLS 打包完成',
+        'hls_master_url': _build_url(payload, project.hls_master_url)
+    }
+
+
+def asr_recognize_job(project, payload: Dict, reporter: ProgressReporter, cancel_token: CancellationToken) -> Dict:
+    """识别人声分离后的音频并导入字幕段落"""
+    from authentication.models import User
+    from segments.models import Segment
+    from services.asr import FlashRecognizerService
+
+    trace_id = payload.get('trace_id', '')
+    user_config = User.objects.get(id=payload['user_id']).config
+
+    _step(reporter, cancel_token, 0, 2, '语音识别中...')
+    recognizer = FlashRecognizerService(
+        app_key=user_config.aliyun_app_key,
+        access_key_id=user_config.aliyun_access_key_id,
+        access_key_secret=user_config.aliyun_access_key_secret,
+        region='cn-shanghai',
+        cancel_token=cancel_token
+    )
+
+    success, segments, error_msg = recognizer.recognize_and_create_segments(
+        audio_file_path=payload['audio_path'],
+        audio_format=payload.get('audio_format', 'wav'),
+        merge_short_segments=payload.get('merge_short_segments', True),
+        min_duration=payload.get('min_duration', 0.5),
+        max_gap=payload.get('max_gap', 0.5),
+        language_hints=payload.get('language_hints')
+    )
+
+    if not success:
+        logger.error(f"[{trace_id}] ASR 识别失败: {error_msg}")
+        raise MediaJobError(error_msg)
+
+    if not segments:
+        logger.warning(f"[{trace_id}] ASR 识别结果为空")
+        raise MediaJobError('识别结果为空，请检查音频文件是否包含有效语音内容')
+
+    _step(reporter, cancel_token, 1, 2, '导入字幕段落...')
+    segment_objects = [Segment(
+        project=project,
+        index=seg_data['index'],
+        start_time=seg_data['start_time'],
+        end_time=seg_data['end_time'],
+        original_text=seg_data['original_text'],
+        translated_text=seg_data.get('translated_text', ''),
+        speaker=seg_data.get('speaker', 'SPEAKER_00'),
+        target_duration=seg_data.get('duration', seg_data['end_time'] - seg_data['start_time']),
+        status='pending'
+    ) for seg_data in segments]
+
+    # 删除现有段落并批量创建新段落
+    with transaction.atomic():
+        Segment.objects.filter(project=project).delete()
+        Segment.objects.bulk_create(segment_objects)
+
+    segments_count = len(segment_objects)
+    logger.info(f"[{trace_id}] ASR 识别成功，已导入 {segments_count} 个字幕段落")
+    return {
+        'message': f'识别成功，已导入 {segments_count} 个字幕段落',
+        'segments_count': segments_count
+    }
+
+
+def concatenated_audio_path(project) -> str:
+    """项目拼接音频URL（绝对URL或 /media/ 开头的路径）转本地路径"""
+    from urllib.parse import urlparse
+    from django.conf import settings
+
+    relative_path = urlparse(project.concatenated_audio_url).path.lstrip('/')
+    if relative_path.startswith('media/'):
+        relative_path = relative_path[6:]  # 去掉 'media/' 前缀
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+def _same_source_video(project, other, verify_content: bool = True) -> bool:
+    """
+    两个项目是否使用同一个原始视频（同一文件，或分别上传的同一视频：内容哈希相同）
+
+    大小相同只是必要条件：无关的视频也可能恰好大小相同，混入后配音音轨会与画面错位，因此必须比较内容。
+    完整哈希两个视频耗时较长，只在媒体worker中进行；提交任务的请求中 verify_content=False 只做大小预检。
+    """
+    from services.audio_separator.cache import hash_file
+
+    if not project.video_file_path or not other.video_file_path:
+        return False
+    if project.video_file_path.name == other.video_file_path.name:
+        return True
+    try:
+        path, other_path = project.video_file_path.path, other.video_file_path.path
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+        return not verify_content or hash_file(path) == hash_file(other_path)
+    except OSError:
+        return False
+
+
+def collect_multilang_tracks(project, sibling_ids: List[int], verify_content: bool = True) -> List[Dict]:
+    """
+    收集多语言合成的配音音轨：当前项目在前（默认音轨），其后为同一视频的其他语言项目
+
+    Args:
+        project: 当前项目（提供视频和背景音）
+        sibling_ids: 其他语言项目ID（须属于同一用户、使用同一原始视频）
+        verify_content: 是否比较视频内容哈希（False 时只比较文件名和大小，供请求线程快速校验）
+
+    Returns:
+        [{'project_id', 'path', 'language', 'title'}, ...]
+
+    Raises:
+        MediaJobError: 项目不存在、视频不一致、缺少拼接音频或语言重复
+    """
+    from services.utils.media_languages import language_tag
+    from .models import Project
+
+    siblings = {p.id: p for p in Project.objects.filter(id__in=sibling_ids, user_id=project.user_id)}
+    missing = [pid for pid in sibling_ids if pid not in siblings]
+    if missing:
+        raise MediaJobError(f'项目不存在或无权访问: {missing}')
+
+    tracks = []
+    for item in [project] + [siblings[pid] for pid in sibling_ids if pid != project.id]:
+        if item.id != project.id and not _same_source_video(project, item, verify_content):
+            raise MediaJobError(f'项目"{item.name}"使用的不是同一个原始视频')
+        if not item.concatenated_audio_url:
+            raise MediaJobError(f'项目"{item.name}"尚未拼接翻译音频')
+        path = concatenated_audio_path(item)
+        if not os.path.exists(path):
+            raise MediaJobError(f'项目"{item.name}"的翻译音频文件不存在')
+        if any(track['title'] == item.target_lang for track in tracks):
+            raise MediaJobError(f'目标语言重复: {item.target_lang}')
+        tracks.append({
+            'project_id': item.id,
+            'path': path,
+            'language': language_tag(item.target_lang, iso639_2=True),
+            'title': item.target_lang
+        })
+    return tracks
+
+
+def synthesize_multilang_job(project, payload: Dict, reporter: ProgressReporter, cancel_token: CancellationToken) -> Dict:
+    """将同一视频的多个语言项目的配音合成为一个多音轨视频（视频流只复制一次，背景音共用）"""
+    from django.conf import settings
+    from services.utils.media_languages import language_tag
+    from services.video_processor import VideoProcessor
+
+    trace_id = payload.get('trace_id', '')
+    if not project.video_file_path or not project.background_audio_path:
+        raise MediaJobError('当前项目缺少原始视频或背景音，请先上传视频并进行人声分离')
+
+    _step(reporter, cancel_token, 0, 1, '准备多语言音轨...')
+    tracks = collect_multilang_tracks(project, payload.get('project_ids', []))
+
+    def on_ffmpeg_progress(fraction: float, text: str):
+        reporter.update(current_step=f"合成 {len(tracks)} 种语言音轨 {text}")
+
+    video_processor = VideoProcessor(cancel_token=cancel_token, progress_callback=on_ffmpeg_progress)
+    if not video_processor.check_ffmpeg():
+        raise MediaJobError('ffmpeg 未安装或不可用')
+
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'videos', 'multilang', str(project.id))
+    output_filename = f"project_{project.id}_multilang_{trace_id}.mp4"
+    output_path = os.path.join(output_dir, output_filename)
+
+    _step(reporter, cancel_token, 0, 1, f'合成 {len(tracks)} 种语言音轨')
+    success, error_msg = video_processor.mux_multilang(
+        video_path=project.video_file_path.path,
+        background_audio_path=project.background_audio_path.path,
+        voice_tracks=tracks,
+        output_path=output_path,
+        voice_volume=payload.get('translated_volume', 1.0),
+        background_volume=payload.get('background_volume', 0.3),
+        original_audio_language=language_tag(project.source_lang, iso639_2=True) if payload.get('include_original_audio') else None,
+        trace_id=trace_id
+    )
+    cancel_token.raise_if_cancelled()
+    if not success:
+        raise MediaJobError(error_msg)
+
+    # 只保留最新一次的多语言视频
+    for name in os.listdir(output_dir):
+        if name != output_filename:
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except OSError:
+                pass
+
+    relative = os.path.relpath(output_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    logger.info(f"[{trace_id}] 多语言视频合成成功: {[track['title'] for track in tracks]}")
+    return {
+        'message': f'多语言视频合成成功（{len(tracks)} 种语言）',
+        'video_url': _build_url(payload, f"{settings.MEDIA_URL.rstrip('/')}/{relative}"),
+        'languages': [track['title'] for track in tracks]
+    }
+
+
+# 任务类型 -> 处理函数 handler(project, payload, reporter, cancel_token) -> result
+MEDIA_JOB_HANDLERS: Dict[str, Callable] = {
+    'concatenate_audio': concatenate_audio_job,
+    'synthesize_video': synthesize_video_job,
+    'asr_recognize': asr_recognize_job,
+    'package_hls': package_hls_job,
+    'synthesize_multilang': synthesize_multilang_job,
+}
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_remove_num_speakers_and_background_info'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='hls_master_path',
+            field=models.CharField(blank=True, help_text='HLS主播放列表路径（相对MEDIA_ROOT）', max_length=500),
+        ),
+    ]
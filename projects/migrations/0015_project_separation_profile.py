@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_project_hls_master_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='separation_deadline',
+            field=models.DateTimeField(blank=True, help_text='人声分离期望完成时间（自动选择档位时参考）', null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='separation_profile',
+            field=models.CharField(blank=True, help_text='人声分离使用的质量档位（fast/balanced/best）', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='separation_rtf',
+            field=models.FloatField(blank=True, help_text='人声分离实测实时率（耗时/音频时长，缓存命中时为空）', null=True),
+        ),
+    ]
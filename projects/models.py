@@ -68,6 +68,7 @@ class Project(models.Model):
     concatenated_audio_url = models.CharField(max_length=500, blank=True, help_text="拼接后的完整翻译音频URL")
     mixed_audio_path = models.FileField(upload_to='audio/mixed/', blank=True, null=True, help_text="混合音频路径（翻译+背景）")
     final_video_path = models.FileField(upload_to='videos/final/', blank=True, null=True, help_text="最终合成视频路径")
+    hls_master_path = models.CharField(max_length=500, blank=True, help_text="HLS主播放列表路径（相对MEDIA_ROOT）")
 
     # 人声分离相关字段
     original_audio_path = models.FileField(upload_to='audio/original/', blank=True, null=True, help_text="从视频提取的原始音频")
@@ -86,6 +87,9 @@ class Project(models.Model):
     )
     separation_started_at = models.DateTimeField(blank=True, null=True, help_text="分离开始时间")
     separation_completed_at = models.DateTimeField(blank=True, null=True, help_text="分离完成时间")
+    separation_deadline = models.DateTimeField(blank=True, null=True, help_text="人声分离期望完成时间（自动选择档位时参考）")
+    separation_profile = models.CharField(max_length=20, blank=True, help_text="人声分离使用的质量档位（fast/balanced/best）")
+    separation_rtf = models.FloatField(blank=True, null=True, help_text="人声分离实测实时率（耗时/音频时长，缓存命中时为空）")
 
     # 项目级配置
     tts_model = models.CharField(max_length=50, default="speech-2.5-hd-preview", help_text="TTS模型")
@@ -210,3 +214,10 @@ class Project(models.Model):
         if self.final_video_path:
             return self.final_video_path.url
         return None
+
+    @property
+    def hls_master_url(self):
+        """返回HLS主播放列表URL"""
+        if self.hls_master_path:
+            return f"{settings.MEDIA_URL.rstrip('/')}/{self.hls_master_path}"
+        return None
@@ -0,0 +1,171 @@
+"""
+时间窗口预览渲染
+
+检查某处修改时不必对整段视频执行"拼接音频 + 合成视频"：
+- 只拼接与 [start, end) 重叠的段落配音（复用项目级段落音频下载缓存）
+- 视频和背景音用输入端 -ss 定位，只读取窗口附近的数据
+- 起点前不远处有关键帧时，起点对齐到关键帧并直接复制视频流；否则以 ultrafast 重新编码窗口
+渲染耗时只与窗口长度有关，与视频总长度无关，30秒窗口通常在数秒内完成。
+"""
+import logging
+import os
+import time
+from typing import Dict
+
+from django.conf import settings
+
+from services.utils.admission import AdmissionTimeout, admit, estimate_job_cost
+
+from .media_jobs import MediaJobError, _build_url
+
+logger = logging.getLogger(__name__)
+
+# 预览文件保留时间（秒），渲染新预览时清理过期文件
+PREVIEW_TTL_SECONDS = 3600
+
+
+def _preview_dir(project) -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'videos', 'preview', str(project.id))
+
+
+def _prune_previews(preview_dir: str) -> None:
+    """清理过期的预览文件"""
+    cutoff = time.time() - getattr(settings, 'PREVIEW_TTL_SECONDS', PREVIEW_TTL_SECONDS)
+    for name in os.listdir(preview_dir):
+        path = os.path.join(preview_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def render_preview_window(
+    project,
+    start: float,
+    end: float,
+    translated_volume: float = 1.0,
+    background_volume: float = 0.3,
+    base_url: str = '',
+    trace_id: str = ''
+) -> Dict:
+    """
+    渲染项目 [start, end) 时间窗口的配音预览视频
+
+    Args:
+        project: 项目（需已上传视频并完成人声分离）
+        start: 窗口起点（秒）
+        end: 窗口终点（秒）
+        translated_volume: 配音音量（0.0-1.0）
+        background_volume: 背景音音量（0.0-1.0）
+        base_url: 请求地址，用于生成绝对URL
+        trace_id: 追踪ID
+
+    Returns:
+        {'preview_url', 'start_time', 'end_time', 'segments_count', 'video_copied', 'elapsed'}
+
+    Raises:
+        MediaJobError: 参数或文件不满足条件、渲染失败
+    """
+    from services.audio_processor import AudioProcessor
+    from services.video_processor import VideoProcessor
+
+    max_window = getattr(settings, 'PREVIEW_MAX_WINDOW_SECONDS', 120)
+    if start < 0 or end <= start:
+        raise MediaJobError('时间窗口无效：结束时间必须大于开始时间')
+    if end - start > max_window:
+        raise MediaJobError(f'预览窗口不能超过 {max_window} 秒')
+    if not project.video_file_path:
+        raise MediaJobError('未找到原始视频文件')
+    if not project.background_audio_path:
+        raise MediaJobError('未找到背景音文件，请先进行人声分离')
+
+    video_path = project.video_file_path.path
+    background_audio_path = project.background_audio_path.path
+    for path, name in ((video_path, '视频'), (background_audio_path, '背景音')):
+        if not os.path.exists(path):
+            raise MediaJobError(f'{name}文件不存在: {path}')
+
+    started = time.monotonic()
+    video_processor = VideoProcessor()
+
+    # 起点前 tolerance 秒内有关键帧时对齐到关键帧，视频流可直接复制
+    tolerance = getattr(settings, 'PREVIEW_KEYFRAME_TOLERANCE', 2.0)
+    keyframe = video_processor.find_keyframe_before(video_path, start)
+    copy_video = keyframe is not None and start - keyframe <= tolerance
+    if copy_video:
+        start = keyframe
+    duration = end - start
+
+    segments = project.segments.filter(
+        translated_audio_url__isnull=False,
+        end_time__gt=start,
+        start_time__lt=end
+    ).exclude(
+        translated_audio_url__exact=''
+    ).order_by('index')
+    audio_segments = [{
+        'start_time': segment.start_time,
+        'end_time': segment.end_time,
+        'audio_url': segment.translated_audio_url,
+        'index': segment.index
+    } for segment in segments]
+
+    preview_dir = _preview_dir(project)
+    os.makedirs(preview_dir, exist_ok=True)
+    _prune_previews(preview_dir)
+
+    name = f"preview_{start:.2f}_{end:.2f}_{trace_id}"
+    voice_path = os.path.join(preview_dir, f"{name}_voice.wav")
+    output_path = os.path.join(preview_dir, f"{name}.mp4")
+
+    try:
+        with admit(
+            'ffmpeg_mux', estimate_job_cost('ffmpeg_mux', duration),
+            label=f"预览渲染({trace_id})", timeout=getattr(settings, 'PREVIEW_ADMISSION_TIMEOUT', 30)
+        ):
+            cache_dir = os.path.join(settings.MEDIA_ROOT, 'audio', 'segment_cache', str(project.id))
+            if not AudioProcessor().concatenate_audios(
+                audio_segments=audio_segments,
+                output_path=voice_path,
+                trace_id=trace_id,
+                cache_dir=cache_dir,
+                window_start=start,
+                window_end=end
+            ):
+                raise MediaJobError('窗口配音拼接失败，请查看日志')
+
+            success, error_msg = video_processor.render_preview(
+                video_path=video_path,
+                voice_audio_path=voice_path,
+                background_audio_path=background_audio_path,
+                output_path=output_path,
+                start=start,
+                duration=duration,
+                voice_volume=translated_volume,
+                background_volume=background_volume,
+                copy_video=copy_video,
+                trace_id=trace_id
+            )
+            if not success:
+                raise MediaJobError(error_msg)
+    except AdmissionTimeout:
+        raise MediaJobError('服务器繁忙，请稍后重试')
+    finally:
+        if os.path.exists(voice_path):
+            os.remove(voice_path)
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"[{trace_id}] 预览渲染完成: {start:.2f}s-{end:.2f}s，{len(audio_segments)} 个段落，"
+        f"视频{'复制' if copy_video else '重新编码'}，耗时 {elapsed:.2f}s"
+    )
+    relative = os.path.relpath(output_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    return {
+        'preview_url': _build_url({'base_url': base_url}, f"{settings.MEDIA_URL.rstrip('/')}/{relative}"),
+        'start_time': round(start, 3),
+        'end_time': round(end, 3),
+        'segments_count': len(audio_segments),
+        'video_copied': copy_video,
+        'elapsed': round(elapsed, 2)
+    }
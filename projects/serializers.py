@@ -32,6 +32,7 @@ class ProjectDetailSerializer(serializers.ModelSerializer):
     background_audio_url = serializers.ReadOnlyField()
     mixed_audio_url = serializers.ReadOnlyField()
     final_video_url = serializers.ReadOnlyField()
+    hls_master_url = serializers.ReadOnlyField()
 
     class Meta:
         model = Project
@@ -42,10 +43,12 @@ class ProjectDetailSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'segment_count',
             'completed_segment_count', 'progress_percentage',
             'audio_url', 'video_url', 'background_audio_url',
-            'mixed_audio_url', 'final_video_url',
+            'mixed_audio_url', 'final_video_url', 'hls_master_url',
             # 人声分离相关
-            'separation_status', 'separation_started_at', 'separation_completed_at'
+            'separation_status', 'separation_started_at', 'separation_completed_at',
+            'separation_deadline', 'separation_profile', 'separation_rtf'
         ]
+        read_only_fields = ['separation_profile', 'separation_rtf']
 
 
 class ProjectCreateSerializer(serializers.ModelSerializer):
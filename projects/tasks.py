@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 from django.utils import timezone
 from django.conf import settings
+from services.utils.cancellation import CancellationToken
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +42,7 @@ class BatchTranslateTask:
 
         # 控制标志
         self.should_stop = False
+        self.cancel_token = CancellationToken(task_id)
         self.thread = None
 
     def start(self):
@@ -62,6 +64,8 @@ class BatchTranslateTask:
     def stop(self):
         """停止翻译任务"""
         self.should_stop = True
+        # 中止进行中的API请求和请求间隔等待
+        self.cancel_token.cancel()
         if self.status == 'running':
             self.status = 'cancelled'
             logger.info(f"[Task {self.task_id}] 批量翻译任务已取消")
@@ -72,6 +76,7 @@ class BatchTranslateTask:
             from .models import Project
             from segments.models import Segment
             from services.clients.minimax_client import MiniMaxClient
+            from services.utils.progress_reporter import ProgressReporter
             from system_monitor.models import SystemConfig, TaskMonitor
 
             # 获取系统配置
@@ -91,10 +96,10 @@ class BatchTranslateTask:
                 }
             )
 
+            # 进度写入合并：计数变化只推送内存，数据库按间隔批量写入
+            reporter = ProgressReporter(monitor)
             if not created:
-                monitor.status = 'running'
-                monitor.start_time = timezone.now()
-                monitor.save()
+                reporter.update(status='running', start_time=timezone.now())
 
             # 获取段落
             segments = Segment.objects.filter(
@@ -103,7 +108,7 @@ class BatchTranslateTask:
             ).order_by('index')
 
             # 初始化翻译客户端 - 使用用户的API Key
-            client = MiniMaxClient(api_key=self.user_api_key, group_id=self.user_group_id)
+            client = MiniMaxClient(api_key=self.user_api_key, group_id=self.user_group_id, cancel_token=self.cancel_token)
             target_lang_display = project.get_target_lang_display()
             custom_vocabulary = project.custom_vocabulary or []
 
@@ -159,12 +164,13 @@ class BatchTranslateTask:
                     logger.error(f"[Task {self.task_id}] {error_msg}")
 
                 # 更新监控记录
-                monitor.completed_segments = self.completed
-                monitor.failed_segments = self.failed
-                monitor.current_segment_text = self.current_segment_text
+                reporter.update(
+                    completed_segments=self.completed,
+                    failed_segments=self.failed,
+                    current_segment_text=self.current_segment_text
+                )
                 if self.error_messages:
-                    monitor.error_message = '\n'.join(self.error_messages[-5:])  # 保留最近5个错误
-                monitor.save()
+                    reporter.update(error_message='\n'.join(self.error_messages[-5:]))  # 保留最近5个错误
 
                 # 更新预计剩余时间
                 self._update_estimated_time()
@@ -174,21 +180,22 @@ class BatchTranslateTask:
                 if self.completed < self.total and not self.should_stop:  # 最后一个请求不需要等待
                     if config.enable_detailed_logging:
                         logger.debug(f"[Task {self.task_id}] 等待{request_interval}秒后处理下一个段落")
-                    time.sleep(request_interval)
+                    # 停止时立即结束等待
+                    self.cancel_token.wait(request_interval)
 
             # 任务完成，更新监控记录
             if self.should_stop:
                 self.status = 'cancelled'
-                monitor.status = 'cancelled'
             else:
                 self.status = 'completed'
-                monitor.status = 'completed'
                 self.end_time = timezone.now()
 
-            monitor.end_time = timezone.now()
-            monitor.completed_segments = self.completed
-            monitor.failed_segments = self.failed
-            monitor.save()
+            reporter.finish(
+                self.status,
+                end_time=timezone.now(),
+                completed_segments=self.completed,
+                failed_segments=self.failed
+            )
 
             logger.info(f"[Task {self.task_id}] 批量翻译完成，成功{self.completed}个，失败{self.failed}个")
 
@@ -204,7 +211,7 @@ class BatchTranslateTask:
                 monitor.status = 'failed'
                 monitor.error_message = str(e)
                 monitor.end_time = timezone.now()
-                monitor.save()
+                monitor.save(update_fields=['status', 'error_message', 'end_time', 'updated_at'])
             except Exception:
                 pass  # 监控记录更新失败不影响主任务
 
@@ -336,23 +343,130 @@ task_manager = BatchTranslateTaskManager()
 
 # ==================== 人声分离任务 ====================
 
-def separate_vocals_sync(project_id: int):
+def _store_file_in_field(field, source_path: str, filename: str, move: bool = False):
+    """
+    把文件放入 FileField（不保存模型）
+
+    本地文件存储时直接放到 upload_to 目录并让字段指向它，不复制音频数据：
+    - move=True：改名移动（源文件是本任务的临时文件）
+    - move=False：硬链接（源文件需要保留，如分离缓存中的文件）
+    其他存储按常规方式上传。
+    """
+    import os
+    import shutil
+    from django.core.files import File
+    from services.audio_separator.cache import link_or_copy
+
+    storage = field.storage
+    try:
+        name = storage.get_available_name(field.field.generate_filename(field.instance, filename))
+        target_path = storage.path(name)
+    except NotImplementedError:
+        with open(source_path, 'rb') as f:
+            field.save(filename, File(f), save=False)
+        return
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if move:
+        try:
+            os.replace(source_path, target_path)
+        except OSError:
+            # 跨文件系统时退化为复制后删除
+            shutil.move(source_path, target_path)
+    else:
+        link_or_copy(source_path, target_path)
+    field.name = name
+
+
+def _separation_queue_depth() -> int:
+    """正在运行和排队中的人声分离任务数（来自准入控制账本）"""
+    from services.utils.admission import get_admission_controller
+
+    try:
+        status = get_admission_controller().status()
+    except Exception as e:
+        logger.warning(f"读取准入控制状态失败: {e}")
+        return 0
+    return sum(1 for entry in status['running'] + status['waiting'] if entry.get('job_type') == 'demucs')
+
+
+def _measured_separation_rtf(limit: int = 10) -> Dict[str, float]:
+    """各分离档位最近 limit 次实测实时率的中位数"""
+    from .models import Project
+    from services.audio_separator.profiles import SEPARATION_PROFILES
+
+    measured = {}
+    for name in SEPARATION_PROFILES:
+        values = sorted(
+            Project.objects.filter(separation_profile=name, separation_rtf__isnull=False)
+            .order_by('-separation_completed_at')
+            .values_list('separation_rtf', flat=True)[:limit]
+        )
+        if values:
+            measured[name] = values[len(values) // 2]
+    return measured
+
+
+def _select_separation_profile(project, duration: float, requested: Optional[str] = None):
+    """
+    确定分离档位：显式指定时直接使用，auto 时按时长、排队任务数和项目截止时间自动选择
+
+    Returns:
+        (档位名, 档位配置)
+    """
+    from services.audio_separator.profiles import AUTO_PROFILE, choose_profile, get_profile
+
+    requested = requested or getattr(settings, 'SEPARATION_PROFILE', AUTO_PROFILE)
+    if requested != AUTO_PROFILE:
+        return requested, get_profile(requested)
+
+    deadline_seconds = None
+    if project.separation_deadline:
+        deadline_seconds = (project.separation_deadline - timezone.now()).total_seconds()
+    name, reason = choose_profile(
+        duration,
+        queue_depth=_separation_queue_depth(),
+        deadline_seconds=deadline_seconds,
+        measured_rtf=_measured_separation_rtf(),
+        budget_ratio=getattr(settings, 'SEPARATION_TIME_BUDGET_RATIO', 1.5)
+    )
+    logger.info(f"[人声分离] 自动选择档位 {name}: {reason}")
+    return name, get_profile(name)
+
+
+def _speech_spans(project):
+    """项目段落的时间区间 [(开始秒, 结束秒)]（来自SRT/ASR），没有段落时返回 None"""
+    spans = [
+        (start, end) for start, end in project.segments.values_list('start_time', 'end_time')
+        if end is not None and start is not None and end > start
+    ]
+    return spans or None
+
+
+def separate_vocals_sync(project_id: int, cancel_token: Optional[CancellationToken] = None,
+                         profile: Optional[str] = None, speech_only: Optional[bool] = None):
     """
     人声分离同步函数（使用线程异步执行）
 
     Args:
         project_id: 项目ID
+        cancel_token: 取消令牌，取消时终止ffmpeg/Demucs子进程
+        profile: 质量档位 fast/balanced/best/auto，None 时使用 settings.SEPARATION_PROFILE
+        speech_only: 只对段落覆盖的语音区间运行Demucs，其余部分直通到背景音；
+            None 时使用 settings.SEPARATION_SPEECH_ONLY，项目没有段落时整段分离
 
     Returns:
         dict: 任务结果
     """
     import os
     from django.utils import timezone
-    from django.core.files import File
     from services.audio_separator import DemucsSeparator
-    from services.audio_separator.utils import extract_audio_from_video
+    from services.audio_separator.cache import get_separation_cache
+    from services.audio_separator.utils import extract_audio_from_video, get_audio_duration
+    from services.utils.admission import admit, estimate_job_cost
     from services.utils.memory_monitor import MemoryMonitor, log_memory_status
 
+    audio_dir = None
     try:
         # 获取项目
         from .models import Project
@@ -383,7 +497,7 @@ def separate_vocals_sync(project_id: int):
         original_audio_path = os.path.join(audio_dir, 'original.wav')
 
         logger.info(f"[步骤2] 开始提取音频...")
-        extract_audio_from_video(video_path, original_audio_path)
+        extract_audio_from_video(video_path, original_audio_path, cancel_token=cancel_token)
         logger.info(f"[步骤2] 音频提取完成: {original_audio_path}")
 
         # 3. 初始化Demucs分离器
@@ -392,19 +506,92 @@ def separate_vocals_sync(project_id: int):
         # 记录内存状态
         log_memory_status("[人声分离] 开始前 ")
 
-        separator = DemucsSeparator(device='cpu', model='htdemucs_ft')
-
-        if not separator.is_available():
-            raise RuntimeError("Demucs未正确安装，请检查依赖")
-
-        # 4. 执行人声分离（使用内存监控）
-        logger.info(f"[步骤4] 开始人声分离（这可能需要几分钟）...")
-        output_dir = os.path.join(audio_dir, 'separated')
-        os.makedirs(output_dir, exist_ok=True)
+        duration = get_audio_duration(original_audio_path)
+
+        # 语音区间模式：只有段落覆盖的区间需要推理，按推理时长估算成本和选择档位
+        if speech_only is None:
+            speech_only = getattr(settings, 'SEPARATION_SPEECH_ONLY', False)
+        speech_padding = getattr(settings, 'SEPARATION_SPEECH_PADDING', 1.0)
+        speech_spans = _speech_spans(project) if speech_only else None
+        inferred_duration = duration
+        if speech_spans is not None:
+            inferred_duration = min(duration, sum(end - start + 2 * speech_padding for start, end in speech_spans))
+            logger.info(f"[步骤3] 语音区间模式: {len(speech_spans)} 个段落，约 {inferred_duration:.0f}s / {duration:.0f}s 需要推理")
+        elif speech_only:
+            logger.info("[步骤3] 项目没有段落，整段分离")
+
+        profile_name, profile_config = _select_separation_profile(project, inferred_duration, profile)
+        logger.info(f"[步骤3] 分离档位: {profile_name} ({profile_config['label']}, 模型 {profile_config['model']})")
+
+        chunk_seconds = getattr(settings, 'SEPARATION_CHUNK_SECONDS', None)
+        if speech_spans is not None and not chunk_seconds:
+            # 语音区间模式基于分块推理
+            from services.audio_separator.chunked import DEFAULT_CHUNK_SECONDS
+            chunk_seconds = DEFAULT_CHUNK_SECONDS
+
+        separator = DemucsSeparator(
+            device='cpu',
+            model=profile_config['model'],
+            chunk_seconds=chunk_seconds,
+            overlap_seconds=getattr(settings, 'SEPARATION_OVERLAP_SECONDS', 5.0),
+            workers=getattr(settings, 'SEPARATION_WORKERS', 0) or None,
+            shifts=profile_config['shifts'],
+            segment=profile_config['segment']
+        )
+
+        # 相同音频 + 相同模型和参数的分离结果可直接复用（重复上传、复制项目、重复点击分离）
+        cache = get_separation_cache()
+        cache_key = None
+        result = None
+        cache_hit = False
+        separation_rtf = None
+        if cache is not None:
+            cache_key = cache.make_key(
+                original_audio_path,
+                separator.model,
+                shifts=separator.shifts,
+                segment=separator.segment,
+                chunk_seconds=separator.chunk_seconds,
+                overlap_seconds=separator.overlap_seconds if separator.chunk_seconds else None,
+                speech_spans=speech_spans,
+                speech_padding=speech_padding if speech_spans is not None else None
+            )
+            result = cache.get(cache_key)
+            cache_hit = result is not None
+
+        if cache_hit:
+            logger.info("[步骤4] 命中分离缓存，跳过Demucs")
+        else:
+            if not separator.is_available():
+                raise RuntimeError("Demucs未正确安装，请检查依赖")
+
+            # 4. 执行人声分离（使用内存监控）
+            logger.info(f"[步骤4] 开始人声分离（这可能需要几分钟）...")
+            output_dir = os.path.join(audio_dir, 'separated')
+            os.makedirs(output_dir, exist_ok=True)
+
+            # 按音频时长申请CPU/内存资源，其他重任务占满容量时排队等待
+            cost = estimate_job_cost(
+                'demucs',
+                duration=inferred_duration,
+                jobs=separator.workers if separator.chunk_seconds else separator.jobs,
+                device=separator.device,
+                chunk_seconds=separator.chunk_seconds
+            )
+            with admit('demucs', cost, label=f"人声分离(项目{project_id})", cancel_token=cancel_token):
+                # 使用内存监控上下文管理器
+                with MemoryMonitor(task_name="Demucs人声分离"):
+                    started = time.monotonic()
+                    result = separator.separate(
+                        original_audio_path, output_dir, cancel_token=cancel_token,
+                        speech_spans=speech_spans, speech_padding=speech_padding
+                    )
+                    # 实时率 = 分离耗时 / 推理时长（不含排队），供自动选择档位参考
+                    separation_rtf = (time.monotonic() - started) / max(inferred_duration, 1.0)
+                    logger.info(f"[步骤4] 档位 {profile_name} 实测实时率 {separation_rtf:.2f}")
 
-        # 使用内存监控上下文管理器
-        with MemoryMonitor(task_name="Demucs人声分离"):
-            result = separator.separate(original_audio_path, output_dir)
+            if cache is not None:
+                cache.put(cache_key, result['vocals'], result['background'])
 
         logger.info(f"[步骤4] 人声分离完成")
         logger.info(f"  人声: {result['vocals']}")
@@ -413,33 +600,28 @@ def separate_vocals_sync(project_id: int):
         # 5. 保存文件到Django FileField
         logger.info(f"[步骤5] 保存文件到数据库...")
 
+        # 临时目录中的文件直接移动到最终位置；缓存命中时人声/背景音硬链接（缓存仍需保留）
         # 保存原始音频
-        with open(original_audio_path, 'rb') as f:
-            project.original_audio_path.save(
-                f'project_{project_id}_original.wav',
-                File(f),
-                save=False
-            )
+        _store_file_in_field(
+            project.original_audio_path, original_audio_path, f'project_{project_id}_original.wav', move=True
+        )
 
         # 保存人声音频
-        with open(result['vocals'], 'rb') as f:
-            project.vocal_audio_path.save(
-                f'project_{project_id}_vocals.wav',
-                File(f),
-                save=False
-            )
+        _store_file_in_field(
+            project.vocal_audio_path, result['vocals'], f'project_{project_id}_vocals.wav', move=not cache_hit
+        )
 
         # 保存背景音
-        with open(result['background'], 'rb') as f:
-            project.background_audio_path.save(
-                f'project_{project_id}_background.wav',
-                File(f),
-                save=False
-            )
+        _store_file_in_field(
+            project.background_audio_path, result['background'], f'project_{project_id}_background.wav',
+            move=not cache_hit
+        )
 
         # 6. 更新项目状态为完成
         project.separation_status = 'completed'
         project.separation_completed_at = timezone.now()
+        project.separation_profile = profile_name
+        project.separation_rtf = separation_rtf
         project.save()
 
         logger.info(f"[任务完成] 项目ID: {project_id}")
@@ -452,6 +634,8 @@ def separate_vocals_sync(project_id: int):
             'status': 'success',
             'project_id': project_id,
             'message': '人声分离完成',
+            'profile': profile_name,
+            'rtf': separation_rtf,
             'vocal_url': project.vocal_audio_path.url if project.vocal_audio_path else None,
             'background_url': project.background_audio_path.url if project.background_audio_path else None,
         }
@@ -459,6 +643,11 @@ def separate_vocals_sync(project_id: int):
     except Exception as e:
         logger.error(f"[任务异常] 项目ID: {project_id}, 错误: {str(e)}", exc_info=True)
 
+        # 失败时同样清理临时目录（提取的音频和分离中间文件）
+        if audio_dir:
+            import shutil
+            shutil.rmtree(audio_dir, ignore_errors=True)
+
         # 更新项目状态为失败
         try:
             from .models import Project
@@ -475,12 +664,15 @@ def separate_vocals_sync(project_id: int):
         }
 
 
-def start_vocal_separation_task(project_id: int):
+def start_vocal_separation_task(project_id: int, profile: Optional[str] = None,
+                                 speech_only: Optional[bool] = None):
     """
     启动人声分离后台任务
 
     Args:
         project_id: 项目ID
+        profile: 质量档位 fast/balanced/best/auto，None 时使用 settings.SEPARATION_PROFILE
+        speech_only: 只分离段落覆盖的语音区间，None 时使用 settings.SEPARATION_SPEECH_ONLY
 
     Returns:
         str: 任务ID或状态
@@ -489,6 +681,7 @@ def start_vocal_separation_task(project_id: int):
     thread = threading.Thread(
         target=separate_vocals_sync,
         args=(project_id,),
+        kwargs={'profile': profile, 'speech_only': speech_only},
         daemon=True
     )
     thread.start()
@@ -564,6 +757,7 @@ class ASRRecognizeTask:
             from .models import Project
             from segments.models import Segment
             from services.asr import RecognitionASRService
+            from services.utils.progress_reporter import ProgressReporter
             from system_monitor.models import TaskMonitor
             from django.db import transaction
             import os
@@ -586,16 +780,14 @@ class ASRRecognizeTask:
                 }
             )
 
+            reporter = ProgressReporter(monitor)
             if not created:
-                monitor.status = 'running'
-                monitor.start_time = timezone.now()
-                monitor.save()
+                reporter.update(status='running', start_time=timezone.now())
 
             # 更新进度: 检查文件
             self.current_step = '正在检查人声文件...'
             self.progress_percentage = 10
-            monitor.current_segment_text = self.current_step
-            monitor.save()
+            reporter.update(current_segment_text=self.current_step)
 
             # 获取人声文件路径
             if not project.vocal_audio_path:
@@ -610,8 +802,7 @@ class ASRRecognizeTask:
             # 更新进度: 初始化ASR服务
             self.current_step = '正在初始化ASR服务...'
             self.progress_percentage = 20
-            monitor.current_segment_text = self.current_step
-            monitor.save()
+            reporter.update(current_segment_text=self.current_step)
 
             asr_service = RecognitionASRService(api_key=self.dashscope_api_key)
 
@@ -647,8 +838,7 @@ class ASRRecognizeTask:
             # 更新进度: 调用ASR识别
             self.current_step = f'正在识别音频 (语言: {language_code})...'
             self.progress_percentage = 30
-            monitor.current_segment_text = self.current_step
-            monitor.save()
+            reporter.update(current_segment_text=self.current_step)
 
             logger.info(f"[Task {self.task_id}] 开始ASR识别: {vocals_path}")
 
@@ -668,8 +858,7 @@ class ASRRecognizeTask:
             # 更新进度: 导入segments
             self.current_step = '正在导入识别结果...'
             self.progress_percentage = 70
-            monitor.current_segment_text = self.current_step
-            monitor.save()
+            reporter.update(current_segment_text=self.current_step)
 
             logger.info(f"[Task {self.task_id}] 识别完成，共{len(result['segments'])}个段落")
 
@@ -704,12 +893,13 @@ class ASRRecognizeTask:
             self.end_time = timezone.now()
 
             # 更新监控记录
-            monitor.status = 'completed'
-            monitor.end_time = timezone.now()
-            monitor.total_segments = self.segments_count
-            monitor.completed_segments = self.segments_count
-            monitor.current_segment_text = f'已识别{self.segments_count}个段落'
-            monitor.save()
+            reporter.finish(
+                'completed',
+                end_time=timezone.now(),
+                total_segments=self.segments_count,
+                completed_segments=self.segments_count,
+                current_segment_text=f'已识别{self.segments_count}个段落'
+            )
 
             logger.info(f"[Task {self.task_id}] ASR识别完成: {self.segments_count}个段落")
 
@@ -724,7 +914,7 @@ class ASRRecognizeTask:
                 monitor.status = 'failed'
                 monitor.error_message = str(e)
                 monitor.end_time = timezone.now()
-                monitor.save()
+                monitor.save(update_fields=['status', 'error_message', 'end_time', 'updated_at'])
             except Exception:
                 pass
 
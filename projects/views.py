@@ -9,6 +9,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.http import HttpResponse
 from .models import Project
@@ -20,7 +21,9 @@ from .serializers import (
 from services.business.project_service import ProjectService
 from services.parsers.srt_parser import SRTParser
 from services.clients.minimax_client import MiniMaxClient
-from services.audio_processor import AudioProcessor
+from services.utils.progress_broker import progress_broker, EventStreamRenderer, sse_response
+from services.utils.progress_reporter import ProgressReporter
+from services.utils.cancellation import OperationCancelled, cancellation_registry
 from backend.exceptions import (
     ValidationError, handle_business_logic_error
 )
@@ -28,6 +31,20 @@ from backend.exceptions import (
 logger = logging.getLogger(__name__)
 
 
+def parse_bool(value, default: bool = False) -> bool:
+    """
+    解析请求中的布尔参数
+
+    JSON 请求体中是布尔值，表单和查询字符串中是 "true" / "false" / "1" / "0" 等字符串，
+    直接 bool("false") 会得到 True。
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 class ProjectViewSet(viewsets.ModelViewSet):
     """项目管理ViewSet"""
     permission_classes = [IsAuthenticated]
@@ -243,11 +260,22 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     'message': '已完成人声分离，如需重新分离请设置force=true'
                 }, status=status.HTTP_200_OK)
 
+        # 质量档位：fast / balanced / best，auto（默认）按时长、排队情况和项目截止时间自动选择
+        from services.audio_separator.profiles import AUTO_PROFILE, SEPARATION_PROFILES
+        profile = request.data.get('profile') or None
+        if profile is not None and profile != AUTO_PROFILE and profile not in SEPARATION_PROFILES:
+            raise ValidationError(f"未知的分离档位: {profile}")
+
+        # speech_only：只对字幕段落覆盖的区间运行Demucs（对白稀疏的视频明显更快），未指定时使用系统配置
+        speech_only = request.data.get('speech_only')
+        if speech_only is not None:
+            speech_only = parse_bool(speech_only)
+
         # 启动后台任务
         from .tasks import start_vocal_separation_task
-        task_id = start_vocal_separation_task(project.id)
+        task_id = start_vocal_separation_task(project.id, profile=profile, speech_only=speech_only)
 
-        logger.info(f"人声分离任务已启动: 项目{project.name}, 任务ID={task_id}")
+        logger.info(f"人声分离任务已启动: 项目{project.name}, 任务ID={task_id}, 档位={profile or '默认'}")
 
         return Response({
             'success': True,
@@ -350,8 +378,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         }
                     )
 
-                    # 初始化翻译客户端 - 使用用户的API Key
-                    client = MiniMaxClient(api_key=user_api_key, group_id=user_group_id)
+                    # 进度写入合并：计数变化只推送内存，数据库按间隔批量写入
+                    reporter = ProgressReporter(monitor)
+
+                    # 初始化翻译客户端 - 使用用户的API Key，取消时中止进行中的请求
+                    client = MiniMaxClient(api_key=user_api_key, group_id=user_group_id, cancel_token=cancel_token)
                     target_lang_display = project.get_target_lang_display()
                     custom_vocabulary = project.custom_vocabulary or []
 
@@ -365,6 +396,9 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     ).order_by('index')
 
                     for segment in segments_to_translate:
+                        if cancel_token.is_cancelled:
+                            break
+
                         try:
                             # 检查是否有原文
                             if not segment.original_text or not segment.original_text.strip():
@@ -392,35 +426,40 @@ class ProjectViewSet(viewsets.ModelViewSet):
                                 logger.error(f"[{task_id}] {error_msg}")
 
                             # 更新监控记录
-                            monitor.completed_segments = completed
-                            monitor.failed_segments = failed
-                            monitor.current_segment_text = segment.original_text[:50] + "..." if len(segment.original_text) > 50 else segment.original_text
-                            monitor.save()
+                            reporter.update(
+                                completed_segments=completed,
+                                failed_segments=failed,
+                                current_segment_text=segment.original_text[:50] + "..." if len(segment.original_text) > 50 else segment.original_text
+                            )
 
                             # 控制API调用频率
                             request_interval = config.batch_translate_request_interval
                             if completed + failed < len(segment_ids):  # 最后一个请求不需要等待
                                 logger.debug(f"[{task_id}] 等待{request_interval}秒后处理下一个段落")
-                                time.sleep(request_interval)
+                                cancel_token.sleep(request_interval)
 
+                        except OperationCancelled:
+                            break
                         except Exception as e:
                             failed += 1
                             error_msg = f"段落{segment.index}翻译异常: {str(e)}"
                             logger.error(f"[{task_id}] {error_msg}")
 
-                            monitor.completed_segments = completed
-                            monitor.failed_segments = failed
-                            monitor.error_message = error_msg
-                            monitor.save()
+                            reporter.update(
+                                completed_segments=completed,
+                                failed_segments=failed,
+                                error_message=error_msg
+                            )
 
                     # 任务完成，更新监控记录
-                    monitor.status = 'completed'
-                    monitor.end_time = timezone.now()
-                    monitor.completed_segments = completed
-                    monitor.failed_segments = failed
-                    monitor.save()
+                    reporter.finish(
+                        'cancelled' if cancel_token.is_cancelled else 'completed',
+                        end_time=timezone.now(),
+                        completed_segments=completed,
+                        failed_segments=failed
+                    )
 
-                    logger.info(f"[{task_id}] 批量翻译完成，成功{completed}个，失败{failed}个")
+                    logger.info(f"[{task_id}] 批量翻译结束（{'已取消' if cancel_token.is_cancelled else '已完成'}），成功{completed}个，失败{failed}个")
 
                 except Exception as e:
                     logger.error(f"[{task_id}] 翻译任务执行失败: {str(e)}")
@@ -432,9 +471,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         monitor.status = 'failed'
                         monitor.error_message = str(e)
                         monitor.end_time = timezone.now()
-                        monitor.save()
+                        monitor.save(update_fields=['status', 'error_message', 'end_time', 'updated_at'])
                     except Exception:
                         pass
+                finally:
+                    cancellation_registry.remove(task_id)
+
+            # 取消令牌：停止接口触发，或由巡检线程发现其他进程写入的取消状态
+            cancel_token = self._create_cancel_token(task_id)
 
             # 在单独线程中启动任务，不阻塞当前HTTP响应
             threading.Thread(target=async_translate_task, daemon=True).start()
@@ -463,36 +507,32 @@ class ProjectViewSet(viewsets.ModelViewSet):
             task_id = request.query_params.get('task_id')
 
             if task_id:
-                # 使用数据库任务监控获取进度
-                from system_monitor.models import TaskMonitor
-
-                try:
-                    monitor = TaskMonitor.objects.get(task_id=task_id)
-
-                    # 转换为前端期望的格式
-                    progress = {
-                        'status': monitor.status,
-                        'total': monitor.total_segments,
-                        'completed': monitor.completed_segments,
-                        'failed': monitor.failed_segments,
-                        'current_segment_text': monitor.current_segment_text or '',
-                        'estimated_time_remaining': 0,  # 可以后续根据时间计算
-                        'error_messages': [monitor.error_message] if monitor.error_message else []
-                    }
-
-                    logger.info(f"返回真实进度: 任务{task_id}, {progress['completed']}/{progress['total']}, 状态: {progress['status']}")
-
-                    return Response({
-                        'success': True,
-                        'progress': progress
-                    })
-
-                except TaskMonitor.DoesNotExist:
+                # 优先读取进程内进度快照，任务不在本进程运行时读取数据库
+                snapshot = self._get_task_progress(task_id)
+                if snapshot is None:
                     # 任务不存在
                     return Response({
                         'success': False,
                         'error': '任务不存在或已过期'
                     }, status=status.HTTP_404_NOT_FOUND)
+
+                # 转换为前端期望的格式
+                progress = {
+                    'status': snapshot['status'],
+                    'total': snapshot['total'],
+                    'completed': snapshot['completed'],
+                    'failed': snapshot['failed'],
+                    'current_segment_text': snapshot['current_segment_text'],
+                    'estimated_time_remaining': 0,  # 可以后续根据时间计算
+                    'error_messages': snapshot['error_messages']
+                }
+
+                logger.info(f"返回真实进度: 任务{task_id}, {progress['completed']}/{progress['total']}, 状态: {progress['status']}")
+
+                return Response({
+                    'success': True,
+                    'progress': progress
+                })
             else:
                 return Response({
                     'success': True,
@@ -528,7 +568,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 if monitor.status == 'running':
                     monitor.status = 'cancelled'
                     monitor.end_time = timezone.now()
-                    monitor.save()
+                    monitor.save(update_fields=['status', 'end_time', 'updated_at'])
+
+                    # 任务在本进程时立即中止；否则由任务所在进程的巡检线程发现取消状态
+                    cancellation_registry.cancel(task_id)
 
                     logger.info(f"手动停止批量翻译任务: {task_id}")
 
@@ -641,6 +684,9 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         }
                     )
 
+                    # 进度写入合并：计数和步骤变化只推送内存，数据库按间隔批量写入
+                    reporter = ProgressReporter(monitor)
+
                     # 初始化服务
                     service = SegmentService(user=request.user)
 
@@ -654,6 +700,9 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     ).order_by('index')
 
                     for segment in segments_to_process:
+                        if cancel_token.is_cancelled:
+                            break
+
                         try:
                             # 检查是否有译文
                             if not segment.translated_text or not segment.translated_text.strip():
@@ -663,16 +712,17 @@ class ProjectViewSet(viewsets.ModelViewSet):
                             logger.info(f"[{task_id}] 开始TTS段落{segment.index}: {segment.translated_text[:50]}...")
 
                             # 更新当前步骤
-                            monitor.current_step = f"处理段落{segment.index}"
-                            monitor.current_segment_text = segment.translated_text[:50] + "..." if len(segment.translated_text) > 50 else segment.translated_text
-                            monitor.save()
+                            reporter.update(
+                                current_step=f"处理段落{segment.index}",
+                                current_segment_text=segment.translated_text[:50] + "..." if len(segment.translated_text) > 50 else segment.translated_text
+                            )
 
                             # 调用现有的单段落TTS处理逻辑
                             from services.algorithms.timestamp_aligner import TimestampAligner
                             from services.clients.minimax_client import MiniMaxClient
 
-                            # 初始化客户端和对齐器
-                            client = MiniMaxClient(api_key=request.user.api_key, group_id=request.user.group_id)
+                            # 初始化客户端和对齐器（对齐器沿用客户端的取消令牌）
+                            client = MiniMaxClient(api_key=request.user.api_key, group_id=request.user.group_id, cancel_token=cancel_token)
                             aligner = TimestampAligner(client)
 
                             # 调用现有的TTS处理逻辑，保持不变
@@ -689,36 +739,41 @@ class ProjectViewSet(viewsets.ModelViewSet):
                                 logger.error(f"[{task_id}] 段落{segment.index}TTS失败")
 
                             # 更新监控记录
-                            monitor.completed_segments = completed
-                            monitor.failed_segments = failed
-                            monitor.silent_segments = silent
-                            monitor.save()
+                            reporter.update(
+                                completed_segments=completed,
+                                failed_segments=failed,
+                                silent_segments=silent
+                            )
 
                             # 控制API调用频率 - TTS比翻译需要更严格的控制
                             request_interval = config.batch_tts_request_interval
                             if completed + failed + silent < len(segment_ids):  # 最后一个请求不需要等待
                                 logger.debug(f"[{task_id}] 等待{request_interval}秒后处理下一个段落")
-                                time.sleep(request_interval)
+                                cancel_token.sleep(request_interval)
 
+                        except OperationCancelled:
+                            break
                         except Exception as e:
                             failed += 1
                             error_msg = f"段落{segment.index}TTS异常: {str(e)}"
                             logger.error(f"[{task_id}] {error_msg}")
 
-                            monitor.completed_segments = completed
-                            monitor.failed_segments = failed
-                            monitor.silent_segments = silent
-                            monitor.error_message = error_msg
-                            monitor.save()
+                            reporter.update(
+                                completed_segments=completed,
+                                failed_segments=failed,
+                                silent_segments=silent,
+                                error_message=error_msg
+                            )
 
                     # 任务完成，更新监控记录
-                    monitor.status = 'completed'
-                    monitor.end_time = timezone.now()
-                    monitor.completed_segments = completed
-                    monitor.failed_segments = failed
-                    monitor.silent_segments = silent
-                    monitor.current_step = "任务完成"
-                    monitor.save()
+                    reporter.finish(
+                        'cancelled' if cancel_token.is_cancelled else 'completed',
+                        end_time=timezone.now(),
+                        completed_segments=completed,
+                        failed_segments=failed,
+                        silent_segments=silent,
+                        current_step="任务已取消" if cancel_token.is_cancelled else "任务完成"
+                    )
 
                     logger.info(f"[{task_id}] 批量TTS完成，成功{completed}个，静音{silent}个，失败{failed}个")
 
@@ -731,9 +786,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         monitor.status = 'failed'
                         monitor.error_message = str(e)
                         monitor.end_time = timezone.now()
-                        monitor.save()
+                        monitor.save(update_fields=['status', 'error_message', 'end_time', 'updated_at'])
                     except Exception:
                         pass
+                finally:
+                    cancellation_registry.remove(task_id)
+
+            # 取消令牌：停止接口触发，或由巡检线程发现其他进程写入的取消状态
+            cancel_token = self._create_cancel_token(task_id)
 
             # 在单独线程中启动任务，不阻塞当前HTTP响应
             threading.Thread(target=async_tts_task, daemon=True).start()
@@ -762,38 +822,34 @@ class ProjectViewSet(viewsets.ModelViewSet):
             task_id = request.query_params.get('task_id')
 
             if task_id:
-                # 使用数据库任务监控获取进度
-                from system_monitor.models import TaskMonitor
-
-                try:
-                    monitor = TaskMonitor.objects.get(task_id=task_id)
-
-                    # 转换为前端期望的格式，包含TTS特有字段
-                    progress = {
-                        'status': monitor.status,
-                        'total': monitor.total_segments,
-                        'completed': monitor.completed_segments,
-                        'failed': monitor.failed_segments,
-                        'silent': monitor.silent_segments,  # TTS特有：静音段落数
-                        'current_segment_text': monitor.current_segment_text or '',
-                        'current_step': monitor.current_step or '',  # TTS特有：当前步骤
-                        'estimated_time_remaining': 0,  # 可以后续根据时间计算
-                        'error_messages': [monitor.error_message] if monitor.error_message else []
-                    }
-
-                    logger.info(f"返回TTS进度: 任务{task_id}, {progress['completed']}/{progress['total']}, 静音{progress['silent']}, 状态: {progress['status']}")
-
-                    return Response({
-                        'success': True,
-                        'progress': progress
-                    })
-
-                except TaskMonitor.DoesNotExist:
+                # 优先读取进程内进度快照，任务不在本进程运行时读取数据库
+                snapshot = self._get_task_progress(task_id)
+                if snapshot is None:
                     # 任务不存在
                     return Response({
                         'success': False,
                         'error': '任务不存在或已过期'
                     }, status=status.HTTP_404_NOT_FOUND)
+
+                # 转换为前端期望的格式，包含TTS特有字段
+                progress = {
+                    'status': snapshot['status'],
+                    'total': snapshot['total'],
+                    'completed': snapshot['completed'],
+                    'failed': snapshot['failed'],
+                    'silent': snapshot['silent'],  # TTS特有：静音段落数
+                    'current_segment_text': snapshot['current_segment_text'],
+                    'current_step': snapshot['current_step'],  # TTS特有：当前步骤
+                    'estimated_time_remaining': 0,  # 可以后续根据时间计算
+                    'error_messages': snapshot['error_messages']
+                }
+
+                logger.info(f"返回TTS进度: 任务{task_id}, {progress['completed']}/{progress['total']}, 静音{progress['silent']}, 状态: {progress['status']}")
+
+                return Response({
+                    'success': True,
+                    'progress': progress
+                })
             else:
                 return Response({
                     'success': True,
@@ -829,7 +885,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     monitor.status = 'cancelled'
                     monitor.end_time = timezone.now()
                     monitor.current_step = "任务已取消"
-                    monitor.save()
+                    monitor.save(update_fields=['status', 'end_time', 'current_step', 'updated_at'])
+
+                    # 任务在本进程时立即中止；否则由任务所在进程的巡检线程发现取消状态
+                    cancellation_registry.cancel(task_id)
 
                     logger.info(f"手动停止批量TTS任务: {task_id}")
 
@@ -918,6 +977,9 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         }
                     )
 
+                    # 进度写入合并：步骤变化只推送内存，数据库按间隔批量写入
+                    reporter = ProgressReporter(monitor)
+
                     # 重新获取segments（因为在新线程中）
                     from segments.models import Segment
                     segments_list = list(Segment.objects.filter(
@@ -986,8 +1048,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     }
 
                     # 更新状态：调用LLM API
-                    monitor.current_step = f'正在调用LLM API分析{len(segments_list)}个段落...'
-                    monitor.save()
+                    reporter.update(current_step=f'正在调用LLM API分析{len(segments_list)}个段落...')
 
                     logger.info(f"[{task_id}] 开始调用LLM API (流式)")
 
@@ -1003,15 +1064,15 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     logger.info(f"[{task_id}] 收到流式响应, trace_id: {trace_id}, status: {response.status_code}")
 
                     if response.status_code != 200:
-                        monitor.status = 'failed'
-                        monitor.error_message = f'LLM API返回错误: {response.status_code}'
-                        monitor.end_time = timezone.now()
-                        monitor.save()
+                        reporter.finish(
+                            'failed',
+                            error_message=f'LLM API返回错误: {response.status_code}',
+                            end_time=timezone.now()
+                        )
                         return
 
                     # 更新状态：接收数据
-                    monitor.current_step = f'正在接收LLM分析结果... (trace_id: {trace_id})'
-                    monitor.save()
+                    reporter.update(current_step=f'正在接收LLM分析结果... (trace_id: {trace_id})')
 
                     # 流式接收内容
                     full_content = ""
@@ -1042,8 +1103,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
                                         # 每100个chunk更新一次进度
                                         if chunk_count % 100 == 0:
-                                            monitor.current_step = f'正在接收数据... (已收到{chunk_count}个数据块)'
-                                            monitor.save()
+                                            reporter.update(current_step=f'正在接收数据... (已收到{chunk_count}个数据块)')
 
                             except json.JSONDecodeError:
                                 pass
@@ -1053,8 +1113,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     logger.info(f"[{task_id}] 内容后100字符: {repr(full_content[-100:])}")
 
                     # 更新状态：解析JSON
-                    monitor.current_step = f'正在解析LLM返回的JSON数据...'
-                    monitor.save()
+                    reporter.update(current_step=f'正在解析LLM返回的JSON数据...')
 
                     # 解析JSON
                     try:
@@ -1093,15 +1152,15 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         logger.error(f"[{task_id}] 完整内容已保存到: {debug_file}")
                         logger.error(f"[{task_id}] 错误位置附近内容: {json_content[max(0, 21877-50):min(len(json_content), 21877+50)]}...")
 
-                        monitor.status = 'failed'
-                        monitor.error_message = f'JSON解析失败: {str(e)} (内容已保存到{debug_file})'
-                        monitor.end_time = timezone.now()
-                        monitor.save()
+                        reporter.finish(
+                            'failed',
+                            error_message=f'JSON解析失败: {str(e)} (内容已保存到{debug_file})',
+                            end_time=timezone.now()
+                        )
                         return
 
                     # 更新状态：更新voice_mappings
-                    monitor.current_step = '正在更新项目角色配置...'
-                    monitor.save()
+                    reporter.update(current_step='正在更新项目角色配置...')
 
                     # 收集speaker_name
                     speaker_names_by_id = {}
@@ -1127,8 +1186,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     logger.info(f"[{task_id}] 已更新voice_mappings: {new_voice_mappings}")
 
                     # 更新状态：更新段落
-                    monitor.current_step = f'正在更新{len(segments_list)}个段落的说话人信息...'
-                    monitor.save()
+                    reporter.update(current_step=f'正在更新{len(segments_list)}个段落的说话人信息...')
 
                     # 构建segment映射
                     segments_by_index = {seg.index: seg for seg in segments_list}
@@ -1155,16 +1213,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
                             # 每10个段落更新一次进度
                             if updated_count % 10 == 0:
-                                monitor.completed_segments = updated_count
-                                monitor.current_step = f'已更新 {updated_count}/{len(segments_list)} 个段落...'
-                                monitor.save()
+                                reporter.update(
+                                    completed_segments=updated_count,
+                                    current_step=f'已更新 {updated_count}/{len(segments_list)} 个段落...'
+                                )
 
                     # 任务完成
-                    monitor.status = 'completed'
-                    monitor.completed_segments = updated_count
-                    monitor.end_time = timezone.now()
-                    monitor.current_step = f'完成！成功更新{updated_count}个段落'
-                    monitor.save()
+                    reporter.finish(
+                        'completed',
+                        completed_segments=updated_count,
+                        end_time=timezone.now(),
+                        current_step=f'完成！成功更新{updated_count}个段落'
+                    )
 
                     logger.info(f"[{task_id}] 自动分配说话人完成，成功更新{updated_count}个段落")
 
@@ -1175,7 +1235,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         monitor.status = 'failed'
                         monitor.error_message = str(e)
                         monitor.end_time = timezone.now()
-                        monitor.save()
+                        monitor.save(update_fields=['status', 'error_message', 'end_time', 'updated_at'])
                     except:
                         pass
 
@@ -1203,8 +1263,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
         获取自动分配说话人任务的进度
         """
         try:
-            from system_monitor.models import TaskMonitor
-
             project = self.get_object()
             task_id = request.query_params.get('task_id')
 
@@ -1214,28 +1272,26 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     'error': '缺少task_id参数'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                monitor = TaskMonitor.objects.get(task_id=task_id)
-
-                progress = {
-                    'status': monitor.status,
-                    'total': monitor.total_segments,
-                    'completed': monitor.completed_segments,
-                    'current_step': monitor.current_step or '',
-                    'error_message': monitor.error_message or ''
-                }
-
-                return Response({
-                    'success': True,
-                    'progress': progress
-                })
-
-            except TaskMonitor.DoesNotExist:
+            snapshot = self._get_task_progress(task_id)
+            if snapshot is None:
                 return Response({
                     'success': False,
                     'error': '任务不存在或已过期'
                 }, status=status.HTTP_404_NOT_FOUND)
 
+            progress = {
+                'status': snapshot['status'],
+                'total': snapshot['total'],
+                'completed': snapshot['completed'],
+                'current_step': snapshot['current_step'],
+                'error_message': snapshot['error_message']
+            }
+
+            return Response({
+                'success': True,
+                'progress': progress
+            })
+
         except Exception as e:
             logger.error(f"获取进度失败: {str(e)}")
             return Response({
@@ -1243,6 +1299,58 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 'error': f'获取进度失败: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def progress_stream(self, request, pk=None):
+        """
+        订阅后台任务进度（Server-Sent Events）
+
+        适用于批量翻译、批量TTS、自动分配说话人等所有TaskMonitor任务。
+        首帧推送完整快照（snapshot），之后只推送变化字段（delta），任务结束时推送 end 事件。
+        同一任务的多个订阅者共享一次数据库轮询，推送频率受进度中心限流。
+        """
+        from system_monitor.models import TaskMonitor
+
+        project = self.get_object()
+        task_id = request.query_params.get('task_id')
+
+        if not task_id:
+            return Response({
+                'success': False,
+                'error': '缺少task_id参数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not TaskMonitor.objects.filter(task_id=task_id, project_id=project.id).exists():
+            return Response({
+                'success': False,
+                'error': '任务不存在或已过期'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        def load_snapshot():
+            monitor = TaskMonitor.objects.filter(task_id=task_id).first()
+            return monitor.progress_snapshot() if monitor else None
+
+        return sse_response(task_id, load_snapshot)
+
+    def _create_cancel_token(self, task_id):
+        """创建任务取消令牌，绑定数据库中的取消状态以支持跨进程停止"""
+        from system_monitor.models import TaskMonitor
+
+        return cancellation_registry.create(
+            task_id,
+            source=lambda: TaskMonitor.objects.filter(task_id=task_id, status='cancelled').exists()
+        )
+
+    def _get_task_progress(self, task_id):
+        """获取任务进度快照：优先读取进程内进度中心，任务不在本进程运行时读取数据库"""
+        from system_monitor.models import TaskMonitor
+
+        snapshot = progress_broker.get_snapshot(task_id)
+        if snapshot is not None:
+            return snapshot
+
+        monitor = TaskMonitor.objects.filter(task_id=task_id).first()
+        return monitor.progress_snapshot() if monitor else None
+
     def _seconds_to_srt_time(self, seconds):
         """将秒数转换为SRT时间格式"""
         hours = int(seconds // 3600)
@@ -1439,91 +1547,173 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def concatenate_audio(self, request, pk=None):
         """
-        拼接项目中所有音频段落为完整音频文件
+        拼接项目中所有音频段落为完整音频文件（提交到媒体worker异步执行）
+
+        Returns:
+        {
+            "success": true,
+            "task_id": "concatenate_audio_1_ab12cd34",
+            "status": "pending"
+        }
+        任务完成后通过 media_job_status 获取 audio_url
         """
         import uuid
-        from django.conf import settings
 
         project = self.get_object()
         trace_id = str(uuid.uuid4())[:8]
 
         try:
-            logger.info(f"[{trace_id}] 开始拼接项目音频: {project.name}")
+            logger.info(f"[{trace_id}] 提交音频拼接任务: {project.name}")
 
-            # 获取所有有音频的段落
-            segments = project.segments.filter(
+            has_audio = project.segments.filter(
                 translated_audio_url__isnull=False
             ).exclude(
                 translated_audio_url__exact=''
-            ).order_by('index')
+            ).exists()
 
-            if not segments.exists():
+            if not has_audio:
                 return Response({
                     'error': '没有可用的音频段落进行拼接'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # 准备音频段落数据
-            audio_segments = []
-            for segment in segments:
-                audio_segments.append({
-                    'start_time': segment.start_time,
-                    'end_time': segment.end_time,
-                    'audio_url': segment.translated_audio_url,
-                    'index': segment.index
-                })
+            return self._submit_media_job(project, 'concatenate_audio', {
+                'trace_id': trace_id,
+                'base_url': request.build_absolute_uri('/').rstrip('/')
+            }, '音频拼接任务已提交')
 
-            # 创建输出文件路径 - 使用项目ID作为固定文件名
-            output_dir = os.path.join(settings.MEDIA_ROOT, 'concatenated')
-            os.makedirs(output_dir, exist_ok=True)
+        except Exception as e:
+            logger.error(f"[{trace_id}] 提交音频拼接任务失败: {str(e)}")
+            return Response({
+                'error': f'音频拼接失败: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # 使用项目ID确保文件名唯一且固定
-            safe_project_name = "".join(c for c in project.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            output_filename = f"project_{project.id}_{safe_project_name}_complete.mp3"
-            output_path = os.path.join(output_dir, output_filename)
+    def _submit_media_job(self, project, job_type, payload, message):
+        """提交媒体任务并返回 202 响应（同类任务已在执行时返回该任务）"""
+        from .media_jobs import submit_media_job
 
-            # 执行音频拼接
-            processor = AudioProcessor()
-            success = processor.concatenate_audios(
-                audio_segments=audio_segments,
-                output_path=output_path,
-                trace_id=trace_id
-            )
+        monitor, created = submit_media_job(project, job_type, payload)
+        return Response({
+            'success': True,
+            'task_id': monitor.task_id,
+            'status': monitor.status,
+            'message': message if created else '任务正在处理中，请勿重复提交'
+        }, status=status.HTTP_202_ACCEPTED)
 
-            if success:
-                # 生成访问URL
-                audio_url = request.build_absolute_uri(
-                    f'/media/concatenated/{output_filename}'
-                )
+    def _get_media_job(self, project, task_id):
+        from system_monitor.models import TaskMonitor
+        from .media_jobs import MEDIA_JOB_HANDLERS
 
-                # 保存到项目模型中
-                project.concatenated_audio_url = audio_url
-                project.save(update_fields=['concatenated_audio_url'])
+        return TaskMonitor.objects.filter(
+            task_id=task_id,
+            project_id=project.id,
+            task_type__in=list(MEDIA_JOB_HANDLERS)
+        ).first()
 
-                logger.info(f"[{trace_id}] 音频拼接成功并保存到项目: {audio_url}")
+    @handle_business_logic_error
+    @action(detail=True, methods=['get'])
+    def media_job_status(self, request, pk=None):
+        """
+        查询媒体任务（音频拼接、视频合成、ASR识别）状态
 
-                return Response({
-                    'success': True,
-                    'audio_url': audio_url,
-                    'segments_count': len(audio_segments),
-                    'trace_id': trace_id,
-                    'message': f'成功拼接{len(audio_segments)}个音频段落'
-                })
-            else:
-                return Response({
-                    'error': '音频拼接失败，请查看日志'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        Query Params:
+            task_id: 提交任务时返回的任务ID
 
-        except Exception as e:
-            logger.error(f"[{trace_id}] 音频拼接异常: {str(e)}")
+        Returns:
+        {
+            "success": true,
+            "task_id": "...",
+            "task_type": "synthesize_video",
+            "status": "pending/running/completed/failed/cancelled",
+            "current_step": "步骤 2/2: 合成最终视频",
+            "progress": 50,
+            "queue_position": 0,
+            "result": {...},
+            "error": ""
+        }
+        """
+        from system_monitor.models import TaskMonitor
+        from .media_jobs import MEDIA_JOB_HANDLERS
+
+        project = self.get_object()
+        task_id = request.query_params.get('task_id')
+
+        if not task_id:
             return Response({
-                'error': f'音频拼接失败: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'success': False,
+                'error': '缺少task_id参数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        monitor = self._get_media_job(project, task_id)
+        if monitor is None:
+            return Response({
+                'success': False,
+                'error': '任务不存在或已过期'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        snapshot = self._get_task_progress(task_id) or monitor.progress_snapshot()
+
+        queue_position = 0
+        if snapshot['status'] == 'pending':
+            queue_position = TaskMonitor.objects.filter(
+                status='pending',
+                task_type__in=list(MEDIA_JOB_HANDLERS),
+                created_at__lte=monitor.created_at
+            ).count()
+
+        total = snapshot['total']
+        return Response({
+            'success': True,
+            'task_id': task_id,
+            'task_type': monitor.task_type,
+            'status': snapshot['status'],
+            'current_step': snapshot['current_step'],
+            'progress': 100 if snapshot['status'] == 'completed' else (int(snapshot['completed'] * 100 / total) if total else 0),
+            'queue_position': queue_position,
+            'result': snapshot.get('result') or {},
+            'error': snapshot['error_message']
+        })
+
+    @handle_business_logic_error
+    @action(detail=True, methods=['post'])
+    def cancel_media_job(self, request, pk=None):
+        """取消排队中或执行中的媒体任务"""
+        project = self.get_object()
+        task_id = request.data.get('task_id')
+
+        if not task_id:
+            return Response({
+                'success': False,
+                'error': '缺少task_id参数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        monitor = self._get_media_job(project, task_id)
+        if monitor is None:
+            return Response({
+                'success': False,
+                'error': '任务不存在或已过期'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if monitor.status not in ('pending', 'running'):
+            return Response({
+                'success': False,
+                'error': '任务已结束，无法取消'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 媒体worker的巡检线程发现取消状态后终止子进程
+        monitor.status = 'cancelled'
+        monitor.end_time = timezone.now()
+        monitor.save(update_fields=['status', 'end_time', 'updated_at'])
+
+        return Response({
+            'success': True,
+            'message': '任务已取消'
+        })
 
     @handle_business_logic_error
     @action(detail=True, methods=['post'])
     def asr_recognize(self, request, pk=None):
         """
-        使用阿里云 FlashRecognizer 识别人声分离后的音频并导入项目（同步API）
+        使用阿里云 FlashRecognizer 识别人声分离后的音频并导入项目（提交到媒体worker异步执行）
 
         Request Body:
         {
@@ -1536,9 +1726,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
         Returns:
         {
             "success": true,
-            "message": "识别成功，已导入 13 个字幕段落",
-            "segments_count": 13
+            "task_id": "asr_recognize_1_ab12cd34",
+            "status": "pending"
         }
+        任务完成后 media_job_status 的 result 中包含 message 和 segments_count
         """
         import uuid
         trace_id = str(uuid.uuid4())[:8]
@@ -1585,16 +1776,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
             logger.info(f"[{trace_id}] 音频文件: {vocal_audio_path}")
 
-            # 创建 FlashRecognizer 服务
             from services.asr import FlashRecognizerService
 
-            recognizer = FlashRecognizerService(
-                app_key=app_key,
-                access_key_id=access_key_id,
-                access_key_secret=access_key_secret,
-                region='cn-shanghai'
-            )
-
             # 确定音频格式
             file_ext = os.path.splitext(vocal_audio_path)[1].lower()
             format_map = {
@@ -1619,61 +1802,17 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
             logger.info(f"[{trace_id}] 识别参数: language={source_language} ({language_hint}), merge={merge_short_segments}, min_duration={min_duration}s, max_gap={max_gap}s")
 
-            # 执行识别并获取段落数据
-            success, segments, error_msg = recognizer.recognize_and_create_segments(
-                audio_file_path=vocal_audio_path,
-                audio_format=audio_format,
-                merge_short_segments=merge_short_segments,
-                min_duration=min_duration,
-                max_gap=max_gap,
-                language_hints=language_hints
-            )
-
-            if not success:
-                logger.error(f"[{trace_id}] ASR 识别失败: {error_msg}")
-                return Response({
-                    'success': False,
-                    'error': error_msg
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            if not segments:
-                logger.warning(f"[{trace_id}] ASR 识别结果为空")
-                return Response({
-                    'success': False,
-                    'error': '识别结果为空，请检查音频文件是否包含有效语音内容'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # 导入识别结果到数据库
-            from segments.models import Segment
-
-            # 删除现有的所有段落
-            Segment.objects.filter(project=project).delete()
-
-            # 批量创建新段落
-            segment_objects = []
-            for seg_data in segments:
-                segment_objects.append(Segment(
-                    project=project,
-                    index=seg_data['index'],
-                    start_time=seg_data['start_time'],
-                    end_time=seg_data['end_time'],
-                    original_text=seg_data['original_text'],
-                    translated_text=seg_data.get('translated_text', ''),
-                    speaker=seg_data.get('speaker', 'SPEAKER_00'),
-                    target_duration=seg_data.get('duration', seg_data['end_time'] - seg_data['start_time']),
-                    status='pending'
-                ))
-
-            Segment.objects.bulk_create(segment_objects)
-
-            segments_count = len(segment_objects)
-            logger.info(f"[{trace_id}] ASR 识别成功，已导入 {segments_count} 个字幕段落")
-
-            return Response({
-                'success': True,
-                'message': f'识别成功，已导入 {segments_count} 个字幕段落',
-                'segments_count': segments_count
-            })
+            # 识别和导入由媒体worker执行
+            return self._submit_media_job(project, 'asr_recognize', {
+                'trace_id': trace_id,
+                'user_id': user.id,
+                'audio_path': vocal_audio_path,
+                'audio_format': audio_format,
+                'language_hints': language_hints,
+                'merge_short_segments': merge_short_segments,
+                'min_duration': min_duration,
+                'max_gap': max_gap
+            }, 'ASR识别任务已提交')
 
         except Exception as e:
             logger.error(f"[{trace_id}] ASR 识别失败: {str(e)}", exc_info=True)
@@ -1687,7 +1826,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def synthesize_video(self, request, pk=None):
         """
-        合成最终视频：混合翻译音频和背景音，然后与原始视频合并
+        合成最终视频：混合翻译音频和背景音，然后与原始视频合并（提交到媒体worker异步执行）
 
         工作流程:
         1. 混合翻译音频（拼接后的完整TTS音频）和背景音
@@ -1697,22 +1836,22 @@ class ProjectViewSet(viewsets.ModelViewSet):
         Request Body:
         {
             "translated_volume": 1.0,    // 翻译音频音量（0.0-1.0），默认 1.0
-            "background_volume": 0.3     // 背景音音量（0.0-1.0），默认 0.3
+            "background_volume": 0.3,    // 背景音音量（0.0-1.0），默认 0.3
+            "mode": "single_pass",       // single_pass: 单次ffmpeg混音+合成（默认）；two_pass: 先混音再合成
+            "package_hls": false,        // 合成后打包 HLS 分片，默认 false
+            "include_original_audio": true  // HLS 中附加原声音轨，默认 true
         }
 
         Returns:
         {
             "success": true,
-            "message": "视频合成成功",
-            "mixed_audio_url": "http://...",
-            "final_video_url": "http://..."
+            "task_id": "synthesize_video_1_ab12cd34",
+            "status": "pending"
         }
+        任务完成后 media_job_status 的 result 中包含 mixed_audio_url 和 final_video_url（打包HLS时还有 hls_master_url）
         """
         import uuid
-        from django.conf import settings
-        from services.audio_processor import AudioProcessor
-        from services.video_processor import VideoProcessor
-        from django.core.files import File
+        from .media_jobs import concatenated_audio_path
 
         project = self.get_object()
         trace_id = str(uuid.uuid4())[:8]
@@ -1743,22 +1882,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
             translated_volume = float(request.data.get('translated_volume', 1.0))
             background_volume = float(request.data.get('background_volume', 0.3))
 
-            logger.info(f"[{trace_id}] 音量参数: 翻译={translated_volume}, 背景={background_volume}")
+            mode = request.data.get('mode', 'single_pass')
+            if mode not in ('single_pass', 'two_pass'):
+                return Response({
+                    'success': False,
+                    'error': f'不支持的合成模式: {mode}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            logger.info(f"[{trace_id}] 音量参数: 翻译={translated_volume}, 背景={background_volume}, 模式={mode}")
 
             # 2. 准备文件路径
             # 翻译音频URL转本地路径
-            concatenated_audio_url = project.concatenated_audio_url
-            if concatenated_audio_url.startswith('http'):
-                # 从URL中提取相对路径
-                from urllib.parse import urlparse
-                parsed = urlparse(concatenated_audio_url)
-                relative_path = parsed.path.lstrip('/')
-                if relative_path.startswith('media/'):
-                    relative_path = relative_path[6:]  # 去掉 'media/' 前缀
-                translated_audio_path = os.path.join(settings.MEDIA_ROOT, relative_path)
-            else:
-                # 已经是相对路径
-                translated_audio_path = os.path.join(settings.MEDIA_ROOT, concatenated_audio_url.lstrip('/'))
+            translated_audio_path = concatenated_audio_path(project)
 
             background_audio_path = project.background_audio_path.path
             video_path = project.video_file_path.path
@@ -1786,90 +1921,197 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     'error': f'视频文件不存在: {video_path}'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # 3. 混合音频
-            logger.info(f"[{trace_id}] 步骤 1/2: 混合音频轨道")
+            # 3. 混合音频、合成视频由媒体worker执行
+            return self._submit_media_job(project, 'synthesize_video', {
+                'trace_id': trace_id,
+                'base_url': request.build_absolute_uri('/').rstrip('/'),
+                'translated_audio_path': translated_audio_path,
+                'background_audio_path': background_audio_path,
+                'video_path': video_path,
+                'translated_volume': translated_volume,
+                'background_volume': background_volume,
+                'mode': mode,
+                'package_hls': parse_bool(request.data.get('package_hls'), False),
+                'include_original_audio': parse_bool(request.data.get('include_original_audio'), True)
+            }, '视频合成任务已提交')
+
+        except Exception as e:
+            logger.error(f"[{trace_id}] 视频合成失败: {str(e)}", exc_info=True)
+            return Response({
+                'success': False,
+                'error': f'视频合成失败: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @handle_business_logic_error
+    @action(detail=True, methods=['post'])
+    def render_preview(self, request, pk=None):
+        """
+        渲染时间窗口预览视频（同步执行，只处理与窗口重叠的段落，无需先拼接整段音频）
 
-            audio_processor = AudioProcessor()
-            mixed_audio_filename = f"project_{project.id}_mixed_{trace_id}.mp3"
-            mixed_audio_path = os.path.join(settings.MEDIA_ROOT, 'audio', 'mixed', mixed_audio_filename)
+        Request Body:
+        {
+            "start_time": 120.0,         // 窗口起点（秒）
+            "end_time": 150.0,           // 窗口终点（秒），窗口长度不超过 PREVIEW_MAX_WINDOW_SECONDS
+            "translated_volume": 1.0,    // 翻译音频音量（0.0-1.0），默认 1.0
+            "background_volume": 0.3     // 背景音音量（0.0-1.0），默认 0.3
+        }
 
-            # 确保目录存在
-            os.makedirs(os.path.dirname(mixed_audio_path), exist_ok=True)
+        Returns:
+        {
+            "success": true,
+            "preview_url": "http://.../media/videos/preview/1/preview_118.00_150.00_ab12cd34.mp4",
+            "start_time": 118.0,         // 实际起点（对齐到关键帧时早于请求的起点）
+            "end_time": 150.0,
+            "segments_count": 12,
+            "video_copied": true,
+            "elapsed": 1.42
+        }
+        """
+        import uuid
+        from .media_jobs import MediaJobError
+        from .preview import render_preview_window
 
-            success = audio_processor.mix_audio_tracks(
-                translated_audio_path=translated_audio_path,
-                background_audio_path=background_audio_path,
-                output_path=mixed_audio_path,
+        project = self.get_object()
+        trace_id = str(uuid.uuid4())[:8]
+
+        try:
+            start_time = float(request.data.get('start_time'))
+            end_time = float(request.data.get('end_time'))
+            translated_volume = float(request.data.get('translated_volume', 1.0))
+            background_volume = float(request.data.get('background_volume', 0.3))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': 'start_time/end_time 参数无效'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"[{trace_id}] 渲染预览: {project.name} {start_time}s-{end_time}s")
+
+        try:
+            result = render_preview_window(
+                project,
+                start_time,
+                end_time,
                 translated_volume=translated_volume,
                 background_volume=background_volume,
+                base_url=request.build_absolute_uri('/').rstrip('/'),
                 trace_id=trace_id
             )
+        except MediaJobError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            if not success:
-                return Response({
-                    'success': False,
-                    'error': '音频混合失败'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'success': True, **result})
 
-            # 保存混合音频路径
-            with open(mixed_audio_path, 'rb') as f:
-                project.mixed_audio_path.save(mixed_audio_filename, File(f), save=False)
+    @handle_business_logic_error
+    @action(detail=True, methods=['post'])
+    def package_hls(self, request, pk=None):
+        """
+        将已合成的最终视频打包为 HLS（fMP4分片，提交到媒体worker异步执行）
 
-            logger.info(f"[{trace_id}] 音频混合完成")
+        视频流直接复制；配音为默认音轨，可附加原声音轨供播放器切换。
 
-            # 4. 合成视频
-            logger.info(f"[{trace_id}] 步骤 2/2: 合成最终视频")
+        Request Body:
+        {
+            "include_original_audio": true   // 附加原声音轨，默认 true
+        }
 
-            video_processor = VideoProcessor()
+        Returns:
+        {
+            "success": true,
+            "task_id": "package_hls_1_ab12cd34",
+            "status": "pending"
+        }
+        任务完成后 media_job_status 的 result 中包含 hls_master_url
+        """
+        import uuid
 
-            # 检查 ffmpeg
-            if not video_processor.check_ffmpeg():
-                return Response({
-                    'success': False,
-                    'error': 'ffmpeg 未安装或不可用'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        project = self.get_object()
+        trace_id = str(uuid.uuid4())[:8]
 
-            final_video_filename = f"project_{project.id}_final_{trace_id}.mp4"
-            final_video_path = os.path.join(settings.MEDIA_ROOT, 'videos', 'final', final_video_filename)
+        if not project.final_video_path or not os.path.exists(project.final_video_path.path):
+            return Response({
+                'success': False,
+                'error': '请先合成最终视频'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            # 确保目录存在
-            os.makedirs(os.path.dirname(final_video_path), exist_ok=True)
+        return self._submit_media_job(project, 'package_hls', {
+            'trace_id': trace_id,
+            'base_url': request.build_absolute_uri('/').rstrip('/'),
+            'include_original_audio': parse_bool(request.data.get('include_original_audio'), True)
+        }, 'HLS 打包任务已提交')
 
-            success, error_msg = video_processor.replace_audio(
-                video_path=video_path,
-                audio_path=mixed_audio_path,
-                output_path=final_video_path,
-                trace_id=trace_id
-            )
+    @handle_business_logic_error
+    @action(detail=True, methods=['post'])
+    def synthesize_multilang(self, request, pk=None):
+        """
+        多语言合成：将同一视频的多个语言项目的配音合成为一个多音轨视频（提交到媒体worker异步执行）
 
-            if not success:
-                return Response({
-                    'success': False,
-                    'error': error_msg
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        视频流只复制一次，背景音（当前项目的人声分离结果）各语言共用；
+        每种语言一条带语言标签的音轨，当前项目的语言为默认音轨。
 
-            # 保存最终视频路径
-            with open(final_video_path, 'rb') as f:
-                project.final_video_path.save(final_video_filename, File(f), save=False)
+        Request Body:
+        {
+            "project_ids": [12, 13],        // 其他语言的项目ID（同一原始视频，均已拼接音频）
+            "translated_volume": 1.0,       // 配音音量（0.0-1.0），默认 1.0
+            "background_volume": 0.3,       // 背景音音量（0.0-1.0），默认 0.3
+            "include_original_audio": false // 附加原声音轨，默认 false
+        }
 
-            project.save()
+        Returns:
+        {
+            "success": true,
+            "task_id": "synthesize_multilang_1_ab12cd34",
+            "status": "pending"
+        }
+        任务完成后 media_job_status 的 result 中包含 video_url 和 languages
+        """
+        import uuid
+        from .media_jobs import MediaJobError, collect_multilang_tracks
 
-            logger.info(f"[{trace_id}] 视频合成成功")
+        project = self.get_object()
+        trace_id = str(uuid.uuid4())[:8]
 
-            # 生成访问URL
-            mixed_audio_url = request.build_absolute_uri(project.mixed_audio_path.url)
-            final_video_url = request.build_absolute_uri(project.final_video_path.url)
+        try:
+            project_ids = [int(pid) for pid in request.data.get('project_ids', [])]
+            translated_volume = float(request.data.get('translated_volume', 1.0))
+            background_volume = float(request.data.get('background_volume', 0.3))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': '参数格式错误'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
+        if not project_ids:
             return Response({
-                'success': True,
-                'message': '视频合成成功',
-                'mixed_audio_url': mixed_audio_url,
-                'final_video_url': final_video_url
-            })
+                'success': False,
+                'error': '请选择至少一个其他语言的项目'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            logger.error(f"[{trace_id}] 视频合成失败: {str(e)}", exc_info=True)
+        if not project.video_file_path or not project.background_audio_path:
             return Response({
                 'success': False,
-                'error': f'视频合成失败: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': '当前项目缺少原始视频或背景音，请先上传视频并进行人声分离'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # 请求线程中只做廉价校验（文件名 / 大小），内容哈希比较由媒体worker执行
+            tracks = collect_multilang_tracks(project, project_ids, verify_content=False)
+        except MediaJobError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"[{trace_id}] 提交多语言合成: {project.name}, 语言={[track['title'] for track in tracks]}")
+
+        return self._submit_media_job(project, 'synthesize_multilang', {
+            'trace_id': trace_id,
+            'base_url': request.build_absolute_uri('/').rstrip('/'),
+            'project_ids': project_ids,
+            'translated_volume': translated_volume,
+            'background_volume': background_volume,
+            'include_original_audio': parse_bool(request.data.get('include_original_audio'), False)
+        }, '多语言合成任务已提交')
@@ -9,6 +9,7 @@ import os
 from typing import Dict, Any, Optional
 from pydub import AudioSegment
 from services.clients.minimax_client import MiniMaxClient
+from services.utils.cancellation import CancellationToken, OperationCancelled
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +22,15 @@ class TimestampAlignmentError(Exception):
 class TimestampAligner:
     """时间戳对齐器"""
 
-    def __init__(self, minimax_client: MiniMaxClient):
+    def __init__(self, minimax_client: MiniMaxClient, cancel_token: Optional[CancellationToken] = None):
         self.client = minimax_client
+        # 取消令牌：默认沿用客户端的令牌，每个对齐步骤之间检查
+        self.cancel_token = cancel_token or getattr(minimax_client, 'cancel_token', None)
+
+    def _check_cancelled(self):
+        """步骤之间检查取消信号"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
 
     def calculate_speed_steps(self, max_speed: float) -> dict:
         """
@@ -158,6 +166,7 @@ class TimestampAligner:
 
         try:
             # 第一步：生成初始TTS音频
+            self._check_cancelled()
             logger.info("第一步: 生成初始TTS音频")
             step1_result = self.client.text_to_speech(
                 text=current_text,
@@ -205,6 +214,7 @@ class TimestampAligner:
                 }
 
             # 第二步：LLM翻译优化
+            self._check_cancelled()
             logger.info("第二步: LLM翻译优化")
             if original_text:  # 只有在提供原文的情况下才进行翻译优化
                 target_char_count = int(len(current_text) * target_duration / t_tts)
@@ -267,6 +277,7 @@ class TimestampAligner:
                             }
 
             # 第三步：调整speed参数
+            self._check_cancelled()
             logger.info("第三步: 调整speed参数")
             current_speed = round(min(t_tts / target_duration + speed_config['step3_increment'], max_speed), 2)
             step3_result = self.client.text_to_speech(
@@ -310,6 +321,7 @@ class TimestampAligner:
                     }
 
             # 第四步：speed增加重试
+            self._check_cancelled()
             logger.info("第四步: speed增加重试")
             current_speed = round(min(current_speed + speed_config['step4_increment'], max_speed), 2)
             step4_result = self.client.text_to_speech(
@@ -353,6 +365,7 @@ class TimestampAligner:
                     }
 
             # 第五步：最大speed最后尝试
+            self._check_cancelled()
             logger.info(f"第五步: speed={speed_config['step5_speed']}最后尝试")
             current_speed = speed_config['step5_speed']
             step5_result = self.client.text_to_speech(
@@ -418,6 +431,9 @@ class TimestampAligner:
                 'trace_ids': trace_ids
             }
 
+        except OperationCancelled:
+            logger.info("时间戳对齐已取消")
+            raise
         except Exception as e:
             logger.error(f"时间戳对齐过程中出错: {str(e)}")
             raise TimestampAlignmentError(f"时间戳对齐失败: {str(e)}")
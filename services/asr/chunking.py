@@ -0,0 +1,168 @@
+"""
+长音频分块识别：静音切分与时间戳拼接
+
+FlashRecognizer 单次同步请求有超时上限，整段上传时视频越长越容易失败。分块识别：
+1. ffmpeg silencedetect 检测人声音轨中的静音（人声分离后背景已去除，静音检测比较可靠）
+2. 在不超过分块上限的前提下，尽量在最靠后的静音中点切分；找不到静音时在上限处硬切
+3. 各块并发识别（见 FlashRecognizerService.recognize_chunked），耗时约等于最慢的一块
+4. 每块的 begin_time/end_time 加上块起点偏移；切点两侧紧贴切点的句子视为被切断的同一句，合并为一句
+"""
+import logging
+import os
+import re
+import subprocess
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from services.utils.cancellation import CancellationToken
+from services.utils.ffmpeg_runner import probe_duration, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# 单块最长时长（秒）
+DEFAULT_CHUNK_SECONDS = 240.0
+# 单块最短时长（秒）：避免在开头附近的静音处切出过短的块
+MIN_CHUNK_SECONDS = 30.0
+# 静音检测阈值（dB）和最短静音时长（秒）
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+# 切点两侧的句子距切点都不超过该值（毫秒）时视为被切断的同一句
+JOIN_GAP_MS = 300
+
+# ametadata 输出的帧元数据，如 lavfi.silence_start=12.34
+_SILENCE_START_RE = re.compile(r'lavfi\.silence_start=(-?[\d.]+)')
+_SILENCE_END_RE = re.compile(r'lavfi\.silence_end=(-?[\d.]+)')
+_ASCII_WORD_RE = re.compile(r'[A-Za-z0-9]')
+
+
+def detect_silences(
+    audio_path: str,
+    noise_db: float = SILENCE_NOISE_DB,
+    min_silence: float = SILENCE_MIN_SECONDS,
+    cancel_token: Optional[CancellationToken] = None
+) -> Tuple[List[Tuple[float, float]], float]:
+    """
+    检测音频中的静音区间
+
+    silencedetect 的结果通过 ametadata 写入临时文件（run_ffmpeg 只保留 stderr 末尾几十行，长音频的静音日志会被截断）。
+
+    Returns:
+        (静音区间列表 [(开始秒, 结束秒)], 音频时长)；检测失败时静音列表为空
+
+    Raises:
+        OperationCancelled: 任务被取消
+    """
+    duration = probe_duration(audio_path)
+    fd, metadata_path = tempfile.mkstemp(prefix='asr_silence_', suffix='.txt')
+    os.close(fd)
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', audio_path, '-vn',
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence},ametadata=mode=print:file={metadata_path}',
+        '-f', 'null', '-'
+    ]
+    try:
+        try:
+            result = run_ffmpeg(cmd, duration=duration, cancel_token=cancel_token)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"[ASR分块] 静音检测失败 {audio_path}: {e}")
+            return [], duration
+        if result.returncode != 0:
+            logger.warning(f"[ASR分块] 静音检测失败 {audio_path}: {result.stderr.strip()[-300:]}")
+            return [], duration
+        with open(metadata_path, encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    finally:
+        try:
+            os.remove(metadata_path)
+        except OSError:
+            pass
+
+    silences = []
+    start = None
+    for line in lines:
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None and duration > start:
+        # 结尾处的静音没有 silence_end
+        silences.append((start, duration))
+    return silences, duration
+
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    max_seconds: float = DEFAULT_CHUNK_SECONDS,
+    min_seconds: float = MIN_CHUNK_SECONDS
+) -> List[Tuple[float, float]]:
+    """
+    规划分块：每块不超过 max_seconds，优先在静音中点切分
+
+    Returns:
+        [(起点秒, 终点秒)]，首尾相接覆盖整段音频
+    """
+    min_seconds = min(min_seconds, max_seconds / 2)
+    cut_points = sorted((start + end) / 2 for start, end in silences)
+    chunks = []
+    start = 0.0
+    while duration - start > max_seconds:
+        limit = start + max_seconds
+        candidates = [point for point in cut_points if start + min_seconds <= point <= limit]
+        cut = candidates[-1] if candidates else limit
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration))
+    return chunks
+
+
+def _join_text(left: str, right: str) -> str:
+    """连接被切断的句子：去掉前半句末尾的标点，英文等按空格连接"""
+    left = left.rstrip('。，、,.')
+    if _ASCII_WORD_RE.match(left[-1:]) and _ASCII_WORD_RE.match(right[:1]):
+        return f"{left} {right}"
+    return f"{left}{right}"
+
+
+def stitch_sentences(
+    chunk_results: List[Tuple[float, List[Dict]]],
+    join_gap_ms: int = JOIN_GAP_MS
+) -> List[Dict]:
+    """
+    拼接各块识别结果
+
+    Args:
+        chunk_results: [(块起点秒, 块内句子列表)]，按时间顺序
+        join_gap_ms: 切点合并阈值（毫秒）
+
+    Returns:
+        时间戳为整段音频绝对时间（毫秒）的句子列表
+    """
+    stitched: List[Dict] = []
+    joined = 0
+    for index, (chunk_start, sentences) in enumerate(chunk_results):
+        offset_ms = int(round(chunk_start * 1000))
+        shifted = []
+        for sentence in sentences:
+            sentence = dict(sentence)
+            sentence['begin_time'] = sentence.get('begin_time', 0) + offset_ms
+            sentence['end_time'] = sentence.get('end_time', 0) + offset_ms
+            shifted.append(sentence)
+
+        if index > 0 and stitched and shifted:
+            previous, first = stitched[-1], shifted[0]
+            if (previous['end_time'] >= offset_ms - join_gap_ms
+                    and first['begin_time'] <= offset_ms + join_gap_ms):
+                previous['text'] = _join_text(previous.get('text', ''), first.get('text', ''))
+                previous['end_time'] = first['end_time']
+                shifted = shifted[1:]
+                joined += 1
+        stitched.extend(shifted)
+
+    if joined:
+        logger.info(f"[ASR分块] 合并了 {joined} 个被切点切断的句子")
+    return stitched
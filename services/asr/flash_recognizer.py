@@ -7,21 +7,56 @@
 
 import json
 import os
+import tempfile
+import threading
+import time
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode
 from typing import Dict, List, Optional, Tuple
 
+from services.utils.cancellation import CancellationToken
+
+from .chunking import DEFAULT_CHUNK_SECONDS, detect_silences, plan_chunks, stitch_sentences
+from .preprocess import ORIGINAL_FORMAT, get_upload_format, prepare_upload_audio
+
 logger = logging.getLogger(__name__)
 
+# FlashRecognizer 响应状态码：Token 无效或已过期
+TOKEN_INVALID_STATUS = 40000001
+
 
 class AliyunTokenManager:
-    """阿里云 NLS AccessToken 管理器"""
+    """
+    阿里云 NLS AccessToken 管理器
 
-    @staticmethod
-    def get_access_token(access_key_id: str, access_key_secret: str, region: str = 'cn-shanghai') -> Optional[str]:
+    Token 有效期通常为数小时（CreateToken 响应中的 ExpireTime），按 (AccessKey ID, 区域) 缓存，
+    在过期前 TOKEN_REFRESH_MARGIN 秒提前刷新，避免每次识别都重新创建 AcsClient 并请求 CreateToken。
+    """
+
+    # 提前刷新的余量（秒）
+    TOKEN_REFRESH_MARGIN = 600
+
+    _cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    # 每个 (AccessKey ID, 区域) 一把刷新锁：同一账号的并发请求只刷新一次，不同账号互不阻塞
+    _refresh_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    # 只保护上面两个字典，持有期间不做网络请求
+    _lock = threading.Lock()
+
+    @classmethod
+    def _cached_token(cls, key: Tuple[str, str]) -> Optional[str]:
+        """未到提前刷新时间的缓存 Token"""
+        with cls._lock:
+            cached = cls._cache.get(key)
+        if cached and cached[1] - time.time() > cls.TOKEN_REFRESH_MARGIN:
+            return cached[0]
+        return None
+
+    @classmethod
+    def get_access_token(cls, access_key_id: str, access_key_secret: str, region: str = 'cn-shanghai') -> Optional[str]:
         """
-        动态获取阿里云 NLS 的 AccessToken
+        获取阿里云 NLS 的 AccessToken（优先使用缓存）
 
         Args:
             access_key_id: 阿里云 AccessKey ID
@@ -31,6 +66,41 @@ class AliyunTokenManager:
         Returns:
             AccessToken 字符串，失败返回 None
         """
+        key = (access_key_id, region)
+        token = cls._cached_token(key)
+        if token:
+            return token
+
+        with cls._lock:
+            refresh_lock = cls._refresh_locks.setdefault(key, threading.Lock())
+
+        with refresh_lock:
+            # 等锁期间其他线程可能已经刷新
+            token = cls._cached_token(key)
+            if token:
+                return token
+
+            created = cls._create_token(access_key_id, access_key_secret, region)
+            if created is None:
+                return None
+            with cls._lock:
+                cls._cache[key] = created
+            return created[0]
+
+    @classmethod
+    def invalidate(cls, access_key_id: str, region: str = 'cn-shanghai'):
+        """丢弃缓存的 Token（服务端判定 Token 无效时调用）"""
+        with cls._lock:
+            cls._cache.pop((access_key_id, region), None)
+
+    @staticmethod
+    def _create_token(access_key_id: str, access_key_secret: str, region: str) -> Optional[Tuple[str, float]]:
+        """
+        请求 CreateToken
+
+        Returns:
+            (Token, 过期时间戳)，失败返回 None
+        """
         try:
             from aliyunsdkcore.client import AcsClient
             from aliyunsdkcore.request import CommonRequest
@@ -52,9 +122,9 @@ class AliyunTokenManager:
 
             if 'Token' in jss and 'Id' in jss['Token']:
                 token = jss['Token']['Id']
-                expire_time = jss['Token']['ExpireTime']
-                logger.info(f"AccessToken 获取成功，过期时间: {expire_time}")
-                return token
+                expire_time = float(jss['Token']['ExpireTime'])
+                logger.info(f"AccessToken 获取成功，过期时间: {expire_time:.0f}（{expire_time - time.time():.0f}s 后）")
+                return token, expire_time
             else:
                 logger.error("Token 响应格式错误")
                 return None
@@ -92,7 +162,8 @@ class FlashRecognizerService:
         # 默认使用中文
     }
 
-    def __init__(self, app_key: str, access_key_id: str, access_key_secret: str, region: str = 'cn-shanghai'):
+    def __init__(self, app_key: str, access_key_id: str, access_key_secret: str, region: str = 'cn-shanghai',
+                 cancel_token: Optional[CancellationToken] = None):
         """
         初始化 FlashRecognizer 服务
 
@@ -101,11 +172,13 @@ class FlashRecognizerService:
             access_key_id: 阿里云 AccessKey ID
             access_key_secret: 阿里云 AccessKey Secret
             region: 区域，默认 cn-shanghai
+            cancel_token: 取消令牌，取消时终止音频预处理（ffmpeg）并不再上传
         """
         self.app_key = app_key
         self.access_key_id = access_key_id
         self.access_key_secret = access_key_secret
         self.region = region
+        self.cancel_token = cancel_token
         self.gateway_url = f"https://nls-gateway-{region}.aliyuncs.com/stream/v1/FlashRecognizer"
 
     @classmethod
@@ -136,7 +209,8 @@ class FlashRecognizerService:
         sample_rate: int = 16000,
         enable_punctuation: bool = True,
         enable_itn: bool = True,
-        language_hints: Optional[List[str]] = None
+        language_hints: Optional[List[str]] = None,
+        preprocess: bool = True
     ) -> Tuple[bool, Dict]:
         """
         使用 FlashRecognizer 识别音频文件
@@ -148,6 +222,8 @@ class FlashRecognizerService:
             enable_punctuation: 启用标点预测
             enable_itn: 启用逆文本正则化
             language_hints: 语言提示列表，如 ['zh-cn', 'en-us']，默认自动检测
+            preprocess: 上传前转换为 16kHz 单声道压缩音频（格式见 settings.ASR_UPLOAD_FORMAT），
+                转换后 audio_format 和 sample_rate 以实际上传文件为准
 
         Returns:
             (success: bool, result: dict)
@@ -179,16 +255,43 @@ class FlashRecognizerService:
             logger.error("无法获取 AccessToken")
             return False, {'error': '无法获取 AccessToken，请检查 AccessKey 配置和权限'}
 
-        # 读取音频文件
+        upload_format = get_upload_format() if preprocess else ORIGINAL_FORMAT
+        with tempfile.TemporaryDirectory(prefix='asr_upload_') as work_dir:
+            upload_path = audio_file_path
+            if upload_format != ORIGINAL_FORMAT:
+                try:
+                    upload_path, audio_format, sample_rate = prepare_upload_audio(
+                        audio_file_path, work_dir, upload_format, cancel_token=self.cancel_token
+                    )
+                except RuntimeError as e:
+                    # 预处理失败时上传原文件，识别仍可进行
+                    logger.warning(f"{e}，改为上传原始音频")
+
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            return self._upload_and_recognize(
+                token, upload_path, audio_format, sample_rate,
+                enable_punctuation, enable_itn, language_hints
+            )
+
+    def _upload_and_recognize(
+        self,
+        token: str,
+        audio_file_path: str,
+        audio_format: str,
+        sample_rate: int,
+        enable_punctuation: bool,
+        enable_itn: bool,
+        language_hints: Optional[List[str]]
+    ) -> Tuple[bool, Dict]:
+        """上传音频并解析识别结果（请求体从磁盘流式读取，不整体载入内存）"""
         try:
-            with open(audio_file_path, mode='rb') as f:
-                audio_content = f.read()
-        except Exception as e:
+            file_size = os.path.getsize(audio_file_path)
+        except OSError as e:
             logger.error(f"读取音频文件失败: {str(e)}")
             return False, {'error': f'读取音频文件失败: {str(e)}'}
 
-        file_size_kb = len(audio_content) / 1024
-        logger.info(f"开始识别音频: {audio_file_path} ({file_size_kb:.2f} KB)")
+        logger.info(f"开始识别音频: {audio_file_path} ({file_size / 1024:.2f} KB)")
 
         # 构建请求参数
         params = {
@@ -204,14 +307,13 @@ class FlashRecognizerService:
 
         # 添加语言提示（JSON数组格式）
         if language_hints:
-            import json
             params['language_hints'] = json.dumps(language_hints)
 
         url = f"{self.gateway_url}?{urlencode(params)}"
 
         headers = {
             'Content-Type': f'audio/{audio_format}',
-            'Content-Length': str(len(audio_content))
+            'Content-Length': str(file_size)
         }
 
         # 检查代理设置
@@ -221,15 +323,17 @@ class FlashRecognizerService:
         }
 
         try:
-            logger.info(f"正在上传并识别音频 (格式: {audio_format}, 大小: {len(audio_content)} 字节)")
-
-            response = requests.post(
-                url,
-                data=audio_content,
-                headers=headers,
-                proxies=proxies if proxies['http'] or proxies['https'] else None,
-                timeout=120  # 2分钟超时
-            )
+            logger.info(f"正在上传并识别音频 (格式: {audio_format}, 采样率: {sample_rate}, 大小: {file_size} 字节)")
+
+            # 传入文件对象，requests 按块发送请求体
+            with open(audio_file_path, mode='rb') as f:
+                response = requests.post(
+                    url,
+                    data=f,
+                    headers=headers,
+                    proxies=proxies if proxies['http'] or proxies['https'] else None,
+                    timeout=120  # 2分钟超时
+                )
 
             logger.info(f"API 响应状态: {response.status_code} {response.reason}")
 
@@ -254,6 +358,9 @@ class FlashRecognizerService:
             else:
                 error_msg = result.get('message', '未知错误')
                 logger.error(f"识别失败: 状态码={status}, 消息={error_msg}")
+                if status == TOKEN_INVALID_STATUS:
+                    # 缓存的 Token 已失效（如在控制台被吊销），下次识别重新获取
+                    AliyunTokenManager.invalidate(self.access_key_id, self.region)
                 return False, {
                     'error': error_msg,
                     'status': status,
@@ -273,6 +380,133 @@ class FlashRecognizerService:
             logger.error(traceback.format_exc())
             return False, {'error': f'识别失败: {str(e)}'}
 
+    @staticmethod
+    def _chunk_settings() -> Tuple[float, int]:
+        """分块识别配置：(单块最长秒数，0 表示不分块, 并发数)"""
+        try:
+            from django.conf import settings
+            chunk_seconds = float(getattr(settings, 'ASR_CHUNK_SECONDS', DEFAULT_CHUNK_SECONDS) or 0)
+            max_workers = int(getattr(settings, 'ASR_MAX_CONCURRENCY', 4))
+        except Exception:
+            chunk_seconds, max_workers = DEFAULT_CHUNK_SECONDS, 4
+        return chunk_seconds, max(1, max_workers)
+
+    def recognize_chunked(
+        self,
+        audio_file_path: str,
+        audio_format: str = 'mp3',
+        chunk_seconds: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        enable_punctuation: bool = True,
+        enable_itn: bool = True,
+        language_hints: Optional[List[str]] = None
+    ) -> Tuple[bool, Dict]:
+        """
+        按静音切分后并发识别，结果时间戳为整段音频的绝对时间
+
+        音频不超过单块上限时等同于 recognize。
+
+        Args:
+            chunk_seconds: 单块最长秒数，默认 settings.ASR_CHUNK_SECONDS
+            max_workers: 并发识别数，默认 settings.ASR_MAX_CONCURRENCY
+            其余参数同 recognize
+
+        Returns:
+            同 recognize；另含 'chunks'（分块数）
+        """
+        default_chunk_seconds, default_workers = self._chunk_settings()
+        chunk_seconds = chunk_seconds or default_chunk_seconds
+        max_workers = max_workers or default_workers
+
+        if not os.path.exists(audio_file_path):
+            logger.error(f"音频文件不存在: {audio_file_path}")
+            return False, {'error': '音频文件不存在'}
+
+        chunks = []
+        if chunk_seconds:
+            silences, duration = detect_silences(audio_file_path, cancel_token=self.cancel_token)
+            if duration > 0:
+                chunks = plan_chunks(duration, silences, chunk_seconds)
+        if len(chunks) <= 1:
+            return self.recognize(
+                audio_file_path, audio_format,
+                enable_punctuation=enable_punctuation, enable_itn=enable_itn, language_hints=language_hints
+            )
+
+        token = self._get_token()
+        if not token:
+            logger.error("无法获取 AccessToken")
+            return False, {'error': '无法获取 AccessToken，请检查 AccessKey 配置和权限'}
+
+        # 分块必须重新编码；配置为上传原文件时使用无损 wav
+        upload_format = get_upload_format()
+        if upload_format == ORIGINAL_FORMAT:
+            upload_format = 'wav'
+
+        logger.info(
+            f"分块识别: {audio_file_path} 分为 {len(chunks)} 块 "
+            f"(单块不超过 {chunk_seconds:.0f}s, 并发 {min(max_workers, len(chunks))})"
+        )
+
+        with tempfile.TemporaryDirectory(prefix='asr_chunks_') as work_dir:
+            def recognize_chunk(index: int, start: float, end: float) -> Tuple[bool, Dict]:
+                try:
+                    chunk_path, chunk_format, chunk_rate = prepare_upload_audio(
+                        audio_file_path, work_dir, upload_format,
+                        start=start, duration=end - start, name=f'chunk_{index:04d}',
+                        cancel_token=self.cancel_token
+                    )
+                except RuntimeError as e:
+                    return False, {'error': str(e)}
+                if self.cancel_token is not None:
+                    self.cancel_token.raise_if_cancelled()
+                return self._upload_and_recognize(
+                    token, chunk_path, chunk_format, chunk_rate,
+                    enable_punctuation, enable_itn, language_hints
+                )
+
+            with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(chunks)), thread_name_prefix='asr-chunk'
+            ) as executor:
+                futures = [
+                    executor.submit(recognize_chunk, index, start, end)
+                    for index, (start, end) in enumerate(chunks)
+                ]
+                try:
+                    results = [future.result() for future in futures]
+                except BaseException:
+                    # 取消或异常：尚未开始的块不再执行
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        chunk_results = []
+        task_ids = []
+        for index, ((start, end), (success, result)) in enumerate(zip(chunks, results)):
+            if not success:
+                error_msg = result.get('error', '识别失败')
+                logger.error(f"第 {index + 1}/{len(chunks)} 块 [{start:.1f}s, {end:.1f}s] 识别失败: {error_msg}")
+                return False, {
+                    'error': f'第 {index + 1}/{len(chunks)} 段音频识别失败: {error_msg}',
+                    'status': result.get('status'),
+                    'task_id': result.get('task_id', '')
+                }
+            chunk_results.append((start, result.get('sentences', [])))
+            task_ids.append(result.get('task_id', ''))
+
+        sentences = stitch_sentences(chunk_results)
+        duration_ms = int(round(chunks[-1][1] * 1000))
+        logger.info(f"分块识别完成: {len(chunks)} 块，共 {len(sentences)} 个句子，总时长: {duration_ms}ms")
+
+        return True, {
+            'sentences': sentences,
+            'duration': duration_ms,
+            'task_id': ','.join(task_ids),
+            'status': 20000000,
+            'message': 'SUCCESS',
+            'chunks': len(chunks)
+        }
+
     def recognize_and_create_segments(
         self,
         audio_file_path: str,
@@ -309,7 +543,8 @@ class FlashRecognizerService:
                 ...
             ]
         """
-        success, result = self.recognize(audio_file_path, audio_format, language_hints=language_hints)
+        # 长音频按静音分块并发识别（不超过单块上限时整段识别）
+        success, result = self.recognize_chunked(audio_file_path, audio_format, language_hints=language_hints)
 
         if not success:
             error_msg = result.get('error', '识别失败')
@@ -0,0 +1,16 @@
+"""
+音频引擎模块
+
+提供基于 NumPy 的时间轴混音、段落音频并行预取、分块流式混音、内部无损工作格式、解码 PCM 缓存等功能
+"""
+
+from .formats import codec_args_for_path, get_working_format, working_extension
+from .pcm_cache import PCMTrack, get_cached_pcm
+from .prefetch import AudioPrefetcher
+from .stream_mix import db_to_gain, stream_mix
+from .timeline import TimelineMixer, audio_segment_to_array
+
+__all__ = [
+    'AudioPrefetcher', 'TimelineMixer', 'audio_segment_to_array', 'db_to_gain', 'stream_mix',
+    'codec_args_for_path', 'get_working_format', 'working_extension', 'PCMTrack', 'get_cached_pcm',
+]
@@ -0,0 +1,53 @@
+"""
+内部音频工作格式
+
+拼接音频（concatenated/）和两步合成的混合音频（audio/mixed/）只是流水线中间产物，
+使用有损 MP3 交接会在每一步付出编码/解码CPU并累积音质损失。
+工作格式由 settings.AUDIO_WORKING_FORMAT 配置：
+- flac（默认）：无损压缩，体积约为WAV的一半，浏览器可直接播放
+- wav：无损不压缩，编解码开销最低
+- mp3：兼容旧行为
+最终交付（视频中的AAC音轨）只编码一次。
+"""
+import os
+from typing import List, Optional
+
+WORKING_FORMATS = {
+    'flac': {'extension': '.flac', 'codec_args': ['-c:a', 'flac', '-compression_level', '3']},
+    'wav': {'extension': '.wav', 'codec_args': ['-c:a', 'pcm_s16le']},
+    'mp3': {'extension': '.mp3', 'codec_args': ['-c:a', 'libmp3lame', '-b:a', '192k']},
+}
+
+DEFAULT_WORKING_FORMAT = 'flac'
+
+
+def get_working_format() -> str:
+    """当前配置的工作格式（配置无效时使用默认值）"""
+    try:
+        from django.conf import settings
+        fmt = str(getattr(settings, 'AUDIO_WORKING_FORMAT', DEFAULT_WORKING_FORMAT)).lower()
+    except Exception:
+        fmt = DEFAULT_WORKING_FORMAT
+    return fmt if fmt in WORKING_FORMATS else DEFAULT_WORKING_FORMAT
+
+
+def working_extension(fmt: Optional[str] = None) -> str:
+    """工作格式的文件扩展名（含点）"""
+    return WORKING_FORMATS[fmt or get_working_format()]['extension']
+
+
+def codec_args_for_path(path: str) -> List[str]:
+    """
+    按输出文件扩展名选择 ffmpeg 编码参数
+
+    Args:
+        path: 输出文件路径
+
+    Returns:
+        ffmpeg 编码参数；未知扩展名时由 ffmpeg 自行选择
+    """
+    ext = os.path.splitext(path)[1].lower()
+    for spec in WORKING_FORMATS.values():
+        if spec['extension'] == ext:
+            return list(spec['codec_args'])
+    return []
@@ -0,0 +1,153 @@
+"""
+解码后的 PCM 缓存
+
+调整背景音量后重新合成时，背景音（Demucs输出）和拼接配音都没有变化，却每次都要重新解码、重采样。
+PCM 缓存把源文件解码为固定采样率/声道的 s16le 裸数据，保存在项目级缓存目录：
+- 以源文件路径、大小、修改时间和目标格式命名，源文件变化（如重新分离、重新拼接）后自动失效
+- 混音时通过 np.memmap 按块读取（不占用进程内存），增益在 NumPy 中逐块相乘
+- ffmpeg 也可以直接以 -f s16le 读取，无需解析容器、解码和重采样
+音量调整后只需重新执行最终的混音和编码。
+"""
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from services.utils.cancellation import CancellationToken
+from services.utils.ffmpeg_runner import probe_duration, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_WIDTH = 2  # s16le
+
+
+class PCMTrack:
+    """缓存中的 PCM 音轨（s16le 交错存储）"""
+
+    def __init__(self, path: str, sample_rate: int, channels: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = os.path.getsize(path) // (PCM_SAMPLE_WIDTH * channels)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def memmap(self) -> np.ndarray:
+        """只读内存映射，形状 (帧数, 声道数)"""
+        if self.frames == 0:
+            return np.zeros((0, self.channels), dtype=np.int16)
+        return np.memmap(self.path, dtype=np.int16, mode='r', shape=(self.frames, self.channels))
+
+    def ffmpeg_input_args(self):
+        """作为 ffmpeg 输入的参数（放在 -i 之前的格式说明 + -i 路径）"""
+        return ['-f', 's16le', '-ar', str(self.sample_rate), '-ac', str(self.channels), '-i', self.path]
+
+
+class MemmapPCMReader:
+    """从 PCMTrack 按块读取 float32 采样（接口与 stream_mix.FFmpegPCMReader 一致）"""
+
+    def __init__(self, track: PCMTrack):
+        self.track = track
+        self.channels = track.channels
+        self.samples = track.memmap()
+        self.position = 0
+        self.finished = False
+
+    def read(self, frames: int) -> np.ndarray:
+        if self.finished:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        block = self.samples[self.position:self.position + frames]
+        self.position += block.shape[0]
+        if block.shape[0] < frames:
+            self.finished = True
+        return block.astype(np.float32) / 32768.0
+
+    def close(self) -> int:
+        self.samples = None
+        return 0
+
+
+def get_cached_pcm(
+    source_path: str,
+    cache_dir: str,
+    sample_rate: int = 44100,
+    channels: int = 2,
+    ffmpeg_path: str = 'ffmpeg',
+    cancel_token: Optional[CancellationToken] = None
+) -> Optional[PCMTrack]:
+    """
+    获取源文件的 PCM 缓存，不存在时解码生成
+
+    Args:
+        source_path: 源音频文件
+        cache_dir: 缓存目录（项目级）
+        sample_rate: 目标采样率
+        channels: 目标声道数
+        ffmpeg_path: ffmpeg 可执行文件
+        cancel_token: 取消令牌，取消时终止 ffmpeg
+
+    Returns:
+        PCMTrack；解码失败返回 None（调用方回退为直接读取源文件）
+
+    Raises:
+        OperationCancelled: 任务被取消
+    """
+    try:
+        stat = os.stat(source_path)
+    except OSError as e:
+        logger.warning(f"[PCM缓存] 源文件不可用 {source_path}: {e}")
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+    name = f"{prefix}_{stat.st_size}_{stat.st_mtime_ns}_{sample_rate}_{channels}.pcm"
+    path = os.path.join(cache_dir, name)
+
+    if os.path.exists(path):
+        logger.debug(f"[PCM缓存] 命中: {source_path}")
+        return PCMTrack(path, sample_rate, channels)
+
+    # 多个worker可能同时解码同一文件：各自写临时文件，原子改名
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.part')
+    os.close(fd)
+    cmd = [
+        ffmpeg_path, '-y', '-loglevel', 'error', '-i', source_path,
+        '-vn', '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', str(channels),
+        tmp_path
+    ]
+    try:
+        # 超时按源文件时长计算，取消时终止进程组
+        try:
+            result = run_ffmpeg(cmd, duration=probe_duration(source_path), cancel_token=cancel_token)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"[PCM缓存] 解码失败 {source_path}: {e}")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"[PCM缓存] 解码失败 {source_path}: {result.stderr.strip()[-500:]}")
+            return None
+        os.replace(tmp_path, path)
+    finally:
+        # 失败、超时或取消时留下的不完整临时文件
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    # 同一源文件的旧版本缓存（源文件已被覆盖）
+    for other in os.listdir(cache_dir):
+        if other.startswith(prefix + '_') and other != name and not other.endswith('.part'):
+            try:
+                os.remove(os.path.join(cache_dir, other))
+            except OSError:
+                pass
+
+    track = PCMTrack(path, sample_rate, channels)
+    logger.info(f"[PCM缓存] 已解码 {source_path}: {track.duration:.1f}s, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    return track
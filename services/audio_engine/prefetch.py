@@ -0,0 +1,157 @@
+"""
+段落音频并行预取
+
+拼接前把所有段落音频提交给有界线程池并行下载，主线程按时间顺序等待、解码、混音，下载与混音重叠进行：
+- 共享 requests.Session 连接池（同一TTS存储域名复用连接）
+- 流式写入临时文件后原子改名，不在内存中保留整个响应体
+- 失败自动重试（指数退避）
+- 缓存目录按URL哈希命名文件：同一项目再次拼接时未变化的段落直接命中缓存，无需下载
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPrefetcher:
+    """段落音频并行预取器"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_workers: int = 8,
+        retries: int = 3,
+        timeout: float = 30.0,
+        trace_id: Optional[str] = None
+    ):
+        """
+        Args:
+            cache_dir: 缓存目录（如项目级缓存目录）；为 None 时使用临时目录，close() 时删除
+            max_workers: 并行下载数
+            retries: 每个文件的最大重试次数
+            timeout: 单次请求超时（秒）
+            trace_id: 追踪ID
+        """
+        self.owns_cache_dir = cache_dir is None
+        self.cache_dir = cache_dir or tempfile.mkdtemp(prefix='audio_prefetch_')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.retries = retries
+        self.timeout = timeout
+        self.trace_id = trace_id
+
+        self.downloads = 0  # 实际下载次数
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='audio-prefetch')
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def cache_path(self, url: str) -> str:
+        """URL对应的缓存文件路径"""
+        ext = os.path.splitext(urlparse(url).path)[1] or '.mp3'
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ext)
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """提交预取（重复URL只下载一次）"""
+        with self._lock:
+            for url in urls:
+                if url and url not in self._futures:
+                    self._futures[url] = self._executor.submit(self._fetch, url)
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        获取URL对应的本地文件（未提交过的URL会立即提交），等待下载完成
+
+        Returns:
+            本地文件路径，下载失败返回 None
+        """
+        self.prefetch([url])
+        try:
+            return self._futures[url].result()
+        except Exception as e:
+            logger.error(f"[{self.trace_id}] 音频下载失败 {url}: {e}")
+            return None
+
+    def _fetch(self, url: str) -> str:
+        path = self.cache_path(url)
+        if os.path.exists(path):
+            with self._lock:
+                self.cache_hits += 1
+            return path
+
+        last_error = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                self._download(url, path)
+                with self._lock:
+                    self.downloads += 1
+                return path
+            except Exception as e:
+                last_error = e
+                if attempt < self.retries:
+                    delay = 0.5 * (2 ** (attempt - 1))
+                    logger.warning(f"[{self.trace_id}] 下载失败（第{attempt}次），{delay}s后重试: {url} - {e}")
+                    time.sleep(delay)
+        raise last_error
+
+    def _download(self, url: str, path: str) -> None:
+        """流式下载到临时文件，完成后原子改名（中断不会留下不完整的缓存文件）"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with self._session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def prune(self, keep_urls: Iterable[str]) -> int:
+        """
+        删除缓存中不再被引用的文件（如段落重新生成后的旧音频）
+
+        Returns:
+            删除的文件数
+        """
+        keep = {os.path.basename(self.cache_path(url)) for url in keep_urls if url}
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name not in keep and not name.endswith('.part'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def close(self) -> None:
+        """关闭线程池和连接池；临时缓存目录会被删除"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._session.close()
+        if self.owns_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,204 @@
+"""
+分块流式混音
+
+翻译配音和背景音整段加载为 pydub 对象时，多小时视频需要数GB内存。
+stream_mix 为每个输入启动一个 ffmpeg 解码管道（统一为 float32 PCM、相同采样率和声道），
+按固定大小的块读取、乘增益、相加、裁剪，再写入 ffmpeg 编码管道：
+- 内存占用只与块大小有关，与音频时长无关
+- 输出时长以主输入为准，其他输入较短时补静音、较长时截断
+"""
+import logging
+import subprocess
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from services.utils.cancellation import terminate_process_group
+
+from .formats import codec_args_for_path
+from .pcm_cache import MemmapPCMReader, PCMTrack
+
+logger = logging.getLogger(__name__)
+
+
+def db_to_gain(db: float) -> float:
+    """分贝转线性增益"""
+    return float(10 ** (db / 20.0))
+
+
+class FFmpegPCMReader:
+    """ffmpeg 解码管道：按块读取 float32 PCM"""
+
+    def __init__(self, path: str, sample_rate: int, channels: int, ffmpeg_path: str = 'ffmpeg',
+                 input_args: Optional[List[str]] = None):
+        """
+        Args:
+            input_args: 自定义输入参数（如裸 PCM 的 -f s16le ... -i 路径），默认为 ['-i', path]
+        """
+        self.path = path
+        self.channels = channels
+        self.frame_bytes = 4 * channels
+        self.finished = False
+        self.process = subprocess.Popen(
+            [
+                ffmpeg_path, '-nostdin', '-loglevel', 'error', *(input_args or ['-i', path]),
+                '-vn', '-f', 'f32le', '-acodec', 'pcm_f32le',
+                '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1'
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    def read(self, frames: int) -> np.ndarray:
+        """
+        读取最多 frames 帧
+
+        Returns:
+            形状为 (帧数, 声道数) 的数组；到达结尾时帧数少于 frames（可能为0）
+        """
+        if self.finished:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        data = self.process.stdout.read(frames * self.frame_bytes)
+        usable = len(data) - len(data) % self.frame_bytes
+        if usable < frames * self.frame_bytes:
+            self.finished = True
+        return np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, self.channels)
+
+    def close(self) -> int:
+        """关闭管道，返回 ffmpeg 退出码"""
+        if self.process.poll() is None and not self.finished:
+            self.process.kill()
+        self.process.stdout.close()
+        return self.process.wait()
+
+
+def _open_reader(source: Union[str, PCMTrack], sample_rate: int, channels: int, ffmpeg_path: str):
+    """PCM 缓存格式一致时直接内存映射读取，否则用 ffmpeg 解码（重采样/转换声道）"""
+    if isinstance(source, PCMTrack):
+        if source.sample_rate == sample_rate and source.channels == channels:
+            return MemmapPCMReader(source)
+        return FFmpegPCMReader(source.path, sample_rate, channels, ffmpeg_path, input_args=source.ffmpeg_input_args())
+    return FFmpegPCMReader(source, sample_rate, channels, ffmpeg_path)
+
+
+def stream_mix(
+    inputs: List[Tuple[Union[str, PCMTrack], float]],
+    output_path: str,
+    sample_rate: int = 44100,
+    channels: int = 2,
+    codec_args: Optional[List[str]] = None,
+    block_seconds: float = 10.0,
+    ffmpeg_path: str = 'ffmpeg',
+    cancel_token=None
+) -> float:
+    """
+    分块混合多个音频文件并编码输出
+
+    Args:
+        inputs: [(文件路径或 PCMTrack 缓存, 线性增益), ...]，第一个为主输入，决定输出时长
+        output_path: 输出文件路径（格式由扩展名决定）
+        sample_rate: 输出采样率
+        channels: 输出声道数
+        codec_args: ffmpeg 编码参数，默认按扩展名选择（见 formats.codec_args_for_path）
+        block_seconds: 每块时长（秒），决定内存占用
+        ffmpeg_path: ffmpeg 可执行文件
+        cancel_token: 取消令牌，每块之间检查
+
+    Returns:
+        输出时长（秒）
+
+    Raises:
+        RuntimeError: 解码或编码失败
+        OperationCancelled: 任务被取消
+    """
+    block_frames = max(1, int(block_seconds * sample_rate))
+    if codec_args is None:
+        codec_args = codec_args_for_path(output_path)
+    readers = []
+    encoder = None
+    unregister = None
+    completed = False
+    total_frames = 0
+    mix = np.empty((block_frames, channels), dtype=np.float32)
+
+    def terminate_all():
+        # 取消时终止编码和解码进程组：阻塞在管道读写上的循环随之返回
+        processes = [reader.process for reader in readers if isinstance(reader, FFmpegPCMReader)]
+        if encoder is not None:
+            processes.append(encoder)
+        for process in processes:
+            terminate_process_group(process)
+
+    try:
+        for source, _ in inputs:
+            readers.append(_open_reader(source, sample_rate, channels, ffmpeg_path))
+        gains = [gain for _, gain in inputs]
+        encoder = subprocess.Popen(
+            [
+                ffmpeg_path, '-y', '-nostdin', '-loglevel', 'error',
+                '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+                *codec_args, output_path
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+        unregister = cancel_token.register(terminate_all) if cancel_token is not None else None
+
+        try:
+            while True:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+
+                primary = readers[0].read(block_frames)
+                frames = primary.shape[0]
+                if frames == 0:
+                    break
+
+                out = mix[:frames]
+                np.multiply(primary, gains[0], out=out)
+                for reader, gain in zip(readers[1:], gains[1:]):
+                    block = reader.read(frames)
+                    if block.shape[0]:
+                        # 较短的输入读完后相当于静音
+                        out[:block.shape[0]] += block * gain
+                np.clip(out, -1.0, 1.0, out=out)
+
+                encoder.stdin.write(out.tobytes())
+                total_frames += frames
+
+                if readers[0].finished:
+                    break
+        except BrokenPipeError:
+            pass
+        # 管道被取消回调终止时，循环会像正常结束一样退出
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        completed = True
+    finally:
+        if encoder is not None:
+            if not completed:
+                # 取消或异常：不等编码器处理完剩余数据
+                terminate_process_group(encoder)
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            if not completed:
+                encoder.stderr.close()
+                encoder.wait()
+        return_codes = [reader.close() for reader in readers]
+        if unregister is not None:
+            unregister()
+
+    stderr = encoder.stderr.read()
+    encoder.stderr.close()
+    if encoder.wait() != 0:
+        raise RuntimeError(f"ffmpeg 编码失败: {stderr.decode('utf-8', errors='replace')[-1000:]}")
+    if return_codes[0] != 0 or total_frames == 0:
+        raise RuntimeError(f"主输入解码失败: {getattr(inputs[0][0], 'path', inputs[0][0])}")
+
+    duration = total_frames / sample_rate
+    logger.debug(f"[流式混音] 输出 {duration:.2f}s，块大小 {block_seconds}s，输入 {len(inputs)} 个")
+    return duration
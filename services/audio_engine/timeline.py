@@ -0,0 +1,212 @@
+"""
+时间轴混音引擎
+
+pydub 的 overlay 每次都会复制整条音轨，逐段叠加的总开销是 O(段落数 × 音轨长度)。
+TimelineMixer 一次性预分配整条时间轴的 float32 采样缓冲区：
+- 每个片段只解码一次，直接累加到它在时间轴上的切片（只触碰片段本身的采样）
+- 导出时按块裁剪为 int16，通过管道写入 ffmpeg 编码一次，不生成中间 WAV
+"""
+import logging
+import subprocess
+from typing import List, Optional
+
+import numpy as np
+from pydub import AudioSegment
+
+from services.utils.cancellation import CancellationToken, terminate_process_group
+
+from .formats import codec_args_for_path
+
+logger = logging.getLogger(__name__)
+
+# 导出时每次转换并写入 ffmpeg 的采样帧数（约10秒@44.1kHz）
+EXPORT_CHUNK_FRAMES = 441000
+
+
+def audio_segment_to_array(audio: AudioSegment, sample_rate: int, channels: int) -> np.ndarray:
+    """
+    将 AudioSegment 转换为 float32 采样数组
+
+    Args:
+        audio: 音频
+        sample_rate: 目标采样率
+        channels: 目标声道数
+
+    Returns:
+        形状为 (帧数, 声道数) 的数组，取值范围 [-1, 1)
+    """
+    if audio.frame_rate != sample_rate:
+        audio = audio.set_frame_rate(sample_rate)
+    if audio.channels != channels:
+        audio = audio.set_channels(channels)
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+
+    samples = np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, channels)
+    return samples.astype(np.float32) / 32768.0
+
+
+class TimelineMixer:
+    """时间轴混音器"""
+
+    def __init__(self, duration: float, sample_rate: Optional[int] = None, channels: int = 1):
+        """
+        Args:
+            duration: 时间轴总时长（秒）
+            sample_rate: 采样率；为 None 时使用第一个片段的采样率（避免TTS音频重采样）
+            channels: 声道数
+        """
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.clips = 0
+        self.buffer: Optional[np.ndarray] = None
+        if sample_rate:
+            self._allocate(sample_rate)
+
+    def _allocate(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        total_frames = int(round(self.duration * sample_rate))
+        self.buffer = np.zeros((total_frames, self.channels), dtype=np.float32)
+        logger.debug(
+            f"[时间轴混音] 分配缓冲区: {self.duration:.1f}s @ {sample_rate}Hz x {self.channels}ch, "
+            f"{self.buffer.nbytes / 1024 / 1024:.1f} MB"
+        )
+
+    @property
+    def total_frames(self) -> int:
+        return 0 if self.buffer is None else self.buffer.shape[0]
+
+    def add_samples(self, samples: np.ndarray, start: float, max_duration: Optional[float] = None, gain: float = 1.0) -> int:
+        """
+        将采样累加到时间轴
+
+        Args:
+            samples: float32 采样，形状 (帧数, 声道数)
+            start: 起始时间（秒）；为负数时片段开头落在时间轴之前，只写入时间轴内的部分
+            max_duration: 最长时长（秒，从片段开头计），超出部分截断
+            gain: 线性增益
+
+        Returns:
+            实际写入的帧数
+        """
+        if self.buffer is None:
+            raise RuntimeError("时间轴未指定采样率，请先添加 AudioSegment 片段")
+
+        start_frame = int(round(start * self.sample_rate))
+        if start_frame >= self.total_frames:
+            return 0
+
+        length = samples.shape[0]
+        if max_duration is not None:
+            length = min(length, int(max_duration * self.sample_rate))
+
+        skip = 0
+        if start_frame < 0:
+            skip = -start_frame
+            start_frame = 0
+        length = min(length - skip, self.total_frames - start_frame)
+        if length <= 0:
+            return 0
+
+        target = self.buffer[start_frame:start_frame + length]
+        if gain == 1.0:
+            target += samples[skip:skip + length]
+        else:
+            target += samples[skip:skip + length] * gain
+        self.clips += 1
+        return length
+
+    def add_audio_segment(self, audio: AudioSegment, start: float, max_duration: Optional[float] = None, gain: float = 1.0) -> int:
+        """
+        将 AudioSegment 叠加到时间轴（片段只解码转换一次）
+
+        Returns:
+            实际写入的帧数
+        """
+        if self.buffer is None:
+            self._allocate(audio.frame_rate)
+        samples = audio_segment_to_array(audio, self.sample_rate, self.channels)
+        return self.add_samples(samples, start, max_duration, gain)
+
+    def iter_pcm16(self, chunk_frames: int = EXPORT_CHUNK_FRAMES):
+        """按块生成裁剪后的 int16 PCM 字节（叠加溢出部分硬裁剪，与 pydub overlay 行为一致）"""
+        if self.buffer is None:
+            return
+        for offset in range(0, self.total_frames, chunk_frames):
+            chunk = self.buffer[offset:offset + chunk_frames]
+            yield (np.clip(chunk, -1.0, 32767 / 32768.0) * 32768.0).astype(np.int16).tobytes()
+
+    def to_audio_segment(self) -> AudioSegment:
+        """转换为 AudioSegment（会复制一份 int16 数据，长音轨优先使用 export）"""
+        return AudioSegment(
+            data=b''.join(self.iter_pcm16()),
+            sample_width=2,
+            frame_rate=self.sample_rate,
+            channels=self.channels
+        )
+
+    def export(
+        self,
+        output_path: str,
+        codec_args: Optional[List[str]] = None,
+        ffmpeg_path: str = 'ffmpeg',
+        cancel_token: Optional[CancellationToken] = None
+    ) -> None:
+        """
+        编码导出（PCM 通过管道写入 ffmpeg，只编码一次）
+
+        Args:
+            output_path: 输出文件路径，容器格式由扩展名决定
+            codec_args: ffmpeg 编码参数，默认按扩展名选择（见 formats.codec_args_for_path）
+            ffmpeg_path: ffmpeg 可执行文件
+            cancel_token: 取消令牌，取消时终止 ffmpeg 进程组
+
+        Raises:
+            RuntimeError: 编码失败
+            OperationCancelled: 任务被取消
+        """
+        if self.buffer is None:
+            raise RuntimeError("时间轴为空，没有可导出的音频")
+
+        if codec_args is None:
+            codec_args = codec_args_for_path(output_path)
+        cmd = [
+            ffmpeg_path, '-y', '-nostdin', '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(self.sample_rate), '-ac', str(self.channels), '-i', 'pipe:0',
+            *codec_args, output_path
+        ]
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        unregister = cancel_token.register(lambda: terminate_process_group(process)) if cancel_token else None
+        completed = False
+        try:
+            try:
+                for data in self.iter_pcm16():
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    process.stdin.write(data)
+            except BrokenPipeError:
+                pass
+            # 编码器被取消回调终止时，写入以 BrokenPipeError 结束
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            completed = True
+        finally:
+            if not completed:
+                # 取消或异常：不等编码器处理完剩余数据
+                terminate_process_group(process)
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            if not completed:
+                process.stderr.close()
+                process.wait()
+            if unregister is not None:
+                unregister()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg 编码失败: {stderr.decode('utf-8', errors='replace')[-1000:]}")
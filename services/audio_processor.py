@@ -10,6 +10,8 @@ from pydub import AudioSegment
 from pydub.silence import split_on_silence
 import requests
 from django.conf import settings
+from services.audio_engine import AudioPrefetcher, TimelineMixer, db_to_gain, get_cached_pcm, stream_mix
+from services.utils.cancellation import OperationCancelled
 
 logger = logging.getLogger(__name__)
 
@@ -121,7 +123,16 @@ class AudioProcessor:
             logger.error(f"[{trace_id}] 去除静音失败 {file_path}: {e}")
             return file_path, self.get_audio_duration(file_path, trace_id)
 
-    def concatenate_audios(self, audio_segments: List[dict], output_path: str, trace_id: Optional[str] = None) -> bool:
+    def concatenate_audios(
+        self,
+        audio_segments: List[dict],
+        output_path: str,
+        trace_id: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        window_start: float = 0.0,
+        window_end: Optional[float] = None,
+        cancel_token=None
+    ) -> bool:
         """
         拼接多个音频段落为完整音频
 
@@ -138,19 +149,38 @@ class AudioProcessor:
                 ]
             output_path: 输出文件路径
             trace_id: 追踪ID
+            cache_dir: 段落音频下载缓存目录（项目级），再次拼接时未变化的段落不再下载；
+                       为 None 时下载到临时目录，拼接完成后删除
+            window_start: 时间窗口起点（秒），输出从该时间开始
+            window_end: 时间窗口终点（秒）；指定时只拼接与 [window_start, window_end) 重叠的段落（预览渲染）
+            cancel_token: 取消令牌，取消时终止导出的 ffmpeg 进程
 
         Returns:
             拼接是否成功
         """
+        prefetcher = None
         try:
             logger.info(f"[{trace_id}] 开始拼接音频，共 {len(audio_segments)} 个段落")
 
             # 按开始时间排序
             sorted_segments = sorted(audio_segments, key=lambda x: x['start_time'])
 
-            # 创建完整音频轨道
-            total_duration = max(seg['end_time'] for seg in sorted_segments)
-            full_audio = AudioSegment.silent(duration=int(total_duration * 1000))
+            if window_end is not None:
+                sorted_segments = [
+                    seg for seg in sorted_segments
+                    if seg['end_time'] > window_start and seg['start_time'] < window_end
+                ]
+                total_duration = window_end - window_start
+            else:
+                total_duration = max(seg['end_time'] for seg in sorted_segments) - window_start
+
+            # 预分配整条时间轴（采样率取第一个成功加载的片段），每个片段解码一次后累加到对应位置
+            mixer = TimelineMixer(duration=total_duration)
+
+            # 所有段落音频提交并行下载，下载与下面的解码混音重叠进行
+            urls = [seg['audio_url'] for seg in sorted_segments if not seg.get('local_path') and seg.get('audio_url')]
+            prefetcher = AudioPrefetcher(cache_dir=cache_dir, trace_id=trace_id)
+            prefetcher.prefetch(urls)
 
             successful_count = 0
 
@@ -159,7 +189,7 @@ class AudioProcessor:
                     # 获取音频文件
                     audio_file = segment.get('local_path')
                     if not audio_file and segment.get('audio_url'):
-                        audio_file = self.download_audio(segment['audio_url'], trace_id)
+                        audio_file = prefetcher.get(segment['audio_url'])
 
                     if not audio_file or not os.path.exists(audio_file):
                         logger.warning(f"[{trace_id}] 段落 {i} 音频文件不存在，跳过")
@@ -168,16 +198,12 @@ class AudioProcessor:
                     # 加载音频段落
                     segment_audio = AudioSegment.from_file(audio_file)
 
-                    # 计算插入位置
-                    start_ms = int(segment['start_time'] * 1000)
-
-                    # 确保音频不超过段落时长
-                    max_duration_ms = int((segment['end_time'] - segment['start_time']) * 1000)
-                    if len(segment_audio) > max_duration_ms:
-                        segment_audio = segment_audio[:max_duration_ms]
-
-                    # 插入音频到完整轨道
-                    full_audio = full_audio.overlay(segment_audio, position=start_ms)
+                    # 插入音频到时间轴（不超过段落时长）
+                    mixer.add_audio_segment(
+                        segment_audio,
+                        start=segment['start_time'] - window_start,
+                        max_duration=segment['end_time'] - segment['start_time']
+                    )
                     successful_count += 1
 
                     logger.debug(f"[{trace_id}] 段落 {i} 拼接成功: {segment['start_time']}s-{segment['end_time']}s")
@@ -186,16 +212,34 @@ class AudioProcessor:
                     logger.error(f"[{trace_id}] 段落 {i} 拼接失败: {e}")
                     continue
 
-            # 导出完整音频
-            full_audio.export(output_path, format="mp3", bitrate="128k")
+            if successful_count == 0:
+                # 没有可用片段时输出与时间轴等长的静音
+                mixer = TimelineMixer(duration=total_duration, sample_rate=32000)
+
+            # 导出完整音频（只编码一次，格式由输出扩展名决定，内部交接使用无损工作格式）
+            mixer.export(output_path, cancel_token=cancel_token)
+
+            # 时间窗口只用到部分段落，不能据此清理缓存
+            if cache_dir and window_end is None:
+                prefetcher.prune(urls)
 
             logger.info(f"[{trace_id}] 音频拼接完成: {successful_count}/{len(sorted_segments)} 段落成功，输出: {output_path}")
+            logger.info(f"[{trace_id}] 音频下载: {prefetcher.downloads} 个，缓存命中: {prefetcher.cache_hits} 个")
             return True
 
+        except OperationCancelled:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
         except Exception as e:
             logger.error(f"[{trace_id}] 音频拼接失败: {e}")
             return False
 
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+
     def create_silence(self, duration_seconds: float, output_path: str) -> bool:
         """
         创建指定时长的静音音频
@@ -222,10 +266,12 @@ class AudioProcessor:
         output_path: str,
         translated_volume: float = 1.0,
         background_volume: float = 0.3,
-        trace_id: Optional[str] = None
+        trace_id: Optional[str] = None,
+        cancel_token=None,
+        pcm_cache_dir: Optional[str] = None
     ) -> bool:
         """
-        混合翻译音频和背景音
+        混合翻译音频和背景音（分块流式处理，内存占用与音频时长无关）
 
         Args:
             translated_audio_path: 翻译音频路径（拼接后的完整翻译音频）
@@ -234,6 +280,8 @@ class AudioProcessor:
             translated_volume: 翻译音频音量（0.0-1.0），默认 1.0
             background_volume: 背景音音量（0.0-1.0），默认 0.3
             trace_id: 追踪ID
+            cancel_token: 取消令牌，每个处理块之间检查
+            pcm_cache_dir: 解码 PCM 缓存目录（项目级）；指定时输入只解码一次，再次混音（如只调整音量）直接内存映射读取
 
         Returns:
             混合是否成功
@@ -243,44 +291,34 @@ class AudioProcessor:
             logger.info(f"[{trace_id}] 翻译音频: {translated_audio_path}")
             logger.info(f"[{trace_id}] 背景音: {background_audio_path}")
 
-            # 加载音频文件
-            translated_audio = AudioSegment.from_file(translated_audio_path)
-            background_audio = AudioSegment.from_file(background_audio_path)
-
-            # 调整音量
-            if translated_volume != 1.0:
-                translated_audio = translated_audio + (20 * (translated_volume - 1))  # dB 调整
-            if background_volume != 1.0:
-                background_audio = background_audio + (20 * (background_volume - 1))  # dB 调整
+            # 音量按 dB 调整：20 * (音量 - 1)，如 0.3 -> -14dB
+            translated_gain = db_to_gain(20 * (translated_volume - 1)) if translated_volume != 1.0 else 1.0
+            background_gain = db_to_gain(20 * (background_volume - 1)) if background_volume != 1.0 else 1.0
 
             logger.info(f"[{trace_id}] 音量调整: 翻译={translated_volume}, 背景={background_volume}")
 
-            # 确保两个音频时长一致（使用较长的作为基准）
-            translated_duration = len(translated_audio)
-            background_duration = len(background_audio)
+            translated_source, background_source = translated_audio_path, background_audio_path
+            if pcm_cache_dir:
+                translated_source = get_cached_pcm(translated_audio_path, pcm_cache_dir, cancel_token=cancel_token) or translated_audio_path
+                background_source = get_cached_pcm(background_audio_path, pcm_cache_dir, cancel_token=cancel_token) or background_audio_path
 
-            if translated_duration > background_duration:
-                # 背景音较短，循环或静音填充
-                logger.info(f"[{trace_id}] 背景音较短 ({background_duration}ms < {translated_duration}ms)，延长背景音")
-                # 添加静音填充
-                silence_needed = translated_duration - background_duration
-                background_audio = background_audio + AudioSegment.silent(duration=silence_needed)
-            elif background_duration > translated_duration:
-                # 背景音较长，裁剪
-                logger.info(f"[{trace_id}] 背景音较长 ({background_duration}ms > {translated_duration}ms)，裁剪背景音")
-                background_audio = background_audio[:translated_duration]
-
-            # 混合音频（overlay）
-            mixed_audio = translated_audio.overlay(background_audio)
-
-            # 导出混合音频
-            mixed_audio.export(output_path, format="mp3", bitrate="192k")
+            # 以翻译音频时长为准：背景音较短时补静音，较长时截断
+            duration = stream_mix(
+                [(translated_source, translated_gain), (background_source, background_gain)],
+                output_path,
+                cancel_token=cancel_token
+            )
 
             logger.info(f"[{trace_id}] 音频混合完成: {output_path}")
-            logger.info(f"[{trace_id}] 混合音频时长: {len(mixed_audio)/1000.0:.2f}秒")
+            logger.info(f"[{trace_id}] 混合音频时长: {duration:.2f}秒")
 
             return True
 
+        except OperationCancelled:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
         except Exception as e:
             logger.error(f"[{trace_id}] 音频混合失败: {e}", exc_info=True)
             return False
@@ -24,13 +24,14 @@ class BaseSeparator(ABC):
         logger.info(f"初始化音频分离器: device={device}")
 
     @abstractmethod
-    def separate(self, audio_path: str, output_dir: str) -> Dict[str, str]:
+    def separate(self, audio_path: str, output_dir: str, cancel_token=None) -> Dict[str, str]:
         """
         分离音频
 
         Args:
             audio_path: 输入音频文件路径
             output_dir: 输出目录
+            cancel_token: 取消令牌（可选）
 
         Returns:
             Dict[str, str]: 包含分离后的文件路径
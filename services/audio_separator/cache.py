@@ -0,0 +1,175 @@
+"""
+人声分离结果缓存（按内容寻址）
+
+重复上传同一视频、复制项目翻译成另一种语言、重复点击"人声分离"时，提取出的音频完全相同，
+Demucs 却要从头运行几分钟。分离结果按 提取音频的 SHA-256 + 模型名 + 分离参数 为键保存在共享缓存目录：
+    <cache_dir>/<key[:2]>/<key>/vocals.wav、background.wav
+- 命中时直接硬链接到项目目录（同一文件系统上不复制数据），不再申请准入资源、不启动 Demucs
+- 写入时先在临时目录生成，再原子改名为最终目录，并发写入同一键时只保留先完成的一份
+- 每次命中更新目录修改时间，写入后按修改时间从旧到新淘汰，直到总大小不超过磁盘预算（LRU）
+缓存文件与项目文件可能是同一 inode 的硬链接，两边都不能原地修改，只能整体替换或删除。
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本：分离实现变化导致输出不同时递增，使旧缓存失效
+CACHE_VERSION = 1
+STEM_FILES = ('vocals.wav', 'background.wav')
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_file(path: str) -> str:
+    """流式计算文件 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: str, destination: str):
+    """优先硬链接（跨文件系统或不支持时复制）"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class SeparationCache:
+    """分离结果缓存目录"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, audio_path: str, model: str, **params) -> str:
+        """
+        缓存键：音频内容哈希 + 模型名 + 分离参数（值为 None 的参数忽略）
+        """
+        payload = {
+            'version': CACHE_VERSION,
+            'audio': hash_file(audio_path),
+            'model': model,
+            'params': {name: value for name, value in sorted(params.items()) if value is not None},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        查找缓存
+
+        Returns:
+            {'vocals', 'background'} 缓存文件路径；未命中返回 None
+        """
+        entry = self._entry_dir(key)
+        paths = {name.split('.')[0]: os.path.join(entry, name) for name in STEM_FILES}
+        if not all(os.path.isfile(path) for path in paths.values()):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        logger.info(f"[分离缓存] 命中 {key[:12]}")
+        return paths
+
+    def put(self, key: str, vocals_path: str, background_path: str) -> Optional[Dict[str, str]]:
+        """
+        写入缓存（硬链接分离结果），随后按磁盘预算淘汰旧条目
+
+        Returns:
+            缓存文件路径；写入失败返回 None（不影响分离结果本身）
+        """
+        entry = self._entry_dir(key)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix='.tmp_')
+            try:
+                link_or_copy(vocals_path, os.path.join(staging, 'vocals.wav'))
+                link_or_copy(background_path, os.path.join(staging, 'background.wav'))
+                try:
+                    os.rename(staging, entry)
+                except OSError:
+                    # 其他进程已写入同一键
+                    pass
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        except OSError as e:
+            logger.warning(f"[分离缓存] 写入失败 {key[:12]}: {e}")
+            return None
+
+        logger.info(f"[分离缓存] 已写入 {key[:12]}")
+        self.evict()
+        return self.get(key)
+
+    def evict(self) -> int:
+        """
+        按最近使用时间淘汰，直到总大小不超过预算
+
+        Returns:
+            淘汰的条目数
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, name)
+                if name.startswith('.tmp_'):
+                    # 写入中途崩溃留下的临时目录
+                    if time.time() - os.path.getmtime(entry) > 3600:
+                        shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(entry, stem)) for stem in os.listdir(entry)
+                    )
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    continue
+                total += size
+
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"[分离缓存] 淘汰 {removed} 个条目，当前 {total / 1024 ** 3:.2f} GB")
+        return removed
+
+
+def get_separation_cache() -> Optional[SeparationCache]:
+    """
+    按配置创建缓存（settings.SEPARATION_CACHE_DIR / SEPARATION_CACHE_MAX_GB）
+
+    Returns:
+        SeparationCache；预算为0时禁用缓存，返回 None
+    """
+    from django.conf import settings
+
+    max_gb = getattr(settings, 'SEPARATION_CACHE_MAX_GB', 20)
+    if not max_gb:
+        return None
+    cache_dir = getattr(settings, 'SEPARATION_CACHE_DIR', None) or os.path.join(
+        settings.MEDIA_ROOT, 'cache', 'separation'
+    )
+    return SeparationCache(str(cache_dir), int(max_gb * 1024 ** 3))
@@ -0,0 +1,434 @@
+"""
+分块重叠相加（overlap-add）流式人声分离
+
+Demucs 对整段 original.wav 一次性推理时，输入波形、4个音源输出都要完整保存在内存中，
+内存占用随音频时长线性增长（这也是 MemoryMonitor / get_safe_demucs_jobs 存在的原因），多小时音频会超出 8GB 容器。
+分块模式：
+1. 第一遍流式读取输入，计算全局均值/标准差（与 Demucs 的整段归一化一致）
+2. 第二遍按固定长度窗口读取（相邻窗口重叠 overlap 秒），逐窗口推理
+3. 重叠区域对前后两个窗口的音源输出做线性交叉淡化，拼接后立即写入 vocals / background 编码管道
+峰值内存只取决于窗口长度，与输入时长无关；取消检查和进度更新以窗口为粒度。
+窗口之间相互独立（共用全局归一化参数），parallel.py 把窗口分发到多个进程并按顺序拼接。
+
+语音区间模式（speech_spans）：已知字幕/ASR 段落时间时，只对（加了前后余量的）语音区间推理，
+其余部分不经过模型，原音直接作为背景音、人声为静音；区间边缘的余量内在直通信号和模型输出之间交叉淡化。
+对白稀疏的视频中，Demucs 计算量大致按语音覆盖率减少。
+"""
+import logging
+import subprocess
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from services.audio_engine.stream_mix import FFmpegPCMReader
+
+from .model_server import SeparationCancelled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SECONDS = 60.0
+DEFAULT_OVERLAP_SECONDS = 5.0
+
+# 第一遍统计时每次读取的帧数
+STATS_BLOCK_FRAMES = 1 << 20
+
+# 语音区间模式：段落前后余量、余量内的交叉淡化长度、合并相邻区间的最小间隔（秒）
+DEFAULT_SPEECH_PADDING = 1.0
+DEFAULT_SPEECH_CROSSFADE = 0.5
+# 间隔过短时单独直通只会增加边界（Demucs 在边界附近缺少上下文），直接合并推理
+DEFAULT_SPEECH_MIN_GAP = 3.0
+
+
+class _WavWriter:
+    """float32 PCM 通过管道写入 ffmpeg，编码为 16bit WAV"""
+
+    def __init__(self, path: str, sample_rate: int, channels: int, ffmpeg_path: str = 'ffmpeg'):
+        self.path = path
+        self.process = subprocess.Popen(
+            [
+                ffmpeg_path, '-y', '-nostdin', '-loglevel', 'error',
+                '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+                '-c:a', 'pcm_s16le', path
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def write(self, samples: np.ndarray):
+        # 流式写入无法像 Demucs 默认的 rescale 那样按整段峰值缩放，超出范围的采样直接裁剪
+        self.process.stdin.write(np.clip(samples, -1.0, 1.0).astype(np.float32, copy=False).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        stderr = self.process.stderr.read()
+        self.process.stderr.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"写入 {self.path} 失败: {stderr.decode('utf-8', errors='replace')[-500:]}")
+
+    def abort(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+def input_stats(audio_path: str, sample_rate: int, channels: int):
+    """
+    流式计算单声道参考信号的均值和标准差
+
+    Returns:
+        (均值, 标准差, 总帧数)
+    """
+    reader = FFmpegPCMReader(audio_path, sample_rate, channels)
+    total = 0
+    s1 = 0.0
+    s2 = 0.0
+    try:
+        while True:
+            block = reader.read(STATS_BLOCK_FRAMES)
+            if block.shape[0] == 0:
+                break
+            mono = block.mean(axis=1, dtype=np.float64)
+            s1 += float(mono.sum())
+            s2 += float(np.dot(mono, mono))
+            total += block.shape[0]
+            if reader.finished:
+                break
+    finally:
+        reader.close()
+
+    if total == 0:
+        raise RuntimeError(f"无法读取音频: {audio_path}")
+    mean = s1 / total
+    std = max((s2 / total - mean * mean) ** 0.5, 1e-8)
+    return mean, std, total
+
+
+def iter_windows(
+    reader: FFmpegPCMReader,
+    window: int,
+    overlap: int,
+    timings: Optional[Dict[str, float]] = None
+) -> Iterator[Tuple[np.ndarray, bool]]:
+    """
+    按窗口读取输入，相邻窗口重叠 overlap 帧
+
+    Yields:
+        (窗口采样 (帧数, 声道数), 是否最后一个窗口)
+    """
+    channels = reader.channels
+    started = time.monotonic()
+    buffer = reader.read(window)
+    while buffer.shape[0] > 0:
+        following = np.zeros((0, channels), dtype=np.float32) if reader.finished else reader.read(window - overlap)
+        if timings is not None:
+            timings['audio_load'] += time.monotonic() - started
+        is_last = following.shape[0] == 0
+        yield buffer, is_last
+        if is_last:
+            return
+        started = time.monotonic()
+        buffer = np.concatenate([buffer[buffer.shape[0] - overlap:], following])
+
+
+def infer_window(model, buffer: np.ndarray, mean: float, std: float, device: str = 'cpu', shifts: int = 1,
+                 segment: Optional[float] = None) -> List[np.ndarray]:
+    """
+    对一个窗口推理（segment 为 Demucs 内部切片长度，None 时使用模型默认值）
+
+    Returns:
+        [人声, 背景音]，形状均为 (帧数, 声道数)
+    """
+    import torch
+    from demucs.apply import apply_model
+
+    mix = torch.from_numpy(np.ascontiguousarray(((buffer - mean) / std).T))
+    with torch.no_grad():
+        sources = apply_model(
+            model, mix[None], device=device, shifts=shifts, split=True, overlap=0.25, progress=False, segment=segment
+        )[0]
+    sources = (sources * std + mean).cpu().numpy()
+    vocals = sources[model.sources.index('vocals')].T
+    return [vocals, sources.sum(axis=0).T - vocals]
+
+
+class OverlapAddWriter:
+    """按窗口顺序接收音源输出，重叠区线性交叉淡化后写入人声 / 背景音文件"""
+
+    def __init__(self, paths: List[str], sample_rate: int, channels: int, overlap: int):
+        self.overlap = overlap
+        self.fade_in = (np.arange(overlap, dtype=np.float32) / overlap)[:, None]
+        self.pending = None  # 上一窗口末尾 overlap 帧，等待与当前窗口开头交叉淡化
+        self.writers = []
+        try:
+            for path in paths:
+                self.writers.append(_WavWriter(path, sample_rate, channels))
+        except BaseException:
+            self.abort()
+            raise
+
+    def add(self, stems: List[np.ndarray], is_last: bool) -> int:
+        """
+        写入一个窗口的输出（必须按窗口顺序调用）
+
+        Returns:
+            本次写出的帧数
+        """
+        frames = stems[0].shape[0]
+        if self.pending is not None:
+            head = min(self.overlap, frames)
+            fade = self.fade_in[:head]
+            for stem, tail in zip(stems, self.pending):
+                stem[:head] = tail[:head] * (1.0 - fade) + stem[:head] * fade
+
+        if is_last:
+            for writer, stem in zip(self.writers, stems):
+                writer.write(stem)
+            self.pending = None
+            return frames
+
+        keep = frames - self.overlap
+        for writer, stem in zip(self.writers, stems):
+            writer.write(stem[:keep])
+        self.pending = [stem[keep:].copy() for stem in stems]
+        return keep
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+    def abort(self):
+        for writer in self.writers:
+            writer.abort()
+
+
+def prepare_spans(
+    speech_spans: Optional[List[Tuple[float, float]]],
+    total_frames: int,
+    sample_rate: int,
+    padding: float,
+    audio_path: str = ''
+) -> Optional[List[Tuple[int, int]]]:
+    """语音区间模式的帧区间（未指定语音段落时返回 None，整段推理），并记录语音覆盖率"""
+    if speech_spans is None:
+        return None
+    spans = speech_span_frames(speech_spans, total_frames, sample_rate, padding)
+    covered = sum(end - start for start, end in spans)
+    logger.info(
+        f"[分块分离] 语音区间模式 {audio_path}: {len(speech_spans)} 个段落合并为 {len(spans)} 个区间，"
+        f"推理覆盖 {covered / max(total_frames, 1) * 100:.1f}%"
+    )
+    return spans
+
+
+def window_frames(sample_rate: int, chunk_seconds: float, overlap_seconds: float) -> Tuple[int, int]:
+    """窗口长度和重叠长度（帧）"""
+    window = int(chunk_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if overlap <= 0 or overlap >= window:
+        raise ValueError("重叠长度必须大于0且小于窗口长度")
+    return window, overlap
+
+
+def speech_span_frames(
+    spans: List[Tuple[float, float]],
+    total_frames: int,
+    sample_rate: int,
+    padding: float = DEFAULT_SPEECH_PADDING,
+    min_gap: float = DEFAULT_SPEECH_MIN_GAP
+) -> List[Tuple[int, int]]:
+    """
+    语音段落（秒）加余量、排序合并后转换为帧区间
+
+    Returns:
+        [(起始帧, 结束帧)]，互不重叠且按时间排序
+    """
+    merged = []
+    for start, end in sorted((float(s), float(e)) for s, e in spans if e > s):
+        start = max(0, int((start - padding) * sample_rate))
+        end = min(total_frames, int((end + padding) * sample_rate))
+        if start >= end:
+            continue
+        if merged and start - merged[-1][1] < min_gap * sample_rate:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class _LimitedReader:
+    """从底层 reader 最多读取 frames 帧（接口与 FFmpegPCMReader 一致）"""
+
+    def __init__(self, reader, frames: int):
+        self.reader = reader
+        self.channels = reader.channels
+        self.remaining = frames
+
+    @property
+    def finished(self) -> bool:
+        return self.remaining <= 0 or self.reader.finished
+
+    def read(self, frames: int) -> np.ndarray:
+        if self.finished:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        block = self.reader.read(min(frames, self.remaining))
+        self.remaining -= block.shape[0]
+        return block
+
+
+def _span_ramp(start: int, frames: int, span_start: int, span_end: int, crossfade: int) -> Optional[np.ndarray]:
+    """窗口内各帧的模型输出权重（区间边缘从0线性过渡到1）；窗口不在边缘时返回 None"""
+    if start >= span_start + crossfade and start + frames <= span_end - crossfade:
+        return None
+    t = np.arange(start, start + frames, dtype=np.float32)
+    ramp = np.minimum((t - span_start) / crossfade, (span_end - t) / crossfade)
+    return np.clip(ramp, 0.0, 1.0)[:, None]
+
+
+def iter_work(
+    reader,
+    window: int,
+    overlap: int,
+    spans: Optional[List[Tuple[int, int]]] = None,
+    crossfade: int = 0,
+    timings: Optional[Dict[str, float]] = None
+) -> Iterator[Tuple[np.ndarray, bool, Optional[np.ndarray], bool]]:
+    """
+    按顺序生成待处理的块
+
+    spans 为 None 时整段按窗口推理；否则只有语音区间内按窗口推理，区间之间的块直通。
+
+    Yields:
+        (采样, 是否结束重叠拼接, 区间边缘淡化权重或 None, 是否需要推理)
+    """
+    if spans is None:
+        for buffer, is_last in iter_windows(reader, window, overlap, timings):
+            yield buffer, is_last, None, True
+        return
+
+    def passthrough(frames: Optional[int]):
+        source = reader if frames is None else _LimitedReader(reader, frames)
+        while not source.finished:
+            started = time.monotonic()
+            block = source.read(window)
+            if timings is not None:
+                timings['audio_load'] += time.monotonic() - started
+            if block.shape[0] == 0:
+                break
+            yield block, True, None, False
+
+    position = 0
+    for span_start, span_end in spans:
+        yield from passthrough(span_start - position)
+        start = span_start
+        for buffer, is_last in iter_windows(_LimitedReader(reader, span_end - span_start), window, overlap, timings):
+            yield buffer, is_last, _span_ramp(start, buffer.shape[0], span_start, span_end, crossfade), True
+            start += buffer.shape[0] - overlap
+        position = span_end
+    yield from passthrough(None)
+
+
+def finish_stems(stems: Optional[List[np.ndarray]], buffer: np.ndarray, ramp: Optional[np.ndarray]) -> List[np.ndarray]:
+    """
+    得到块的最终音源输出
+
+    Args:
+        stems: 模型输出 [人声, 背景音]；None 表示直通块（人声静音，原音作为背景音）
+        buffer: 块的原始采样
+        ramp: 区间边缘的模型输出权重，背景音在原音和模型背景音之间交叉淡化
+    """
+    if stems is None:
+        return [np.zeros_like(buffer), buffer.copy()]
+    if ramp is not None:
+        vocals, background = stems
+        stems = [vocals * ramp, background * ramp + buffer * (1.0 - ramp)]
+    return stems
+
+
+def separate_chunked(
+    model,
+    audio_path: str,
+    vocals_path: str,
+    background_path: str,
+    device: str = 'cpu',
+    shifts: int = 1,
+    segment: Optional[float] = None,
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    on_progress: Optional[Callable[[float], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    speech_spans: Optional[List[Tuple[float, float]]] = None,
+    speech_padding: float = DEFAULT_SPEECH_PADDING
+) -> Dict[str, float]:
+    """
+    分块推理并以重叠相加方式写出人声和背景音
+
+    Args:
+        model: 已加载的 Demucs 模型
+        audio_path: 输入音频
+        vocals_path: 人声输出路径（WAV）
+        background_path: 背景音输出路径（WAV）
+        device: 推理设备
+        shifts: 随机平移次数
+        segment: Demucs 内部切片长度（秒），None 时使用模型默认值
+        chunk_seconds: 窗口长度（秒），决定峰值内存
+        overlap_seconds: 相邻窗口重叠长度（秒），用于交叉淡化
+        on_progress: 进度回调 on_progress(比例0-1)，每个窗口一次
+        should_cancel: 取消检查，每个窗口之前调用
+        speech_spans: 语音段落 [(开始秒, 结束秒)]；指定时只对语音区间推理，其余部分直通到背景音
+        speech_padding: 语音段落前后余量（秒），区间边缘的交叉淡化在余量内完成
+
+    Returns:
+        各阶段耗时 {'audio_load', 'inference', 'write'}
+
+    Raises:
+        SeparationCancelled: should_cancel 返回 True
+    """
+    sample_rate = model.samplerate
+    channels = model.audio_channels
+    window, overlap = window_frames(sample_rate, chunk_seconds, overlap_seconds)
+
+    timings = {'audio_load': 0.0, 'inference': 0.0, 'write': 0.0}
+
+    started = time.monotonic()
+    mean, std, total_frames = input_stats(audio_path, sample_rate, channels)
+    timings['audio_load'] += time.monotonic() - started
+    spans = prepare_spans(speech_spans, total_frames, sample_rate, speech_padding, audio_path)
+    logger.info(
+        f"[分块分离] {audio_path}: {total_frames / sample_rate:.1f}s，窗口 {chunk_seconds}s，重叠 {overlap_seconds}s"
+    )
+
+    reader = FFmpegPCMReader(audio_path, sample_rate, channels)
+    output = OverlapAddWriter([vocals_path, background_path], sample_rate, channels, overlap)
+    crossfade = int(min(DEFAULT_SPEECH_CROSSFADE, speech_padding) * sample_rate) or 1
+    processed = 0
+    try:
+        for buffer, is_last, ramp, infer in iter_work(reader, window, overlap, spans, crossfade, timings):
+            if should_cancel is not None and should_cancel():
+                raise SeparationCancelled()
+
+            started = time.monotonic()
+            stems = infer_window(
+                model, buffer, mean, std, device=device, shifts=shifts, segment=segment
+            ) if infer else None
+            stems = finish_stems(stems, buffer, ramp)
+            timings['inference'] += time.monotonic() - started
+
+            started = time.monotonic()
+            processed += output.add(stems, is_last)
+            timings['write'] += time.monotonic() - started
+
+            if on_progress is not None:
+                on_progress(min(1.0, processed / total_frames))
+
+        started = time.monotonic()
+        output.close()
+        timings['write'] += time.monotonic() - started
+
+    except BaseException:
+        output.abort()
+        raise
+    finally:
+        reader.close()
+
+    return timings
@@ -3,12 +3,14 @@ Demucs音频分离器实现
 
 使用Facebook的Demucs模型进行人声分离
 """
+import json
 import os
 import shutil
 import subprocess
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
+from services.utils.cancellation import CancellationToken, OperationCancelled, terminate_process_group
 from .base_separator import BaseSeparator
 
 logger = logging.getLogger(__name__)
@@ -17,7 +19,9 @@ logger = logging.getLogger(__name__)
 class DemucsSeparator(BaseSeparator):
     """使用Demucs模型的音频分离器"""
 
-    def __init__(self, device: str = 'cpu', model: str = 'htdemucs', jobs: Optional[int] = None):
+    def __init__(self, device: str = 'cpu', model: str = 'htdemucs', jobs: Optional[int] = None,
+                 chunk_seconds: Optional[float] = None, overlap_seconds: float = 5.0,
+                 workers: Optional[int] = None, shifts: int = 1, segment: Optional[float] = None):
         """
         初始化Demucs分离器
 
@@ -25,11 +29,18 @@ class DemucsSeparator(BaseSeparator):
             device: 设备类型 'cpu' 或 'cuda'
             model: 模型名称，htdemucs为标准高质量模型
             jobs: 并行任务数，None时自动检测
+            chunk_seconds: 分块模式的窗口长度（秒），峰值内存只取决于窗口长度；None 时整段推理
+            overlap_seconds: 分块模式相邻窗口的重叠长度（秒）
+            workers: 分块模式的并行工作进程数（取代 -j），None时按CPU配额自动确定
+            shifts: 随机平移次数（CPU上默认1，Demucs默认10）
+            segment: Demucs 内部切片长度（秒），越短内存越省、速度越快，None 时使用模型默认值
         """
         super().__init__(device)
         self.model = model
-        self.shifts = 1  # CPU优化：减少shifts（默认10）
-        self.segment = None  # 使用默认值
+        self.shifts = shifts  # CPU优化：减少shifts（默认10）
+        self.segment = segment  # None 使用模型默认值
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
 
         # 自动检测最佳jobs值
         if jobs is None:
@@ -37,7 +48,16 @@ class DemucsSeparator(BaseSeparator):
         else:
             self.jobs = jobs
 
-        logger.info(f"Demucs配置: model={self.model}, device={self.device}, jobs={self.jobs}")
+        # 分块模式按窗口并行，工作进程数由CPU配额决定
+        if chunk_seconds:
+            self.workers = workers or self._auto_detect_workers()
+        else:
+            self.workers = 1
+
+        logger.info(
+            f"Demucs配置: model={self.model}, device={self.device}, jobs={self.jobs}, "
+            f"chunk={self.chunk_seconds or '整段'}, workers={self.workers}"
+        )
 
     def _get_container_cpu_limit(self) -> int:
         """
@@ -118,31 +138,68 @@ class DemucsSeparator(BaseSeparator):
             logger.warning(f"自动检测jobs失败: {e}，使用默认jobs=4")
             return 4
 
-    def is_available(self) -> bool:
-        """检查Demucs是否可用"""
+    def _auto_detect_workers(self) -> int:
+        """
+        分块模式的并行工作进程数：每个进程至少2个torch线程，并受可用内存限制
+
+        Returns:
+            推荐的工作进程数
+        """
+        from .parallel import plan_workers
+
+        cpu_count = self._get_container_cpu_limit()
         try:
-            result = subprocess.run(
-                ['python', '-m', 'demucs', '--help'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=5
-            )
-            return result.returncode == 0
-        except Exception as e:
-            logger.warning(f"Demucs不可用: {str(e)}")
+            import psutil
+            mem_gb = psutil.virtual_memory().available / (1024**3)
+        except Exception:
+            mem_gb = None
+        workers, threads = plan_workers(cpu_count, mem_gb)
+        logger.info(f"分块并行: CPU={cpu_count}核, 工作进程={workers}, 每进程 {threads} 线程")
+        return workers
+
+    def _model_server(self):
+        """常驻模型服务客户端；服务未运行时返回 None（回退为命令行分离）"""
+        from .model_server import SeparationClient
+
+        client = SeparationClient()
+        info = client.ping()
+        if info is None:
+            return None
+        logger.info(f"使用常驻模型服务 (pid={info.get('pid')}, 已加载模型: {info.get('models')})")
+        return client
+
+    def is_available(self) -> bool:
+        """检查Demucs是否可用（模型服务在运行，或本进程可导入 demucs；不再启动解释器执行 --help）"""
+        import importlib.util
+        from .model_server import SeparationClient
+
+        if SeparationClient().ping() is not None:
+            return True
+        if importlib.util.find_spec('demucs') is None:
+            logger.warning("Demucs不可用: 未安装 demucs")
             return False
+        return True
 
-    def separate(self, audio_path: str, output_dir: str) -> Dict[str, str]:
+    def separate(self, audio_path: str, output_dir: str,
+                 cancel_token: Optional[CancellationToken] = None,
+                 speech_spans: Optional[List[Tuple[float, float]]] = None,
+                 speech_padding: float = 1.0) -> Dict[str, str]:
         """
         使用Demucs分离音频
 
         Args:
             audio_path: 输入音频文件路径
             output_dir: 输出目录
+            cancel_token: 取消令牌，取消时终止Demucs进程组（含其并行子进程）
+            speech_spans: 语音段落 [(开始秒, 结束秒)]，指定时只对语音区间推理，其余部分直通到背景音（需要分块模式）
+            speech_padding: 语音段落前后余量（秒）
 
         Returns:
             Dict[str, str]: 分离后的文件路径
         """
+        if speech_spans is not None and not self.chunk_seconds:
+            raise ValueError("语音区间模式需要分块分离（chunk_seconds）")
+
         try:
             # 确保输出目录存在
             os.makedirs(output_dir, exist_ok=True)
@@ -150,33 +207,75 @@ class DemucsSeparator(BaseSeparator):
             logger.info(f"开始Demucs分离: {audio_path}")
             logger.info(f"模型: {self.model}, 设备: {self.device}")
 
-            # 构建Demucs命令（参考minimax-video-translation的实现）
-            command = [
-                'python', '-m', 'demucs.separate',
-                '-n', self.model,
-                '--two-stems', 'vocals',  # 只分离人声和伴奏
-                '-d', self.device,
-                '-j', str(self.jobs),  # 多进程并行加速
-                '-o', output_dir,
-                audio_path
-            ]
-
-            # 执行分离
-            logger.info(f"执行命令: {' '.join(command)}")
-            logger.info(f"使用 {self.jobs} 个并行进程进行人声分离（预计加速 {min(self.jobs, 8)}x）")
+            # 常驻模型服务：模型已在内存中，省去解释器启动、torch导入和模型加载
+            client = self._model_server()
+            if client is not None:
+                result = client.separate(
+                    audio_path, output_dir, model=self.model, shifts=self.shifts, segment=self.segment,
+                    cancel_token=cancel_token,
+                    chunk_seconds=self.chunk_seconds, overlap_seconds=self.overlap_seconds,
+                    speech_spans=speech_spans, speech_padding=speech_padding
+                )
+                logger.info(f"Demucs分离完成（模型服务），各阶段耗时: {result['timings']}")
+                return {
+                    'vocals': result['vocals'],
+                    'background': result['background'],
+                    'original': audio_path
+                }
 
-            # 设置环境变量限制每个进程的线程数，避免线程爆炸
-            # 计算每个进程应使用的线程数 = CPU核心数 / jobs数
             cpu_count = self._get_container_cpu_limit()
-            threads_per_process = max(1, cpu_count // self.jobs)
+            if self.chunk_seconds:
+                # 分块模式：窗口分发到 workers 个进程并行推理，直接输出 output_dir/vocals.wav、background.wav
+                # --threads 和线程环境变量都取线程总数，由 ChunkWorkerPool 按工作进程数均分
+                threads_per_process = cpu_count
+                command = [
+                    'python', '-m', 'services.audio_separator.model_server',
+                    '--audio', audio_path,
+                    '--output-dir', output_dir,
+                    '--model', self.model,
+                    '--device', self.device,
+                    '--shifts', str(self.shifts),
+                    *(['--segment', str(self.segment)] if self.segment else []),
+                    '--threads', str(cpu_count),
+                    '--chunk-seconds', str(self.chunk_seconds),
+                    '--overlap-seconds', str(self.overlap_seconds),
+                    '--workers', str(self.workers)
+                ]
+                if speech_spans is not None:
+                    spans_file = os.path.join(output_dir, 'speech_spans.json')
+                    with open(spans_file, 'w', encoding='utf-8') as f:
+                        json.dump([list(span) for span in speech_spans], f)
+                    command += ['--spans-file', spans_file, '--speech-padding', str(speech_padding)]
+                logger.info(f"执行命令: {' '.join(command)}")
+                logger.info(
+                    f"分块分离: 窗口 {self.chunk_seconds}s，重叠 {self.overlap_seconds}s，{self.workers} 个工作进程"
+                )
+            else:
+                # 构建Demucs命令（参考minimax-video-translation的实现）
+                # 每个 -j 进程的线程数 = CPU核心数 / jobs数
+                threads_per_process = max(1, cpu_count // self.jobs)
+                command = [
+                    'python', '-m', 'demucs.separate',
+                    '-n', self.model,
+                    '--two-stems', 'vocals',  # 只分离人声和伴奏
+                    '-d', self.device,
+                    '-j', str(self.jobs),  # 多进程并行加速
+                    '--shifts', str(self.shifts),
+                    *(['--segment', str(int(self.segment))] if self.segment else []),  # 命令行只接受整数秒
+                    '-o', output_dir,
+                    audio_path
+                ]
+                logger.info(f"执行命令: {' '.join(command)}")
+                logger.info(f"使用 {self.jobs} 个并行进程进行人声分离（预计加速 {min(self.jobs, 8)}x）")
 
+            # 设置环境变量限制每个进程的线程数，避免线程爆炸
             env = os.environ.copy()
             env['OMP_NUM_THREADS'] = str(threads_per_process)
             env['MKL_NUM_THREADS'] = str(threads_per_process)
             env['OPENBLAS_NUM_THREADS'] = str(threads_per_process)
             env['NUMEXPR_NUM_THREADS'] = str(threads_per_process)
 
-            logger.info(f"线程限制: 每个进程 {threads_per_process} 线程 (CPU={cpu_count}, jobs={self.jobs})")
+            logger.info(f"线程限制: {threads_per_process} 线程 (CPU={cpu_count})")
 
             # 使用非阻塞方式读取输出
             import threading
@@ -191,14 +290,20 @@ class DemucsSeparator(BaseSeparator):
                 finally:
                     pipe.close()
 
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
             process = subprocess.Popen(
                 command,
                 env=env,  # 传递环境变量
+                cwd=str(Path(__file__).resolve().parents[2]),  # 分块模式以模块方式运行 services.audio_separator
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
-                bufsize=1  # 行缓冲
+                bufsize=1,  # 行缓冲
+                start_new_session=True  # 独立进程组，取消时连同 -j 子进程一起终止
             )
+            unregister = cancel_token.register(lambda: terminate_process_group(process)) if cancel_token else None
 
             # 创建输出队列和读取线程
             output_queue = queue.Queue()
@@ -236,9 +341,28 @@ class DemucsSeparator(BaseSeparator):
             stderr_thread.join(timeout=1)
             stdout_thread.join(timeout=1)
 
+            if unregister:
+                unregister()
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
             if process.returncode != 0:
                 raise RuntimeError(f"Demucs分离失败，返回码: {process.returncode}")
 
+            final_vocals_path = os.path.join(output_dir, 'vocals.wav')
+            final_background_path = os.path.join(output_dir, 'background.wav')
+
+            if self.chunk_seconds:
+                for path in (final_vocals_path, final_background_path):
+                    if not os.path.exists(path):
+                        raise RuntimeError(f"分离结果未生成: {path}")
+                logger.info(f"Demucs分块分离完成: 人声 {final_vocals_path}, 背景音 {final_background_path}")
+                return {
+                    'vocals': final_vocals_path,
+                    'background': final_background_path,
+                    'original': audio_path
+                }
+
             # 查找生成的文件
             # Demucs输出结构: output_dir/{model}/{audio_filename}/vocals.wav 和 no_vocals.wav
             audio_filename = Path(audio_path).stem
@@ -253,12 +377,10 @@ class DemucsSeparator(BaseSeparator):
             if not os.path.exists(background_path):
                 raise RuntimeError(f"背景音文件未生成: {background_path}")
 
-            # 移动文件到目标位置（便于访问）
-            final_vocals_path = os.path.join(output_dir, 'vocals.wav')
-            final_background_path = os.path.join(output_dir, 'background.wav')
-
-            shutil.copy2(vocals_path, final_vocals_path)
-            shutil.copy2(background_path, final_background_path)
+            # 移动文件到目标位置（同目录树内改名，不复制数据），删除 Demucs 的嵌套输出目录
+            os.replace(vocals_path, final_vocals_path)
+            os.replace(background_path, final_background_path)
+            shutil.rmtree(os.path.join(output_dir, self.model), ignore_errors=True)
 
             logger.info(f"Demucs分离完成:")
             logger.info(f"  人声: {final_vocals_path} ({os.path.getsize(final_vocals_path)} bytes)")
@@ -270,6 +392,9 @@ class DemucsSeparator(BaseSeparator):
                 'original': audio_path
             }
 
+        except OperationCancelled:
+            logger.info("Demucs分离已取消")
+            raise
         except subprocess.TimeoutExpired:
             logger.error("Demucs分离超时")
             raise RuntimeError("分离超时，请尝试更短的音频")
@@ -0,0 +1,506 @@
+"""
+常驻 Demucs 模型服务
+
+`python -m demucs.separate` 每个任务都要启动新的 Python 解释器、导入 torch、从磁盘加载 htdemucs_ft（4个子模型），
+再开始分离；is_available() 还要额外启动一次解释器执行 --help。
+模型服务是一个常驻进程（manage.py run_separation_server，由 supervisord 启动）：
+- 模型首次使用时加载并常驻内存，之后的任务直接推理
+- torch.set_num_threads 按容器 cgroup CPU 配额设置
+- 配置多个工作进程时，分块任务的窗口分发到常驻进程池并行推理（见 parallel.py）
+- 通过本地 Unix socket 接收任务（每行一个 JSON），任务串行执行，并发请求排队等待
+- 每个任务返回排队、模型加载、音频读取、推理、写文件各阶段耗时
+
+协议（换行分隔的 JSON）:
+    请求: {"action": "ping"}
+          {"action": "separate", "audio_path", "output_dir", "model", "shifts", "segment",
+                                      "chunk_seconds", "overlap_seconds", "speech_spans", "speech_padding"}
+    响应: {"event": "pong", ...}
+          {"event": "stage", "stage"} / {"event": "progress", "fraction"} ... {"event": "done", "vocals", "background", "timings"}
+          {"event": "error", "error"}
+客户端断开连接视为取消，服务在阶段之间（分块模式下在每个窗口之前）检查。
+
+也可以不启动服务，直接执行一次分离（DemucsSeparator 在服务未运行时以子进程方式调用分块模式）:
+    python -m services.audio_separator.model_server --audio in.wav --output-dir out/ --chunk-seconds 60 --workers 4
+"""
+import json
+import logging
+import os
+import select
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/minimax_dubbing_separation.sock'
+
+
+def get_socket_path() -> str:
+    """模型服务 socket 路径（settings.SEPARATION_SERVER_SOCKET）"""
+    try:
+        from django.conf import settings
+        return getattr(settings, 'SEPARATION_SERVER_SOCKET', DEFAULT_SOCKET_PATH)
+    except Exception:
+        return DEFAULT_SOCKET_PATH
+
+
+class SeparationCancelled(Exception):
+    """客户端已断开，放弃当前任务"""
+    pass
+
+
+class DemucsEngine:
+    """进程内 Demucs 推理：模型加载一次后常驻"""
+
+    def __init__(self, device: str = 'cpu', threads: Optional[int] = None, workers: int = 1):
+        """
+        Args:
+            device: 推理设备
+            threads: torch 线程数（并行模式下为所有工作进程的线程总数）
+            workers: 分块任务的并行工作进程数，1 表示在本进程内串行推理
+        """
+        import torch
+
+        self.device = device
+        self.models = {}
+        self.pools = {}
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        if threads:
+            torch.set_num_threads(threads)
+        self.threads = torch.get_num_threads()
+        logger.info(f"[模型服务] torch 线程数: {self.threads}, 设备: {device}, 分块并行进程数: {self.workers}")
+
+    def get_model(self, name: str):
+        """
+        获取模型（首次调用时从磁盘加载）
+
+        Returns:
+            (模型, 加载耗时秒数；已加载时为0)
+        """
+        if name in self.models:
+            return self.models[name], 0.0
+
+        from demucs.pretrained import get_model
+
+        started = time.monotonic()
+        model = get_model(name)
+        model.to(self.device)
+        model.eval()
+        self.models[name] = model
+        elapsed = time.monotonic() - started
+        logger.info(f"[模型服务] 模型 {name} 加载完成，耗时 {elapsed:.1f}s")
+        return model, elapsed
+
+    def get_pool(self, name: str):
+        """
+        获取加载了指定模型的并行工作进程池（首次调用时启动）
+
+        Returns:
+            (ChunkWorkerPool, 启动耗时秒数；已启动时为0)
+        """
+        pool = self.pools.get(name)
+        if pool is not None and not pool.broken:
+            return pool, 0.0
+        if pool is not None:
+            del self.pools[name]
+            pool.close()
+
+        from .parallel import ChunkWorkerPool
+
+        pool = ChunkWorkerPool(name, self.workers, max(1, self.threads // self.workers), device=self.device)
+        try:
+            elapsed = pool.warmup()
+        except BaseException:
+            # 工作进程初始化失败（模型加载失败、OOM 等）：进程池已不可用，不能留给后续请求复用
+            pool.broken = True
+            pool.close()
+            raise
+        self.pools[name] = pool
+        return pool, elapsed
+
+    def close(self):
+        """关闭工作进程池"""
+        for pool in self.pools.values():
+            pool.close()
+        self.pools.clear()
+
+    def separate(
+        self,
+        audio_path: str,
+        output_dir: str,
+        model_name: str = 'htdemucs_ft',
+        shifts: int = 1,
+        segment: Optional[float] = None,
+        on_stage: Optional[Callable[[str], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        chunk_seconds: Optional[float] = None,
+        overlap_seconds: Optional[float] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+        speech_spans: Optional[List[Tuple[float, float]]] = None,
+        speech_padding: Optional[float] = None
+    ) -> Dict:
+        """
+        分离人声和背景音（two-stems: vocals / no_vocals）
+
+        Args:
+            audio_path: 输入音频
+            output_dir: 输出目录，写入 vocals.wav 和 background.wav
+            model_name: Demucs 模型名
+            shifts: 随机平移次数（与命令行 --shifts 相同）
+            segment: Demucs 内部切片长度（秒，与命令行 --segment 相同），None 时使用模型默认值
+            on_stage: 阶段回调 on_stage(阶段名)
+            should_cancel: 取消检查，在阶段之间调用（分块模式下每个窗口之前也调用）
+            chunk_seconds: 指定时使用分块重叠相加模式（见 chunked.py），峰值内存与音频时长无关
+            overlap_seconds: 分块模式的窗口重叠长度（秒）
+            on_progress: 分块模式的进度回调 on_progress(比例0-1)
+            speech_spans: 语音段落 [(开始秒, 结束秒)]，指定时只对语音区间推理（分块模式，未指定窗口时使用默认窗口）
+            speech_padding: 语音段落前后余量（秒）
+
+        Returns:
+            {'vocals', 'background', 'timings': {'queue_wait', 'model_load', 'audio_load', 'inference', 'write'}}
+        """
+        import torch
+        from demucs.apply import apply_model
+        from demucs.audio import AudioFile, save_audio
+
+        from .chunked import DEFAULT_CHUNK_SECONDS, DEFAULT_OVERLAP_SECONDS, DEFAULT_SPEECH_PADDING
+
+        if speech_spans is not None and not chunk_seconds:
+            chunk_seconds = DEFAULT_CHUNK_SECONDS
+        span_options = {
+            'speech_spans': speech_spans,
+            'speech_padding': DEFAULT_SPEECH_PADDING if speech_padding is None else speech_padding,
+        }
+
+        def stage(name):
+            if should_cancel is not None and should_cancel():
+                raise SeparationCancelled()
+            if on_stage is not None:
+                on_stage(name)
+
+        # 同一进程内串行推理（模型和 torch 线程池共享）
+        waiting = time.monotonic()
+        with self._lock:
+            timings = {'queue_wait': time.monotonic() - waiting}
+
+            os.makedirs(output_dir, exist_ok=True)
+            vocals_path = os.path.join(output_dir, 'vocals.wav')
+            background_path = os.path.join(output_dir, 'background.wav')
+
+            if chunk_seconds and self.workers > 1:
+                stage('model_load')
+                pool, timings['model_load'] = self.get_pool(model_name)
+
+                stage('inference')
+                timings.update(pool.separate(
+                    audio_path, vocals_path, background_path,
+                    shifts=shifts,
+                    segment=segment,
+                    chunk_seconds=chunk_seconds,
+                    overlap_seconds=overlap_seconds or DEFAULT_OVERLAP_SECONDS,
+                    on_progress=on_progress,
+                    should_cancel=should_cancel,
+                    **span_options
+                ))
+                timings = {key: round(value, 2) for key, value in timings.items()}
+                logger.info(f"[模型服务] 并行分块分离完成 {audio_path}: {timings}")
+                return {'vocals': vocals_path, 'background': background_path, 'timings': timings}
+
+            stage('model_load')
+            model, timings['model_load'] = self.get_model(model_name)
+
+            if chunk_seconds:
+                from .chunked import separate_chunked
+
+                stage('inference')
+                timings.update(separate_chunked(
+                    model, audio_path, vocals_path, background_path,
+                    device=self.device,
+                    shifts=shifts,
+                    segment=segment,
+                    chunk_seconds=chunk_seconds,
+                    overlap_seconds=overlap_seconds or DEFAULT_OVERLAP_SECONDS,
+                    on_progress=on_progress,
+                    should_cancel=should_cancel,
+                    **span_options
+                ))
+                timings = {key: round(value, 2) for key, value in timings.items()}
+                logger.info(f"[模型服务] 分块分离完成 {audio_path}: {timings}")
+                return {'vocals': vocals_path, 'background': background_path, 'timings': timings}
+
+            stage('audio_load')
+            started = time.monotonic()
+            wav = AudioFile(audio_path).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+            ref = wav.mean(0)
+            mean, std = ref.mean(), ref.std()
+            wav = (wav - mean) / std
+            timings['audio_load'] = time.monotonic() - started
+
+            stage('inference')
+            started = time.monotonic()
+            with torch.no_grad():
+                sources = apply_model(
+                    model, wav[None], device=self.device, shifts=shifts, split=True, overlap=0.25, progress=False,
+                    segment=segment
+                )[0]
+            sources = sources * std + mean
+            timings['inference'] = time.monotonic() - started
+
+            stage('write')
+            started = time.monotonic()
+            vocals_index = model.sources.index('vocals')
+            vocals = sources[vocals_index]
+            background = sources.sum(0) - vocals
+            save_audio(vocals.cpu(), vocals_path, samplerate=model.samplerate)
+            save_audio(background.cpu(), background_path, samplerate=model.samplerate)
+            timings['write'] = time.monotonic() - started
+
+        timings = {key: round(value, 2) for key, value in timings.items()}
+        logger.info(f"[模型服务] 分离完成 {audio_path}: {timings}")
+        return {'vocals': vocals_path, 'background': background_path, 'timings': timings}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """处理一个连接上的一个请求"""
+
+    def _send(self, payload: Dict):
+        self.wfile.write((json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def _client_gone(self) -> bool:
+        """客户端断开（socket 可读且读到EOF）"""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self.connection.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def handle(self):
+        engine: DemucsEngine = self.server.engine
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8') or '{}')
+        except ValueError:
+            self._send({'event': 'error', 'error': '请求格式错误'})
+            return
+
+        action = request.get('action')
+        try:
+            if action == 'ping':
+                self._send({
+                    'event': 'pong',
+                    'models': list(engine.models),
+                    'pools': list(engine.pools),
+                    'workers': engine.workers,
+                    'pid': os.getpid()
+                })
+            elif action == 'separate':
+                result = engine.separate(
+                    request['audio_path'],
+                    request['output_dir'],
+                    model_name=request.get('model', 'htdemucs_ft'),
+                    shifts=int(request.get('shifts', 1)),
+                    segment=request.get('segment'),
+                    on_stage=lambda name: self._send({'event': 'stage', 'stage': name}),
+                    should_cancel=self._client_gone,
+                    chunk_seconds=request.get('chunk_seconds'),
+                    overlap_seconds=request.get('overlap_seconds'),
+                    speech_spans=request.get('speech_spans'),
+                    speech_padding=request.get('speech_padding'),
+                    on_progress=lambda fraction: self._send({'event': 'progress', 'fraction': round(fraction, 4)})
+                )
+                self._send({'event': 'done', **result})
+            else:
+                self._send({'event': 'error', 'error': f'未知操作: {action}'})
+        except SeparationCancelled:
+            logger.info(f"[模型服务] 客户端已断开，放弃任务: {request.get('audio_path')}")
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("[模型服务] 客户端连接已断开")
+        except Exception as e:
+            logger.error(f"[模型服务] 任务失败: {e}", exc_info=True)
+            try:
+                self._send({'event': 'error', 'error': str(e)})
+            except OSError:
+                pass
+
+
+class SeparationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """模型服务（每个连接一个线程，推理由 DemucsEngine 串行化）"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, engine: DemucsEngine):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.engine = engine
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o660)
+
+
+class SeparationClient:
+    """模型服务客户端"""
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or get_socket_path()
+
+    def _connect(self, timeout: Optional[float]) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def ping(self, timeout: float = 2.0) -> Optional[Dict]:
+        """
+        检查服务是否在运行
+
+        Returns:
+            服务信息（已加载的模型、进程号）；服务不可用返回 None
+        """
+        if not os.path.exists(self.socket_path):
+            return None
+        try:
+            with self._connect(timeout) as sock:
+                sock.sendall(b'{"action": "ping"}\n')
+                line = sock.makefile('rb').readline()
+            response = json.loads(line.decode('utf-8'))
+            return response if response.get('event') == 'pong' else None
+        except (OSError, ValueError):
+            return None
+
+    def separate(
+        self,
+        audio_path: str,
+        output_dir: str,
+        model: str = 'htdemucs_ft',
+        shifts: int = 1,
+        cancel_token: Optional[CancellationToken] = None,
+        segment: Optional[float] = None,
+        chunk_seconds: Optional[float] = None,
+        overlap_seconds: Optional[float] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        speech_spans: Optional[List[Tuple[float, float]]] = None,
+        speech_padding: Optional[float] = None
+    ) -> Dict:
+        """
+        提交分离任务并等待完成
+
+        取消时关闭连接，服务在当前阶段（分块模式下为当前窗口）结束后放弃该任务。
+
+        Args:
+            segment: Demucs 内部切片长度（秒），None 时使用模型默认值
+            chunk_seconds: 指定时使用分块重叠相加模式
+            overlap_seconds: 分块模式的窗口重叠长度（秒）
+            progress_callback: 分块模式的进度回调 progress_callback(比例0-1)
+            speech_spans: 语音段落 [(开始秒, 结束秒)]，指定时只对语音区间推理
+            speech_padding: 语音段落前后余量（秒）
+
+        Returns:
+            {'vocals', 'background', 'timings'}
+
+        Raises:
+            OperationCancelled: 任务被取消
+            RuntimeError: 服务返回错误或连接中断
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        sock = self._connect(None)
+        unregister = cancel_token.register(lambda: sock.shutdown(socket.SHUT_RDWR)) if cancel_token else None
+        try:
+            request = {
+                'action': 'separate',
+                'audio_path': os.path.abspath(audio_path),
+                'output_dir': os.path.abspath(output_dir),
+                'model': model,
+                'shifts': shifts,
+                'segment': segment,
+                'chunk_seconds': chunk_seconds,
+                'overlap_seconds': overlap_seconds,
+                'speech_spans': speech_spans,
+                'speech_padding': speech_padding
+            }
+            sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+            reader = sock.makefile('rb')
+            for line in reader:
+                event = json.loads(line.decode('utf-8'))
+                if event['event'] == 'stage':
+                    logger.info(f"[模型服务] 阶段: {event['stage']}")
+                elif event['event'] == 'progress':
+                    if progress_callback is not None:
+                        progress_callback(event['fraction'])
+                elif event['event'] == 'done':
+                    return event
+                elif event['event'] == 'error':
+                    raise RuntimeError(f"模型服务分离失败: {event['error']}")
+        except OSError:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            raise RuntimeError("模型服务连接中断")
+        finally:
+            if unregister:
+                unregister()
+            sock.close()
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        raise RuntimeError("模型服务连接中断")
+
+
+def main():
+    """一次性分离（不启动服务）：加载模型、分离、退出；各阶段耗时以 JSON 输出到 stdout"""
+    import argparse
+
+    from services.utils.admission import get_container_cpu_limit
+
+    parser = argparse.ArgumentParser(description='Demucs 人声分离（单次执行）')
+    parser.add_argument('--audio', required=True, help='输入音频')
+    parser.add_argument('--output-dir', required=True, help='输出目录（写入 vocals.wav / background.wav）')
+    parser.add_argument('--model', default='htdemucs_ft')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--shifts', type=int, default=1)
+    parser.add_argument('--segment', type=float, help='Demucs 内部切片长度（秒，默认使用模型默认值）')
+    parser.add_argument('--threads', type=int, help='torch 线程数（默认取容器 CPU 配额）')
+    parser.add_argument('--workers', type=int, default=1, help='分块模式的并行工作进程数')
+    parser.add_argument('--chunk-seconds', type=float, help='分块模式的窗口长度（秒）')
+    parser.add_argument('--overlap-seconds', type=float, help='分块模式的窗口重叠长度（秒）')
+    parser.add_argument('--spans-file', help='语音段落 JSON 文件（[[开始秒, 结束秒], ...]），指定时只对语音区间推理')
+    parser.add_argument('--speech-padding', type=float, help='语音段落前后余量（秒）')
+    args = parser.parse_args()
+
+    speech_spans = None
+    if args.spans_file:
+        with open(args.spans_file, 'r', encoding='utf-8') as f:
+            speech_spans = json.load(f)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    engine = DemucsEngine(
+        device=args.device,
+        threads=args.threads or max(1, int(get_container_cpu_limit())),
+        workers=args.workers
+    )
+    try:
+        result = engine.separate(
+            args.audio,
+            args.output_dir,
+            model_name=args.model,
+            shifts=args.shifts,
+            segment=args.segment,
+            chunk_seconds=args.chunk_seconds,
+            overlap_seconds=args.overlap_seconds,
+            speech_spans=speech_spans,
+            speech_padding=args.speech_padding,
+            on_progress=lambda fraction: logger.info(f"[分块分离] 进度 {fraction * 100:.0f}%")
+        )
+    finally:
+        engine.close()
+    print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+if __name__ == '__main__':
+    main()
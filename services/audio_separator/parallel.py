@@ -0,0 +1,229 @@
+"""
+多进程并行分块人声分离
+
+分块模式（chunked.py）的各个窗口共用全局归一化参数、相互独立，可以分发到多个进程同时推理：
+- 每个工作进程启动时加载一次模型，torch 线程数 = CPU 配额 / 进程数（避免线程超额订阅）
+- 主进程顺序读取窗口并提交，同时在途的窗口数不超过 2×进程数（内存有上界）
+- 结果按提交顺序取回，交给 OverlapAddWriter 交叉淡化后写出，输出与串行分块一致
+取代 demucs.separate 的 -j 参数：-j 只并行单个音频内部的切片，且每个进程都要完整加载音频。
+"""
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.audio_engine.stream_mix import FFmpegPCMReader
+
+from .chunked import (
+    DEFAULT_CHUNK_SECONDS,
+    DEFAULT_OVERLAP_SECONDS,
+    DEFAULT_SPEECH_CROSSFADE,
+    DEFAULT_SPEECH_PADDING,
+    OverlapAddWriter,
+    finish_stems,
+    infer_window,
+    input_stats,
+    iter_work,
+    prepare_spans,
+    window_frames,
+)
+from .model_server import SeparationCancelled
+
+logger = logging.getLogger(__name__)
+
+# 每个工作进程至少分配的 torch 线程数（少于2线程时单进程内的矩阵运算效率明显下降）
+MIN_THREADS_PER_WORKER = 2
+MAX_WORKERS = 8
+# 每个工作进程常驻内存（torch + 模型 + 一个窗口的推理缓冲），GB
+WORKER_MEMORY_GB = 2.0
+
+# 工作进程内的模型（由 _init_worker 加载）
+_worker_model = None
+_worker_device = 'cpu'
+
+
+def plan_workers(cpu_count: float, available_memory_gb: Optional[float] = None,
+                 max_workers: int = MAX_WORKERS) -> Tuple[int, int]:
+    """
+    根据 CPU 配额和可用内存确定工作进程数
+
+    Returns:
+        (进程数, 每进程 torch 线程数)
+    """
+    cpu_count = max(1, int(cpu_count))
+    workers = max(1, min(cpu_count // MIN_THREADS_PER_WORKER, max_workers))
+    if available_memory_gb is not None:
+        # 与 _auto_detect_jobs 相同，保留30%内存
+        workers = max(1, min(workers, int(available_memory_gb * 0.7 / WORKER_MEMORY_GB)))
+    return workers, max(1, cpu_count // workers)
+
+
+def _init_worker(model_name: str, device: str, threads: int):
+    """工作进程初始化：设置线程数并加载模型"""
+    global _worker_model, _worker_device
+    # 父进程的线程环境变量是所有工作进程的线程总数，导入 torch 前改为本进程的份额
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+        os.environ[name] = str(threads)
+    import torch
+    from demucs.pretrained import get_model
+
+    torch.set_num_threads(threads)
+    model = get_model(model_name)
+    model.to(device)
+    model.eval()
+    _worker_model = model
+    _worker_device = device
+
+
+def _worker_ready(delay: float) -> int:
+    """预热任务：确认模型已加载；短暂占用进程，使预热任务分散到每个工作进程"""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _separate_window(buffer, mean: float, std: float, shifts: int, segment: Optional[float]):
+    return infer_window(_worker_model, buffer, mean, std, device=_worker_device, shifts=shifts, segment=segment)
+
+
+class ChunkWorkerPool:
+    """加载了同一模型的工作进程池，可在多次分离之间复用"""
+
+    def __init__(self, model_name: str, workers: int, threads_per_worker: int, device: str = 'cpu'):
+        self.model_name = model_name
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.device = device
+        # spawn：不继承父进程的 torch 线程池和 socket
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(model_name, device, threads_per_worker)
+        )
+        self.broken = False
+
+    def warmup(self) -> float:
+        """
+        启动全部工作进程并等待模型加载完成
+
+        Returns:
+            耗时（秒）
+        """
+        started = time.monotonic()
+        pids = {future.result() for future in [self.executor.submit(_worker_ready, 0.2) for _ in range(self.workers)]}
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"[并行分离] {self.workers} 个工作进程就绪 (模型 {self.model_name}, 每进程 {self.threads_per_worker} 线程, "
+            f"pid={sorted(pids)})，耗时 {elapsed:.1f}s"
+        )
+        return elapsed
+
+    def separate(
+        self,
+        audio_path: str,
+        vocals_path: str,
+        background_path: str,
+        sample_rate: int = 44100,
+        channels: int = 2,
+        shifts: int = 1,
+        segment: Optional[float] = None,
+        chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+        overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+        on_progress: Optional[Callable[[float], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        speech_spans: Optional[List[Tuple[float, float]]] = None,
+        speech_padding: float = DEFAULT_SPEECH_PADDING
+    ) -> Dict[str, float]:
+        """
+        并行分块分离（参数含义同 chunked.separate_chunked）
+
+        Args:
+            sample_rate: 模型采样率（Demucs 均为 44100）
+            channels: 模型声道数（Demucs 均为 2）
+
+        Returns:
+            各阶段耗时 {'audio_load', 'inference', 'write'}；inference 为主进程等待推理结果的时间
+
+        Raises:
+            SeparationCancelled: should_cancel 返回 True
+        """
+        window, overlap = window_frames(sample_rate, chunk_seconds, overlap_seconds)
+        timings = {'audio_load': 0.0, 'inference': 0.0, 'write': 0.0}
+
+        started = time.monotonic()
+        mean, std, total_frames = input_stats(audio_path, sample_rate, channels)
+        timings['audio_load'] += time.monotonic() - started
+        spans = prepare_spans(speech_spans, total_frames, sample_rate, speech_padding, audio_path)
+        crossfade = int(min(DEFAULT_SPEECH_CROSSFADE, speech_padding) * sample_rate) or 1
+        logger.info(
+            f"[并行分离] {audio_path}: {total_frames / sample_rate:.1f}s，窗口 {chunk_seconds}s，"
+            f"重叠 {overlap_seconds}s，{self.workers} 个工作进程"
+        )
+
+        reader = FFmpegPCMReader(audio_path, sample_rate, channels)
+        output = OverlapAddWriter([vocals_path, background_path], sample_rate, channels, overlap)
+        windows = iter_work(reader, window, overlap, spans, crossfade, timings)
+        # 在途块：(推理 Future，直通块为 None, 原始采样, 是否结束重叠拼接, 区间边缘淡化权重)
+        in_flight = deque()
+        max_in_flight = self.workers * 2
+        processed = 0
+
+        def submit_next() -> bool:
+            try:
+                buffer, is_last, ramp, infer = next(windows)
+            except StopIteration:
+                return False
+            future = self.executor.submit(_separate_window, buffer, mean, std, shifts, segment) if infer else None
+            in_flight.append((future, buffer, is_last, ramp))
+            return True
+
+        try:
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+
+            while in_flight:
+                if should_cancel is not None and should_cancel():
+                    raise SeparationCancelled()
+
+                future, buffer, is_last, ramp = in_flight.popleft()
+                started = time.monotonic()
+                stems = finish_stems(future.result() if future is not None else None, buffer, ramp)
+                timings['inference'] += time.monotonic() - started
+
+                # 先补充提交，写文件期间工作进程不空闲
+                submit_next()
+
+                started = time.monotonic()
+                processed += output.add(stems, is_last)
+                timings['write'] += time.monotonic() - started
+
+                if on_progress is not None:
+                    on_progress(min(1.0, processed / total_frames))
+
+            started = time.monotonic()
+            output.close()
+            timings['write'] += time.monotonic() - started
+
+        except BrokenProcessPool:
+            # 工作进程异常退出（通常是被 OOM Kill），进程池不可再用
+            self.broken = True
+            output.abort()
+            raise RuntimeError("并行分离的工作进程异常退出（可能内存不足），请减少工作进程数或缩短窗口")
+        except BaseException:
+            for future, *_ in in_flight:
+                if future is not None:
+                    future.cancel()
+            output.abort()
+            raise
+        finally:
+            windows.close()
+            reader.close()
+
+        return timings
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
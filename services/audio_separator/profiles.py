@@ -0,0 +1,98 @@
+"""
+人声分离质量档位和自动选择策略
+
+htdemucs_ft 是4个子模型的组合（bag of models），推理耗时约为单个 htdemucs 的4倍。
+对长音频或排队较多时，全部使用 htdemucs_ft 会让任务远超用户可接受的等待时间。
+档位：
+- fast: htdemucs，较短的 segment，不做随机平移
+- balanced: htdemucs，默认 segment，shifts=1
+- best: htdemucs_ft，shifts=1（原有默认配置）
+自动策略按 (排队任务数 + 1) × 音频时长 × 实时率 估算完成时间，在时间预算内选择质量最高的档位；
+实时率优先使用历史任务的实测值，没有历史数据时使用默认估计。
+"""
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEPARATION_PROFILES = {
+    'fast': {
+        'label': '快速',
+        'model': 'htdemucs',
+        'segment': 4,
+        'shifts': 0,
+        # CPU 上的默认实时率估计（分离耗时 / 音频时长）
+        'default_rtf': 0.15,
+    },
+    'balanced': {
+        'label': '均衡',
+        'model': 'htdemucs',
+        'segment': None,
+        'shifts': 1,
+        'default_rtf': 0.3,
+    },
+    'best': {
+        'label': '最佳',
+        'model': 'htdemucs_ft',
+        'segment': None,
+        'shifts': 1,
+        'default_rtf': 1.2,
+    },
+}
+
+# 质量从高到低
+PROFILE_ORDER = ('best', 'balanced', 'fast')
+
+AUTO_PROFILE = 'auto'
+
+# 未设置截止时间时的时间预算：音频时长 × 该倍数（至少 MIN_TIME_BUDGET 秒）
+DEFAULT_TIME_BUDGET_RATIO = 1.5
+MIN_TIME_BUDGET = 600
+
+
+def get_profile(name: str) -> Dict:
+    """档位配置；未知档位抛出 ValueError"""
+    if name not in SEPARATION_PROFILES:
+        raise ValueError(f"未知的分离档位: {name}（可选: {', '.join(PROFILE_ORDER)}, {AUTO_PROFILE}）")
+    return SEPARATION_PROFILES[name]
+
+
+def choose_profile(
+    duration: float,
+    queue_depth: int = 0,
+    deadline_seconds: Optional[float] = None,
+    measured_rtf: Optional[Dict[str, float]] = None,
+    budget_ratio: float = DEFAULT_TIME_BUDGET_RATIO
+) -> Tuple[str, str]:
+    """
+    按音频时长、排队情况和截止时间选择档位
+
+    Args:
+        duration: 音频时长（秒）
+        queue_depth: 正在运行和排队中的分离任务数（不含本任务）
+        deadline_seconds: 距截止时间的秒数；None 时使用 duration × budget_ratio
+        measured_rtf: 各档位的历史实测实时率
+        budget_ratio: 未设置截止时间时的时间预算倍数
+
+    Returns:
+        (档位名, 选择原因)
+    """
+    if deadline_seconds is None:
+        budget = max(MIN_TIME_BUDGET, duration * budget_ratio)
+        budget_source = '默认预算'
+    else:
+        budget = max(0.0, deadline_seconds)
+        budget_source = '截止时间'
+
+    for name in PROFILE_ORDER:
+        rtf = (measured_rtf or {}).get(name) or SEPARATION_PROFILES[name]['default_rtf']
+        # 分离任务由准入控制串行化，前面的任务按相同时长粗略估计
+        estimate = (queue_depth + 1) * duration * rtf
+        if estimate <= budget:
+            reason = (
+                f"预计 {estimate:.0f}s ≤ {budget_source} {budget:.0f}s "
+                f"(时长 {duration:.0f}s, 排队 {queue_depth}, 实时率 {rtf:.2f})"
+            )
+            return name, reason
+
+    return 'fast', f"所有档位均超出{budget_source} {budget:.0f}s（时长 {duration:.0f}s, 排队 {queue_depth}），使用最快档位"
@@ -5,17 +5,20 @@ import os
 import subprocess
 import logging
 from pathlib import Path
+from services.utils.cancellation import OperationCancelled
+from services.utils.ffmpeg_runner import probe_duration, run_ffmpeg
 
 logger = logging.getLogger(__name__)
 
 
-def extract_audio_from_video(video_path: str, output_audio_path: str) -> str:
+def extract_audio_from_video(video_path: str, output_audio_path: str, cancel_token=None) -> str:
     """
     从视频文件提取音频
 
     Args:
         video_path: 视频文件路径
         output_audio_path: 输出音频文件路径
+        cancel_token: 取消令牌，取消时终止ffmpeg进程组
 
     Returns:
         str: 提取后的音频文件路径
@@ -41,13 +44,9 @@ def extract_audio_from_video(video_path: str, output_audio_path: str) -> str:
 
         logger.info(f"开始从视频提取音频: {video_path} -> {output_audio_path}")
 
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            timeout=600  # 10分钟超时
-        )
+        # 超时按视频时长计算，stderr 只保留末尾
+        result = run_ffmpeg(command, duration=probe_duration(video_path), cancel_token=cancel_token)
+        result.check_returncode()
 
         if os.path.exists(output_audio_path):
             file_size = os.path.getsize(output_audio_path)
@@ -56,12 +55,15 @@ def extract_audio_from_video(video_path: str, output_audio_path: str) -> str:
         else:
             raise RuntimeError("音频文件未生成")
 
-    except subprocess.TimeoutExpired:
-        logger.error(f"音频提取超时: {video_path}")
+    except OperationCancelled:
+        logger.info(f"音频提取已取消: {video_path}")
+        raise
+    except subprocess.TimeoutExpired as e:
+        logger.error(f"音频提取超时（{e.timeout:.0f}s）: {video_path}")
         raise RuntimeError("音频提取超时")
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg执行失败: {e.stderr.decode()}")
-        raise RuntimeError(f"音频提取失败: {e.stderr.decode()}")
+        logger.error(f"FFmpeg执行失败: {e.stderr}")
+        raise RuntimeError(f"音频提取失败: {e.stderr}")
     except Exception as e:
         logger.error(f"音频提取异常: {str(e)}")
         raise RuntimeError(f"音频提取失败: {str(e)}")
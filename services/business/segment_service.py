@@ -9,6 +9,7 @@ from segments.models import Segment
 from projects.models import Project
 from services.clients.minimax_client import MiniMaxClient
 from services.algorithms.timestamp_aligner import TimestampAligner
+from services.utils.cancellation import OperationCancelled
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
@@ -340,6 +341,8 @@ class SegmentService(BaseService):
                 segment.save()
                 return 'failed'
 
+        except OperationCancelled:
+            raise
         except Exception as e:
             segment.save()
             self.logger.error(f"段落{segment.index}批量TTS失败: {str(e)}")
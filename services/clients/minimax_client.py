@@ -4,11 +4,16 @@ MiniMax API客户端
 """
 import requests
 import json
+import socket
 import time
 import logging
+import threading
 from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from django.conf import settings
 from backend.exceptions import ExternalAPIError
+from services.utils.cancellation import CancellationToken, OperationCancelled
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +22,67 @@ logger = logging.getLogger(__name__)
 # MiniMaxAPIError 已被 ExternalAPIError 替代
 
 
+class _AbortableAdapter(HTTPAdapter):
+    """记录正在使用的连接，abort() 关闭其 socket，使阻塞中的读写立即出错返回"""
+
+    def __init__(self, *args, **kwargs):
+        self._active = set()
+        self._active_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _install_tracking(self, manager):
+        adapter = self
+
+        def tracking(base):
+            class TrackingPool(base):
+                def _get_conn(self, timeout=None):
+                    conn = super()._get_conn(timeout)
+                    with adapter._active_lock:
+                        adapter._active.add(conn)
+                    return conn
+
+                def _put_conn(self, conn):
+                    with adapter._active_lock:
+                        adapter._active.discard(conn)
+                    super()._put_conn(conn)
+            return TrackingPool
+
+        manager.pool_classes_by_scheme = {
+            'http': tracking(HTTPConnectionPool),
+            'https': tracking(HTTPSConnectionPool),
+        }
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._install_tracking(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        # 代理连接同样需要可中断
+        if proxy not in self.proxy_manager:
+            self._install_tracking(super().proxy_manager_for(proxy, **proxy_kwargs))
+        return self.proxy_manager[proxy]
+
+    def abort(self):
+        """中断所有进行中的请求"""
+        with self._active_lock:
+            connections = list(self._active)
+            self._active.clear()
+        for conn in connections:
+            sock = getattr(conn, 'sock', None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
 class MiniMaxClient:
     """MiniMax API客户端"""
 
-    def __init__(self, api_key: str = None, group_id: str = None):
+    def __init__(self, api_key: str = None, group_id: str = None,
+                 cancel_token: Optional[CancellationToken] = None):
         self.api_key = api_key or settings.MINIMAX_API_KEY
         self.group_id = group_id or settings.MINIMAX_GROUP_ID
         self.llm_base_url = settings.MINIMAX_API_BASE_URL
@@ -32,6 +94,58 @@ class MiniMaxClient:
         self.llm_interval = 1.0  # LLM请求间隔1秒
         self.tts_interval = 3.0  # TTS请求间隔3秒
 
+        # 取消令牌：取消后等待立即返回，进行中的请求被中断
+        self.cancel_token = cancel_token
+
+        # 每个客户端独立的 Session，取消时只中断本客户端的连接
+        self.adapter = _AbortableAdapter()
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def _sleep(self, seconds: float):
+        """可被取消打断的等待"""
+        if self.cancel_token is not None:
+            self.cancel_token.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _send(self, method: str, url: str, headers: Dict, data: Any = None) -> requests.Response:
+        """
+        发送HTTP请求（使用本客户端的 Session）
+
+        设置了取消令牌时，取消回调会关闭正在使用的连接的 socket，阻塞中的请求立即出错返回，
+        随后抛出 OperationCancelled；请求不会在后台继续执行。
+        """
+        def do_send():
+            if method.upper() == 'POST':
+                if isinstance(data, dict):
+                    return self.session.post(url, headers=headers, json=data, timeout=30)
+                return self.session.post(url, headers=headers, data=data, timeout=30)
+            return self.session.get(url, headers=headers, timeout=30)
+
+        if self.cancel_token is None:
+            return do_send()
+
+        self.cancel_token.raise_if_cancelled()
+        unregister = self.cancel_token.register(self._abort)
+        try:
+            response = do_send()
+        except requests.exceptions.RequestException:
+            # 连接被取消回调关闭
+            self.cancel_token.raise_if_cancelled()
+            raise
+        finally:
+            unregister()
+
+        self.cancel_token.raise_if_cancelled()
+        return response
+
+    def _abort(self):
+        """取消回调：中断进行中的请求并关闭 Session"""
+        self.adapter.abort()
+        self.session.close()
+
     def _rate_limit(self, request_type: str):
         """请求限流控制"""
         current_time = time.time()
@@ -41,7 +155,7 @@ class MiniMaxClient:
             if time_since_last < self.llm_interval:
                 sleep_time = self.llm_interval - time_since_last
                 logger.info(f"LLM请求限流，等待 {sleep_time:.2f} 秒")
-                time.sleep(sleep_time)
+                self._sleep(sleep_time)
             self.last_llm_request = time.time()
 
         elif request_type == 'tts':
@@ -49,7 +163,7 @@ class MiniMaxClient:
             if time_since_last < self.tts_interval:
                 sleep_time = self.tts_interval - time_since_last
                 logger.info(f"TTS请求限流，等待 {sleep_time:.2f} 秒")
-                time.sleep(sleep_time)
+                self._sleep(sleep_time)
             self.last_tts_request = time.time()
 
     def _make_request(self, method: str, url: str, headers: Dict, data: Any = None,
@@ -63,13 +177,7 @@ class MiniMaxClient:
                 try:
                     logger.info(f"[_make_request] 尝试 {attempt + 1}/{max_retries + 1}")
 
-                    if method.upper() == 'POST':
-                        if isinstance(data, dict):
-                            response = requests.post(url, headers=headers, json=data, timeout=30)
-                        else:
-                            response = requests.post(url, headers=headers, data=data, timeout=30)
-                    else:
-                        response = requests.get(url, headers=headers, timeout=30)
+                    response = self._send(method, url, headers, data)
 
                     # 记录trace_id
                     trace_id = response.headers.get('Trace-ID', 'N/A')
@@ -94,6 +202,8 @@ class MiniMaxClient:
                         if attempt == max_retries:
                             raise ExternalAPIError(error_msg, service="minimax")
 
+                except OperationCancelled:
+                    raise
                 except requests.exceptions.RequestException as e:
                     error_msg = f"请求异常: {str(e)}"
                     logger.error(f"[_make_request] {error_msg}")
@@ -109,7 +219,7 @@ class MiniMaxClient:
                 if attempt < max_retries:
                     wait_time = (attempt + 1) * 2
                     logger.info(f"[_make_request] 第{attempt + 1}次重试失败，等待{wait_time}秒后重试")
-                    time.sleep(wait_time)
+                    self._sleep(wait_time)
 
             # 如果所有重试都失败了
             logger.error(f"[_make_request] 所有重试都失败了")
@@ -206,6 +316,8 @@ class MiniMaxClient:
                     'success': False
                 }
 
+        except OperationCancelled:
+            raise
         except Exception as e:
             logger.error(f"[{request_trace_id}] 翻译异常: {str(e)} - 异常类型: {type(e)}")
             import traceback
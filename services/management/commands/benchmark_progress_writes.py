@@ -0,0 +1,98 @@
+"""
+进度写入基准测试
+
+模拟批量TTS循环（每个段落更新一次当前步骤、一次计数），对比：
+- legacy: 每次更新直接 monitor.save()
+- reporter: ProgressReporter 写入合并
+统计每1000个段落的数据库写入次数和耗时。测试记录在结束后删除。
+"""
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from system_monitor.models import TaskMonitor
+from services.utils.progress_reporter import ProgressReporter
+
+
+class WriteCounter:
+    """统计指定表的写入语句数量"""
+
+    def __init__(self, table):
+        self.table = table
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        statement = sql.lstrip().upper()
+        if self.table.upper() in statement and statement.startswith(('UPDATE', 'INSERT')):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = '对比逐条save()与ProgressReporter写入合并的数据库写入次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=1000, help='模拟段落数（默认1000）')
+        parser.add_argument('--segment-ms', type=float, default=5.0, help='每个段落模拟处理耗时（毫秒，默认5）')
+        parser.add_argument('--flush-interval-ms', type=int, default=1000, help='ProgressReporter写库间隔（毫秒，默认1000）')
+
+    def handle(self, *args, **options):
+        segments = options['segments']
+        segment_delay = options['segment_ms'] / 1000.0
+        flush_interval_ms = options['flush_interval_ms']
+
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING('📊 进度写入基准测试'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'  - 段落数: {segments}')
+        self.stdout.write(f'  - 每段耗时: {options["segment_ms"]} ms')
+        self.stdout.write(f'  - 写库间隔: {flush_interval_ms} ms')
+        self.stdout.write('=' * 60)
+
+        results = {}
+        for mode in ('legacy', 'reporter'):
+            results[mode] = self._run(mode, segments, segment_delay, flush_interval_ms)
+            writes, elapsed = results[mode]
+            per_1000 = writes * 1000 / segments if segments else 0
+            self.stdout.write(f'{mode:>10}: 写入 {writes} 次（每1000段 {per_1000:.0f} 次），耗时 {elapsed:.2f}s')
+
+        legacy_writes = results['legacy'][0]
+        reporter_writes = results['reporter'][0]
+        if reporter_writes:
+            self.stdout.write(self.style.SUCCESS(f'✅ 写入次数减少 {legacy_writes / reporter_writes:.1f} 倍'))
+
+    def _run(self, mode, segments, segment_delay, flush_interval_ms):
+        monitor = TaskMonitor.objects.create(
+            task_id=f'benchmark_{mode}_{uuid.uuid4().hex[:8]}',
+            task_type='benchmark',
+            project_id=0,
+            project_name='benchmark',
+            total_segments=segments,
+            start_time=timezone.now(),
+            status='running'
+        )
+        counter = WriteCounter(TaskMonitor._meta.db_table)
+        try:
+            start = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                if mode == 'legacy':
+                    for i in range(segments):
+                        monitor.current_step = f'处理段落{i + 1}'
+                        monitor.save()
+                        time.sleep(segment_delay)
+                        monitor.completed_segments = i + 1
+                        monitor.save()
+                    monitor.status = 'completed'
+                    monitor.end_time = timezone.now()
+                    monitor.save()
+                else:
+                    reporter = ProgressReporter(monitor, flush_interval_ms=flush_interval_ms)
+                    for i in range(segments):
+                        reporter.update(current_step=f'处理段落{i + 1}')
+                        time.sleep(segment_delay)
+                        reporter.update(completed_segments=i + 1)
+                    reporter.finish('completed', end_time=timezone.now())
+            return counter.writes, time.perf_counter() - start
+        finally:
+            monitor.delete()
@@ -0,0 +1,90 @@
+"""
+并行分块人声分离扩展性基准测试
+
+从输入音频截取固定长度片段（默认10分钟），依次用 1、2、4、8 个工作进程做分块分离（线程总数固定为容器 CPU 配额，
+平均分配给各进程），输出各进程数的耗时、实时率（耗时 / 音频时长）、相对单进程的加速比和并行效率。
+模型加载（工作进程启动）单独计时，不计入分离耗时。
+"""
+import os
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.audio_separator.parallel import ChunkWorkerPool
+from services.utils.admission import get_container_cpu_limit
+
+
+class Command(BaseCommand):
+    help = '测试并行分块人声分离在不同工作进程数下的耗时和加速比'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--audio', required=True, help='输入音频或视频文件')
+        parser.add_argument('--duration', type=float, default=600.0, help='截取的片段时长（秒，默认600）')
+        parser.add_argument('--workers', type=str, default='1,2,4,8', help='要测试的工作进程数，逗号分隔（默认1,2,4,8）')
+        parser.add_argument('--threads', type=int, help='torch 线程总数（默认取容器 CPU 配额）')
+        parser.add_argument('--model', type=str, default='htdemucs_ft', help='Demucs 模型（默认 htdemucs_ft）')
+        parser.add_argument('--chunk-seconds', type=float, default=60.0, help='窗口长度（秒，默认60）')
+        parser.add_argument('--overlap-seconds', type=float, default=5.0, help='窗口重叠长度（秒，默认5）')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['audio']):
+            raise CommandError(f"文件不存在: {options['audio']}")
+
+        worker_counts = [int(n) for n in options['workers'].split(',') if n.strip()]
+        threads = options['threads'] or max(1, int(get_container_cpu_limit()))
+        duration = options['duration']
+
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING('📊 并行分块人声分离基准测试'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'  - 模型: {options["model"]}')
+        self.stdout.write(f'  - 片段: {duration:.0f}s（{options["audio"]}）')
+        self.stdout.write(f'  - 窗口: {options["chunk_seconds"]}s，重叠 {options["overlap_seconds"]}s')
+        self.stdout.write(f'  - 线程总数: {threads}')
+        self.stdout.write('')
+
+        with tempfile.TemporaryDirectory(prefix='separation_bench_') as work_dir:
+            clip_path = os.path.join(work_dir, 'clip.wav')
+            subprocess.run(
+                [
+                    'ffmpeg', '-y', '-nostdin', '-loglevel', 'error', '-i', options['audio'],
+                    '-t', str(duration), '-vn', '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', clip_path
+                ],
+                check=True
+            )
+
+            results = []
+            for workers in worker_counts:
+                threads_per_worker = max(1, threads // workers)
+                self.stdout.write(f'▶ {workers} 个工作进程 × {threads_per_worker} 线程...')
+                pool = ChunkWorkerPool(options['model'], workers, threads_per_worker)
+                try:
+                    load_seconds = pool.warmup()
+                    started = time.perf_counter()
+                    timings = pool.separate(
+                        clip_path,
+                        os.path.join(work_dir, f'vocals_{workers}.wav'),
+                        os.path.join(work_dir, f'background_{workers}.wav'),
+                        chunk_seconds=options['chunk_seconds'],
+                        overlap_seconds=options['overlap_seconds']
+                    )
+                    elapsed = time.perf_counter() - started
+                finally:
+                    pool.close()
+                results.append((workers, threads_per_worker, load_seconds, elapsed, timings))
+                self.stdout.write(f'  模型加载 {load_seconds:.1f}s，分离 {elapsed:.1f}s，各阶段 {timings}')
+
+        baseline = results[0][3]
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('结果'))
+        self.stdout.write('-' * 60)
+        self.stdout.write('  进程  线程/进程    耗时(s)   实时率   加速比   效率')
+        for workers, threads_per_worker, _, elapsed, _ in results:
+            speedup = baseline / max(elapsed, 1e-6)
+            self.stdout.write(
+                f'  {workers:4d}  {threads_per_worker:9d}  {elapsed:9.1f}  {elapsed / duration:7.3f}  '
+                f'{speedup:6.2f}x  {speedup / (workers / results[0][0]) * 100:5.0f}%'
+            )
+        self.stdout.write('')
@@ -0,0 +1,95 @@
+"""
+时间轴混音基准测试
+
+合成一条 N 段、总长 T 秒的配音时间轴（每段为一个正弦音），对比：
+- legacy: AudioSegment.silent + 逐段 overlay（每次复制整条音轨）
+- timeline: TimelineMixer 预分配缓冲区 + 切片累加
+legacy 的开销与段落数成正比，默认只实测前 --legacy-sample 段并线性外推总耗时，--full-legacy 可完整运行。
+"""
+import math
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from pydub import AudioSegment
+
+from services.audio_engine import TimelineMixer
+
+
+def make_clip(duration: float, sample_rate: int, frequency: float) -> AudioSegment:
+    """生成单声道16bit正弦音片段"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    samples = (0.3 * np.sin(2 * math.pi * frequency * t) * 32767).astype(np.int16)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=sample_rate, channels=1)
+
+
+class Command(BaseCommand):
+    help = '对比pydub逐段overlay与NumPy时间轴混音的耗时和内存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=800, help='段落数（默认800）')
+        parser.add_argument('--duration', type=float, default=3600.0, help='时间轴总时长（秒，默认3600）')
+        parser.add_argument('--sample-rate', type=int, default=32000, help='采样率（默认32000，与TTS输出一致）')
+        parser.add_argument('--legacy-sample', type=int, default=40, help='legacy实测段落数，其余线性外推（默认40）')
+        parser.add_argument('--full-legacy', action='store_true', help='完整运行legacy（1小时音轨可能需要数十分钟）')
+
+    def handle(self, *args, **options):
+        segments = options['segments']
+        duration = options['duration']
+        sample_rate = options['sample_rate']
+        slot = duration / segments
+
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING('📊 时间轴混音基准测试'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'  - 段落数: {segments}')
+        self.stdout.write(f'  - 时间轴: {duration:.0f}s @ {sample_rate}Hz')
+
+        # 准备片段（不计入耗时），每段占时间槽的 70%
+        clip_duration = slot * 0.7
+        placements = [
+            (make_clip(clip_duration, sample_rate, 220 + (i % 12) * 40), i * slot, slot)
+            for i in range(segments)
+        ]
+        self.stdout.write(f'  - 片段时长: {clip_duration:.2f}s')
+        self.stdout.write('')
+
+        # timeline
+        tracemalloc.start()
+        started = time.perf_counter()
+        mixer = TimelineMixer(duration=duration, sample_rate=sample_rate)
+        for clip, start, max_duration in placements:
+            mixer.add_audio_segment(clip, start=start, max_duration=max_duration)
+        pcm_bytes = sum(len(chunk) for chunk in mixer.iter_pcm16())
+        timeline_seconds = time.perf_counter() - started
+        _, timeline_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del mixer
+
+        # legacy
+        legacy_count = segments if options['full_legacy'] else min(segments, options['legacy_sample'])
+        tracemalloc.start()
+        started = time.perf_counter()
+        full_audio = AudioSegment.silent(duration=int(duration * 1000), frame_rate=sample_rate)
+        for clip, start, max_duration in placements[:legacy_count]:
+            max_ms = int(max_duration * 1000)
+            if len(clip) > max_ms:
+                clip = clip[:max_ms]
+            full_audio = full_audio.overlay(clip, position=int(start * 1000))
+        legacy_raw = len(full_audio.raw_data)
+        legacy_seconds = time.perf_counter() - started
+        _, legacy_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del full_audio
+
+        legacy_total = legacy_seconds * segments / legacy_count
+        label = '实测' if legacy_count == segments else f'按 {legacy_count} 段外推'
+
+        self.stdout.write(self.style.SUCCESS('结果'))
+        self.stdout.write('-' * 60)
+        self.stdout.write(f'  legacy   : {legacy_total:9.2f}s（{label}），峰值内存 {legacy_peak / 1024 / 1024:8.1f} MB')
+        self.stdout.write(f'  timeline : {timeline_seconds:9.2f}s（实测），    峰值内存 {timeline_peak / 1024 / 1024:8.1f} MB')
+        self.stdout.write(f'  加速比   : {legacy_total / max(timeline_seconds, 1e-6):.1f}x')
+        self.stdout.write(f'  输出PCM  : timeline {pcm_bytes / 1024 / 1024:.1f} MB / legacy {legacy_raw / 1024 / 1024:.1f} MB')
+        self.stdout.write('')
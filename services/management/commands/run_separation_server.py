@@ -0,0 +1,90 @@
+"""
+常驻 Demucs 模型服务
+
+加载模型后常驻内存，通过 Unix socket 接收人声分离任务（见 services/audio_separator/model_server.py）。
+DemucsSeparator 检测到服务在运行时自动提交到服务，否则回退为子进程方式分离。
+--workers 大于1时，分块任务由常驻的多进程池并行推理（每个进程各加载一份模型）。
+"""
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.audio_separator.model_server import DemucsEngine, SeparationServer, get_socket_path
+from services.utils.admission import get_container_cpu_limit
+
+
+class Command(BaseCommand):
+    help = '启动常驻 Demucs 模型服务（模型加载一次，通过本地 socket 接收分离任务）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            type=str,
+            help='Unix socket 路径（默认 settings.SEPARATION_SERVER_SOCKET）'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='torch 线程数（默认取容器 cgroup CPU 配额）'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='分块任务的并行工作进程数（默认 settings.SEPARATION_WORKERS，0 表示按 CPU 配额和内存自动确定）'
+        )
+        parser.add_argument(
+            '--device',
+            type=str,
+            default='cpu',
+            help='推理设备 cpu / cuda（默认 cpu）'
+        )
+        parser.add_argument(
+            '--preload',
+            type=str,
+            default='htdemucs_ft',
+            help='启动时预加载的模型，逗号分隔，空字符串表示不预加载（默认 htdemucs_ft）'
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or get_socket_path()
+        threads = options['threads'] or max(1, int(get_container_cpu_limit()))
+        workers = options['workers']
+        if workers is None:
+            workers = getattr(settings, 'SEPARATION_WORKERS', 1)
+        if not workers:
+            from services.audio_separator.parallel import plan_workers
+            from services.utils.memory_monitor import check_available_memory
+            workers, _ = plan_workers(threads, check_available_memory())
+
+        engine = DemucsEngine(device=options['device'], threads=threads, workers=workers)
+        for name in filter(None, (options['preload'] or '').split(',')):
+            self.stdout.write(f'预加载模型 {name}...')
+            # 并行模式下分块任务只使用工作进程中的模型，主进程不必再加载一份
+            _, elapsed = engine.get_pool(name.strip()) if engine.workers > 1 else engine.get_model(name.strip())
+            self.stdout.write(f'模型 {name} 加载完成，耗时 {elapsed:.1f}s')
+
+        server = SeparationServer(socket_path, engine)
+
+        def shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING('收到停止信号，正在退出...'))
+            # shutdown() 会等待 serve_forever 退出，不能在其所在线程中直接调用
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'模型服务已启动: {socket_path} (pid={os.getpid()}, threads={threads}, workers={workers}, '
+            f'device={options["device"]})'
+        ))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            engine.close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+        self.stdout.write('模型服务已退出')
@@ -15,14 +15,16 @@ logger = logging.getLogger(__name__)
 class FaceDetector:
     """人脸检测器（CPU优化版）"""
 
-    def __init__(self, device='cpu'):
+    def __init__(self, device='cpu', cancel_token=None):
         """
         初始化人脸检测器
 
         Args:
             device: 'cpu' or 'cuda'
+            cancel_token: 取消令牌（CancellationToken），逐片段/逐批次检查
         """
         self.device = torch.device(device)
+        self.cancel_token = cancel_token
         logger.info(f"初始化人脸检测器，使用设备: {self.device}")
 
         # 初始化MTCNN（人脸检测）
@@ -41,6 +43,11 @@ class FaceDetector:
         self.facenet = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
         logger.info("模型加载完成")
 
+    def _check_cancelled(self):
+        """检查取消信号，已取消时抛出 OperationCancelled"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
     def _auto_detect_batch_size(self) -> int:
         """
         自动检测最佳batch_size
@@ -110,6 +117,7 @@ class FaceDetector:
         segment_frames = []
 
         for i, segment in enumerate(segments):
+            self._check_cancelled()
             start_time = segment['start_time']
             end_time = segment['end_time']
             duration = end_time - start_time
@@ -185,6 +193,7 @@ class FaceDetector:
         }
 
         for seg_data in segment_frames:
+            self._check_cancelled()
             segment_index = seg_data['segment_index']
 
             for frame_data in seg_data['frames']:
@@ -291,6 +300,7 @@ class FaceDetector:
 
         # 分批处理
         for batch_start in range(0, len(faces), batch_size):
+            self._check_cancelled()
             batch_end = min(batch_start + batch_size, len(faces))
             batch_faces = faces[batch_start:batch_end]
 
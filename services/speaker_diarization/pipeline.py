@@ -4,7 +4,10 @@
 """
 import os
 import logging
+from contextlib import ExitStack
 from typing import Dict, Callable, Optional
+from services.utils.admission import admit, estimate_job_cost
+from services.utils.cancellation import CancellationToken, OperationCancelled
 from .srt_parser import parse_srt_from_segments
 from .face_detector import FaceDetector
 from .clusterer import FaceClusterer
@@ -23,7 +26,8 @@ class SpeakerDiarizationPipeline:
         segments,
         output_dir: str,
         dashscope_api_key: str,
-        progress_callback: Optional[Callable[[int, str], None]] = None
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        cancel_token: Optional[CancellationToken] = None
     ):
         """
         初始化Pipeline
@@ -34,12 +38,14 @@ class SpeakerDiarizationPipeline:
             output_dir: 输出目录
             dashscope_api_key: 阿里云DashScope API Key
             progress_callback: 进度回调函数 callback(progress, message)
+            cancel_token: 取消令牌，每个阶段和每个批次之间检查
         """
         self.video_path = video_path
         self.segments = segments
         self.output_dir = output_dir
         self.dashscope_api_key = dashscope_api_key
         self.progress_callback = progress_callback or (lambda p, m: None)
+        self.cancel_token = cancel_token
 
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
@@ -55,6 +61,12 @@ class SpeakerDiarizationPipeline:
         logger.info(f"[{progress}%] {message}")
         self.progress_callback(progress, message)
 
+    def start_stage(self, progress: int, message: str):
+        """进入新阶段：先检查取消信号，再更新进度"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        self.update_progress(progress, message)
+
     def process(self) -> Dict:
         """
         执行完整的说话人识别流程
@@ -76,10 +88,12 @@ class SpeakerDiarizationPipeline:
             'vlm_trace_id': None,
             'llm_trace_id': None
         }
+        # 人脸检测和特征提取阶段占用的计算资源（准入控制），特征提取完成后释放
+        compute = ExitStack()
 
         try:
             # Step 1: 解析SRT (10%)
-            self.update_progress(10, "解析字幕文件...")
+            self.start_stage(10, "解析字幕文件...")
             srt_segments = parse_srt_from_segments(self.segments)
             logger.info(f"解析到 {len(srt_segments)} 个字幕片段")
             result['total_segments'] = len(srt_segments)
@@ -87,12 +101,21 @@ class SpeakerDiarizationPipeline:
             if len(srt_segments) == 0:
                 raise ValueError("没有可用的字幕片段")
 
+            # 申请计算资源：模型 + 关键帧（每个片段3帧）常驻内存，容量不足时排队
+            cost = estimate_job_cost('face_detection', num_frames=len(srt_segments) * 3)
+            compute.enter_context(admit(
+                'face_detection', cost,
+                label=f"人脸检测({os.path.basename(self.video_path)})",
+                cancel_token=self.cancel_token,
+                on_wait=lambda position: self.update_progress(10, f"排队等待计算资源（第{position}位）...")
+            ))
+
             # Step 2: 初始化人脸检测器 (15%)
-            self.update_progress(15, "初始化人脸检测模型...")
-            self.face_detector = FaceDetector(device='cpu')
+            self.start_stage(15, "初始化人脸检测模型...")
+            self.face_detector = FaceDetector(device='cpu', cancel_token=self.cancel_token)
 
             # Step 3: 抽取关键帧 (20%)
-            self.update_progress(20, "抽取视频关键帧...")
+            self.start_stage(20, "抽取视频关键帧...")
             segment_frames = self.face_detector.extract_frames_for_face_detection(
                 self.video_path,
                 srt_segments,
@@ -101,7 +124,7 @@ class SpeakerDiarizationPipeline:
             logger.info(f"抽取了 {len(segment_frames)} 个片段的帧")
 
             # Step 4: 人脸检测+质量过滤 (35%)
-            self.update_progress(35, "检测人脸并过滤...")
+            self.start_stage(35, "检测人脸并过滤...")
             faces, filter_stats = self.face_detector.detect_faces_with_quality_filter(
                 segment_frames,
                 confidence_threshold=0.95,
@@ -118,12 +141,15 @@ class SpeakerDiarizationPipeline:
                 raise ValueError("未检测到高质量人脸，请检查视频质量或调整过滤参数")
 
             # Step 5: 提取特征向量 (50%)
-            self.update_progress(50, f"提取 {len(faces)} 张人脸的特征向量...")
+            self.start_stage(50, f"提取 {len(faces)} 张人脸的特征向量...")
             embeddings, valid_faces = self.face_detector.extract_face_embeddings(faces)
             logger.info(f"特征提取完成，形状: {embeddings.shape}")
+            # 释放关键帧和检测模型占用的资源
+            del segment_frames, faces
+            compute.close()
 
             # Step 6: DBSCAN聚类 (60%)
-            self.update_progress(60, "DBSCAN聚类识别说话人...")
+            self.start_stage(60, "DBSCAN聚类识别说话人...")
             self.clusterer = FaceClusterer(eps=0.28, min_samples=5)
             clusters, clustering_info = self.clusterer.cluster_faces(embeddings, valid_faces)
 
@@ -140,11 +166,11 @@ class SpeakerDiarizationPipeline:
                 raise ValueError("聚类未识别出说话人，请调整聚类参数")
 
             # Step 7: 统计说话人信息 (65%)
-            self.update_progress(65, "统计说话人信息...")
+            self.start_stage(65, "统计说话人信息...")
             speaker_statistics = self.clusterer.get_speaker_statistics(clusters)
 
             # Step 8: VLM智能命名 (75%)
-            self.update_progress(75, "VLM智能命名说话人...")
+            self.start_stage(75, "VLM智能命名说话人...")
             self.vlm_naming = VLMSpeakerNaming(self.dashscope_api_key)
 
             faces_dir = os.path.join(self.output_dir, 'faces')
@@ -160,7 +186,7 @@ class SpeakerDiarizationPipeline:
             result['vlm_trace_id'] = vlm_trace_ids[0] if vlm_trace_ids else None
 
             # Step 9: LLM说话人分配 (85%)
-            self.update_progress(85, "LLM分配说话人到字幕...")
+            self.start_stage(85, "LLM分配说话人到字幕...")
             self.llm_assignment = LLMSpeakerAssignment(self.dashscope_api_key)
 
             assignment_result = self.llm_assignment.assign_speakers(
@@ -177,7 +203,7 @@ class SpeakerDiarizationPipeline:
                 logger.warning("LLM分配失败，将仅使用VLM命名结果")
 
             # Step 10: 整合结果 (95%)
-            self.update_progress(95, "整合识别结果...")
+            self.start_stage(95, "整合识别结果...")
 
             # 转换为最终格式
             speakers_result = {}
@@ -206,7 +232,7 @@ class SpeakerDiarizationPipeline:
             result['success'] = True
 
             # Step 11: 完成 (100%)
-            self.update_progress(100, f"识别完成！检测到 {num_speakers} 个说话人")
+            self.start_stage(100, f"识别完成！检测到 {num_speakers} 个说话人")
 
             logger.info("=" * 60)
             logger.info("说话人识别Pipeline完成")
@@ -214,19 +240,29 @@ class SpeakerDiarizationPipeline:
 
             return result
 
+        except OperationCancelled:
+            logger.info("说话人识别Pipeline已取消")
+            result['error'] = '任务已取消'
+            result['cancelled'] = True
+            return result
+
         except Exception as e:
             logger.error(f"Pipeline执行失败: {e}", exc_info=True)
             result['error'] = str(e)
             self.update_progress(0, f"识别失败: {str(e)}")
             return result
 
+        finally:
+            compute.close()
+
 
 def process_speaker_diarization(
     video_path: str,
     segments,
     output_dir: str,
     dashscope_api_key: str,
-    progress_callback: Optional[Callable[[int, str], None]] = None
+    progress_callback: Optional[Callable[[int, str], None]] = None,
+    cancel_token: Optional[CancellationToken] = None
 ) -> Dict:
     """
     便捷函数：执行说话人识别
@@ -237,6 +273,7 @@ def process_speaker_diarization(
         output_dir: 输出目录
         dashscope_api_key: 阿里云DashScope API Key
         progress_callback: 进度回调函数
+        cancel_token: 取消令牌
 
     Returns:
         识别结果字典
@@ -246,7 +283,8 @@ def process_speaker_diarization(
         segments=segments,
         output_dir=output_dir,
         dashscope_api_key=dashscope_api_key,
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        cancel_token=cancel_token
     )
 
     return pipeline.process()
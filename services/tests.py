@@ -1,3 +1,701 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from services.asr.chunking import plan_chunks, stitch_sentences
+from services.asr.flash_recognizer import AliyunTokenManager
+from services.audio_separator.cache import SeparationCache
+from services.audio_separator.chunked import (
+    OverlapAddWriter,
+    _span_ramp,
+    finish_stems,
+    iter_windows,
+    iter_work,
+    speech_span_frames,
+    window_frames,
+)
+from services.audio_separator.profiles import choose_profile, get_profile
+from services.utils.admission import AdmissionController, AdmissionTimeout
+from services.utils.cancellation import (
+    CancellationRegistry,
+    CancellationToken,
+    OperationCancelled,
+    terminate_process_group,
+)
+from services.utils.progress_broker import ProgressBroker, format_sse
+
+
+class ProgressBrokerTests(SimpleTestCase):
+    """进度发布/订阅：snapshot + delta 协议"""
+
+    def setUp(self):
+        # 不限制推送频率，心跳间隔缩短，订阅循环不会阻塞测试
+        self.broker = ProgressBroker(max_updates_per_second=0, heartbeat_interval=0.05)
+
+    def _subscribe(self, task_id, **kwargs):
+        stream = self.broker.subscribe(task_id, **kwargs)
+        self.addCleanup(stream.close)
+        return stream
+
+    def test_publish_claims_snapshot(self):
+        self.broker.publish('task-1', status='running', completed=3)
+        self.assertEqual(self.broker.get_snapshot('task-1'), {'status': 'running', 'completed': 3})
+
+    def test_notify_without_channel_is_noop(self):
+        self.broker.notify('task-1', status='running')
+        self.assertIsNone(self.broker.get_snapshot('task-1'))
+        self.assertNotIn('task-1', self.broker._channels)
+
+    def test_notify_does_not_claim_task(self):
+        stream = self._subscribe('task-1')
+        next(stream)
+        self.broker.notify('task-1', status='running')
+        self.assertEqual(next(stream), ('delta', {'status': 'running', 'seq': 1}))
+        # 订阅者能收到，但本进程没有发布者，快照接口仍应回退到数据库
+        self.assertIsNone(self.broker.get_snapshot('task-1'))
+
+    def test_snapshot_delta_end(self):
+        self.broker.publish('task-1', status='running', completed=0, total=10)
+        stream = self._subscribe('task-1')
+
+        event, data = next(stream)
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(data, {'status': 'running', 'completed': 0, 'total': 10, 'seq': 1})
+
+        self.broker.publish('task-1', status='running', completed=4, total=10)
+        self.assertEqual(next(stream), ('delta', {'completed': 4, 'seq': 2}))
+
+        self.broker.publish('task-1', status='completed', completed=10, total=10)
+        self.assertEqual(next(stream), ('delta', {'status': 'completed', 'completed': 10, 'seq': 3}))
+        self.assertEqual(next(stream), ('end', {'status': 'completed', 'seq': 3}))
+        with self.assertRaises(StopIteration):
+            next(stream)
+
+    def test_updates_between_reads_are_merged(self):
+        self.broker.publish('task-1', completed=0)
+        stream = self._subscribe('task-1')
+        next(stream)
+
+        self.broker.publish('task-1', completed=1)
+        self.broker.publish('task-1', completed=2, current_step='翻译')
+        self.assertEqual(next(stream), ('delta', {'completed': 2, 'current_step': '翻译', 'seq': 3}))
+
+    def test_unchanged_publish_does_not_wake_subscribers(self):
+        self.broker.publish('task-1', completed=1)
+        self.broker.publish('task-1', completed=1)
+        self.assertEqual(self.broker._channels['task-1'].seq, 1)
+
+    def test_heartbeat_when_idle(self):
+        self.broker.publish('task-1', status='running')
+        stream = self._subscribe('task-1')
+        next(stream)
+        self.assertEqual(next(stream), ('heartbeat', {}))
+
+    def test_loader_snapshot_for_remote_task(self):
+        stream = self._subscribe('task-1', loader=lambda: {'status': 'completed', 'completed': 5})
+        self.assertEqual(next(stream), ('snapshot', {'status': 'completed', 'completed': 5, 'seq': 1}))
+        self.assertEqual(next(stream), ('end', {'status': 'completed', 'seq': 1}))
+
+    def test_loader_missing_task(self):
+        stream = self._subscribe('task-1', loader=lambda: None)
+        event, data = next(stream)
+        self.assertEqual(event, 'end')
+        self.assertEqual(data['status'], 'not_found')
+
+    def test_subscriber_count_released(self):
+        self.broker.publish('task-1', status='running')
+        stream = self.broker.subscribe('task-1')
+        next(stream)
+        self.assertEqual(self.broker._channels['task-1'].subscribers, 1)
+        stream.close()
+        self.assertEqual(self.broker._channels['task-1'].subscribers, 0)
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse('heartbeat', {}), ': keepalive\n\n')
+        self.assertEqual(
+            format_sse('delta', {'current_step': '合成'}, 7),
+            'id: 7\nevent: delta\ndata: {"current_step": "合成"}\n\n'
+        )
+
+
+class CancellationTokenTests(SimpleTestCase):
+    """协作式取消令牌"""
+
+    def test_raise_if_cancelled(self):
+        token = CancellationToken('task-1')
+        token.raise_if_cancelled()
+        token.cancel('停止')
+        self.assertTrue(token.is_cancelled)
+        with self.assertRaisesMessage(OperationCancelled, '停止'):
+            token.raise_if_cancelled()
+
+    def test_callbacks_run_once_on_cancel(self):
+        token = CancellationToken()
+        calls = []
+        token.register(lambda: calls.append('a'))
+        token.cancel()
+        token.cancel()
+        self.assertEqual(calls, ['a'])
+
+    def test_unregistered_callback_is_not_called(self):
+        token = CancellationToken()
+        calls = []
+        unregister = token.register(lambda: calls.append('a'))
+        unregister()
+        token.cancel()
+        self.assertEqual(calls, [])
+
+    def test_register_after_cancel_runs_immediately(self):
+        token = CancellationToken()
+        token.cancel()
+        calls = []
+        unregister = token.register(lambda: calls.append('a'))
+        self.assertEqual(calls, ['a'])
+        unregister()
+
+    def test_failing_callback_does_not_block_others(self):
+        token = CancellationToken()
+        calls = []
+        token.register(lambda: 1 / 0)
+        token.register(lambda: calls.append('b'))
+        token.cancel()
+        self.assertEqual(calls, ['b'])
+
+    def test_sleep_interrupted_by_cancel(self):
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        started = time.monotonic()
+        with self.assertRaises(OperationCancelled):
+            token.sleep(10)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_terminate_process_group(self):
+        token = CancellationToken()
+        process = subprocess.Popen(['sleep', '30'], start_new_session=True)
+        token.register(lambda: terminate_process_group(process))
+        token.cancel()
+        self.assertIsNotNone(process.wait(timeout=5))
+
+
+class CancellationRegistryTests(SimpleTestCase):
+    """进程内令牌登记表"""
+
+    def test_cancel_by_id(self):
+        registry = CancellationRegistry()
+        token = registry.create('task-1')
+        self.assertIs(registry.get('task-1'), token)
+        self.assertTrue(registry.cancel('task-1', '用户取消'))
+        self.assertTrue(token.is_cancelled)
+        self.assertEqual(token.reason, '用户取消')
+
+    def test_cancel_unknown_task(self):
+        registry = CancellationRegistry()
+        self.assertFalse(registry.cancel('missing'))
+
+    def test_remove(self):
+        registry = CancellationRegistry()
+        token = registry.create('task-1')
+        registry.remove('task-1')
+        self.assertIsNone(registry.get('task-1'))
+        self.assertFalse(registry.cancel('task-1'))
+        self.assertFalse(token.is_cancelled)
+
+    def test_watcher_applies_remote_cancel(self):
+        registry = CancellationRegistry(poll_interval=0.01)
+        cancelled_elsewhere = threading.Event()
+        token = registry.create('task-1', source=cancelled_elsewhere.is_set)
+        self.addCleanup(registry.remove, 'task-1')
+
+        cancelled_elsewhere.set()
+        self.assertTrue(token.wait(timeout=5))
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    """资源准入：容量判断与先到先得"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.controller = AdmissionController(
+            ledger_path=os.path.join(self.tmp_dir, 'ledger.json'),
+            cpu_capacity=4,
+            memory_capacity_gb=8,
+            poll_interval=0.01
+        )
+
+    @staticmethod
+    def _cost(cpu, memory_gb=1.0):
+        return {'cpu': cpu, 'memory_gb': memory_gb, 'expected_seconds': 60}
+
+    def _acquire(self, ticket, cost, enqueued_at):
+        return self.controller.try_acquire(ticket, 'test', cost, ticket, enqueued_at)
+
+    def test_jobs_admitted_while_they_fit(self):
+        self.assertIsNone(self._acquire('a', self._cost(2), 1.0))
+        self.assertIsNone(self._acquire('b', self._cost(2), 2.0))
+        self.assertEqual(self._acquire('c', self._cost(1), 3.0), 1)
+
+        status = self.controller.status()
+        self.assertEqual(status['cpu_used'], 4)
+        self.assertEqual([e['label'] for e in status['waiting']], ['c'])
+
+    def test_memory_capacity(self):
+        self.assertIsNone(self._acquire('a', self._cost(1, memory_gb=6), 1.0))
+        self.assertEqual(self._acquire('b', self._cost(1, memory_gb=3), 2.0), 1)
+
+    def test_oversized_job_runs_alone_when_idle(self):
+        self.assertIsNone(self._acquire('big', self._cost(16, memory_gb=32), 1.0))
+        self.assertEqual(self._acquire('small', self._cost(1), 2.0), 1)
+
+    def test_fifo_order(self):
+        self.assertIsNone(self._acquire('a', self._cost(3), 1.0))
+        self.assertEqual(self._acquire('b', self._cost(2), 2.0), 1)
+        # c 本身放得下，但 b 先排队
+        self.assertEqual(self._acquire('c', self._cost(1), 3.0), 2)
+
+        self.controller.release('a')
+        self.assertEqual(self._acquire('c', self._cost(1), 3.0), 2)
+        self.assertIsNone(self._acquire('b', self._cost(2), 2.0))
+        self.assertIsNone(self._acquire('c', self._cost(1), 3.0))
+
+    def test_admit_releases_on_exit(self):
+        with self.controller.admit('test', self._cost(2), label='job'):
+            self.assertEqual(self.controller.status()['cpu_used'], 2)
+        self.assertEqual(self.controller.status()['running'], [])
+
+    def test_admit_timeout_leaves_no_waiting_entry(self):
+        self.assertIsNone(self._acquire('a', self._cost(4), 1.0))
+        positions = []
+        with self.assertRaises(AdmissionTimeout):
+            with self.controller.admit('test', self._cost(1), timeout=0.05, on_wait=positions.append):
+                pass
+        self.assertEqual(positions, [1])
+        self.assertEqual(self.controller.status()['waiting'], [])
+
+    def test_admit_cancelled_while_queued(self):
+        self.assertIsNone(self._acquire('a', self._cost(4), 1.0))
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        with self.assertRaises(OperationCancelled):
+            with self.controller.admit('test', self._cost(1), cancel_token=token):
+                pass
+        self.assertEqual(self.controller.status()['waiting'], [])
+
+
+class _ArrayReader:
+    """内存中的 PCM 读取器（接口与 FFmpegPCMReader 一致）"""
+
+    def __init__(self, samples: np.ndarray):
+        self.samples = samples
+        self.channels = samples.shape[1]
+        self.position = 0
+        self.finished = False
+
+    def read(self, frames: int) -> np.ndarray:
+        block = self.samples[self.position:self.position + frames]
+        self.position += block.shape[0]
+        if block.shape[0] < frames:
+            self.finished = True
+        return block
+
+
+class _CollectingWriter:
+    """替代 _WavWriter，收集写出的采样"""
+
+    def __init__(self):
+        self.blocks = []
+
+    def write(self, samples: np.ndarray):
+        self.blocks.append(np.array(samples))
+
+    @property
+    def samples(self) -> np.ndarray:
+        return np.concatenate(self.blocks)
+
+
+class ChunkedSeparationTests(SimpleTestCase):
+    """分块读取与重叠相加拼接"""
+
+    window = 1000
+    overlap = 100
+
+    def _input(self, frames: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        return rng.uniform(-0.5, 0.5, size=(frames, 2)).astype(np.float32)
+
+    def _writer(self) -> OverlapAddWriter:
+        output = OverlapAddWriter([], 44100, 2, self.overlap)
+        output.writers = [_CollectingWriter(), _CollectingWriter()]
+        return output
+
+    def test_windows_overlap_and_cover_input(self):
+        samples = self._input(3450)
+        windows = list(iter_windows(_ArrayReader(samples), self.window, self.overlap))
+
+        self.assertEqual([is_last for _, is_last in windows], [False, False, False, True])
+        start = 0
+        for buffer, _ in windows:
+            np.testing.assert_array_equal(buffer, samples[start:start + buffer.shape[0]])
+            start += buffer.shape[0] - self.overlap
+        self.assertEqual(start + self.overlap, samples.shape[0])
+
+    def test_short_input_is_single_window(self):
+        samples = self._input(400)
+        windows = list(iter_windows(_ArrayReader(samples), self.window, self.overlap))
+        self.assertEqual(len(windows), 1)
+        self.assertTrue(windows[0][1])
+
+    def test_output_length_matches_input(self):
+        for frames in (400, 1000, 1900, 3450):
+            samples = self._input(frames)
+            output = self._writer()
+            written = 0
+            for buffer, is_last in iter_windows(_ArrayReader(samples), self.window, self.overlap):
+                written += output.add([buffer.copy(), np.zeros_like(buffer)], is_last)
+
+            self.assertEqual(written, frames)
+            vocals, background = (writer.samples for writer in output.writers)
+            self.assertEqual(vocals.shape, samples.shape)
+            self.assertEqual(background.shape, samples.shape)
+            # 模型输出与输入一致时，交叉淡化后仍然原样还原
+            np.testing.assert_allclose(vocals, samples, atol=1e-6)
+
+    def test_crossfade_is_continuous(self):
+        samples = self._input(3450)
+        output = self._writer()
+        windows = iter_windows(_ArrayReader(samples), self.window, self.overlap)
+        for index, (buffer, is_last) in enumerate(windows):
+            # 每个窗口输出不同的常数，拼接处只能靠交叉淡化过渡
+            stem = np.full_like(buffer, float(index))
+            output.add([stem, stem.copy()], is_last)
+
+        vocals = output.writers[0].samples[:, 0]
+        self.assertEqual(vocals.shape[0], samples.shape[0])
+        steps = np.abs(np.diff(vocals))
+        self.assertLessEqual(steps.max(), 1.0 / self.overlap + 1e-6)
+        self.assertEqual(vocals[0], 0.0)
+        self.assertEqual(vocals[-1], 3.0)
+
+    def test_window_frames_validates_overlap(self):
+        self.assertEqual(window_frames(100, 10, 1), (1000, 100))
+        with self.assertRaises(ValueError):
+            window_frames(100, 10, 10)
+        with self.assertRaises(ValueError):
+            window_frames(100, 10, 0)
+
+
+class SeparationCacheTests(SimpleTestCase):
+    """分离结果缓存：内容寻址与按预算淘汰"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+
+    def _file(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def _put(self, cache: SeparationCache, key: str, size: int):
+        vocals = self._file(f'{key}_vocals.wav', b'v' * size)
+        background = self._file(f'{key}_background.wav', b'b' * size)
+        return cache.put(key, vocals, background)
+
+    def _age(self, cache: SeparationCache, key: str, seconds: float):
+        stamp = time.time() - seconds
+        os.utime(cache._entry_dir(key), (stamp, stamp))
+
+    def test_key_depends_on_content_and_params(self):
+        cache = SeparationCache(self.cache_dir, 1 << 20)
+        first = self._file('a.wav', b'audio')
+        copy = self._file('b.wav', b'audio')
+        other = self._file('c.wav', b'other')
+
+        key = cache.make_key(first, 'htdemucs', shifts=1, segment=None)
+        self.assertEqual(key, cache.make_key(copy, 'htdemucs', shifts=1))
+        self.assertNotEqual(key, cache.make_key(other, 'htdemucs', shifts=1))
+        self.assertNotEqual(key, cache.make_key(first, 'htdemucs_ft', shifts=1))
+        self.assertNotEqual(key, cache.make_key(first, 'htdemucs', shifts=0))
+
+    def test_put_and_get(self):
+        cache = SeparationCache(self.cache_dir, 1 << 20)
+        self.assertIsNone(cache.get('aa11'))
+
+        paths = self._put(cache, 'aa11', 10)
+        self.assertEqual(paths, cache.get('aa11'))
+        with open(paths['vocals'], 'rb') as f:
+            self.assertEqual(f.read(), b'v' * 10)
+        self.assertEqual(os.path.getsize(paths['background']), 10)
+
+    def test_evict_oldest_over_budget(self):
+        # 每个条目 200 字节，预算放得下两个
+        cache = SeparationCache(self.cache_dir, 450)
+        self._put(cache, 'aa01', 100)
+        self._age(cache, 'aa01', 300)
+        self._put(cache, 'bb02', 100)
+        self._age(cache, 'bb02', 200)
+
+        self._put(cache, 'cc03', 100)
+        self.assertIsNone(cache.get('aa01'))
+        self.assertIsNotNone(cache.get('bb02'))
+        self.assertIsNotNone(cache.get('cc03'))
+
+    def test_get_refreshes_recency(self):
+        cache = SeparationCache(self.cache_dir, 450)
+        self._put(cache, 'aa01', 100)
+        self._age(cache, 'aa01', 300)
+        self._put(cache, 'bb02', 100)
+        self._age(cache, 'bb02', 200)
+
+        # 命中后 aa01 变为最近使用，淘汰 bb02
+        cache.get('aa01')
+        self._put(cache, 'cc03', 100)
+        self.assertIsNotNone(cache.get('aa01'))
+        self.assertIsNone(cache.get('bb02'))
+
+    def test_evict_within_budget_keeps_entries(self):
+        cache = SeparationCache(self.cache_dir, 1 << 20)
+        self._put(cache, 'aa01', 100)
+        self._put(cache, 'bb02', 100)
+        self.assertEqual(cache.evict(), 0)
+
+
+class SeparationProfileTests(SimpleTestCase):
+    """分离档位自动选择"""
+
+    def test_best_within_default_budget(self):
+        self.assertEqual(choose_profile(600)[0], 'best')
+        # 默认预算 = 时长 × 1.5：1小时音频 best 预计 4320s ≤ 5400s
+        self.assertEqual(choose_profile(3600)[0], 'best')
+
+    def test_short_audio_uses_minimum_budget(self):
+        # 预算至少 600s：60s 音频即使前面排了 5 个任务也能用 best
+        self.assertEqual(choose_profile(60, queue_depth=5)[0], 'best')
+
+    def test_queue_depth_downgrades(self):
+        self.assertEqual(choose_profile(3600, queue_depth=1)[0], 'balanced')
+        self.assertEqual(choose_profile(3600, queue_depth=5)[0], 'fast')
+
+    def test_deadline(self):
+        self.assertEqual(choose_profile(600, deadline_seconds=1000)[0], 'best')
+        self.assertEqual(choose_profile(600, deadline_seconds=200)[0], 'balanced')
+        self.assertEqual(choose_profile(600, deadline_seconds=100)[0], 'fast')
+
+    def test_nothing_fits_falls_back_to_fast(self):
+        name, reason = choose_profile(600, deadline_seconds=10)
+        self.assertEqual(name, 'fast')
+        self.assertIn('所有档位均超出', reason)
+
+    def test_measured_rtf_overrides_default(self):
+        self.assertEqual(choose_profile(3600, queue_depth=1, measured_rtf={'best': 0.5})[0], 'best')
+        self.assertEqual(choose_profile(600, measured_rtf={'best': 5.0})[0], 'balanced')
+
+    def test_get_profile(self):
+        self.assertEqual(get_profile('best')['model'], 'htdemucs_ft')
+        with self.assertRaises(ValueError):
+            get_profile('auto')
+
+
+class SpeechSpanTests(SimpleTestCase):
+    """语音区间模式：区间合并、边缘淡化与直通"""
+
+    sample_rate = 100
+
+    def test_spans_padded_sorted_and_merged(self):
+        spans = speech_span_frames([(5, 6), (1, 2)], 10000, self.sample_rate, padding=1, min_gap=3)
+        # [0, 300) 与 [400, 700) 间隔 1s < 3s，合并
+        self.assertEqual(spans, [(0, 700)])
+
+    def test_distant_spans_kept_apart(self):
+        spans = speech_span_frames([(1, 2), (20, 21)], 10000, self.sample_rate, padding=1, min_gap=3)
+        self.assertEqual(spans, [(0, 300), (1900, 2200)])
+
+    def test_spans_clamped_and_empty_dropped(self):
+        spans = speech_span_frames([(3, 3), (8, 7), (95, 120)], 10000, self.sample_rate, padding=1, min_gap=3)
+        self.assertEqual(spans, [(9400, 10000)])
+        self.assertEqual(speech_span_frames([(200, 210)], 10000, self.sample_rate, padding=1), [])
+
+    def test_ramp_none_inside_span(self):
+        self.assertIsNone(_span_ramp(100, 200, 0, 1000, 50))
+
+    def test_ramp_at_span_edges(self):
+        ramp = _span_ramp(0, 100, 0, 1000, 50)
+        self.assertEqual(ramp.shape, (100, 1))
+        self.assertEqual(ramp[0, 0], 0.0)
+        self.assertAlmostEqual(float(ramp[25, 0]), 0.5)
+        self.assertTrue(np.all(ramp[50:] == 1.0))
+        self.assertTrue(np.all(np.diff(ramp[:, 0]) >= 0))
+
+        ramp = _span_ramp(900, 100, 0, 1000, 50)
+        self.assertTrue(np.all(ramp[:50] == 1.0))
+        self.assertAlmostEqual(float(ramp[-1, 0]), 1 / 50)
+        self.assertTrue(np.all(np.diff(ramp[:, 0]) <= 0))
+
+    def test_iter_work_covers_input(self):
+        total = 5000
+        samples = np.arange(total * 2, dtype=np.float32).reshape(total, 2)
+        spans = [(1000, 2500), (4000, 4500)]
+        window, overlap = 1000, 100
+
+        output = []
+        inferred = []
+        for buffer, is_last, ramp, infer in iter_work(_ArrayReader(samples), window, overlap, spans, crossfade=50):
+            vocals, background = finish_stems(None if not infer else [buffer, np.zeros_like(buffer)], buffer, ramp)
+            if not infer:
+                np.testing.assert_array_equal(vocals, 0)
+                np.testing.assert_array_equal(background, buffer)
+            else:
+                inferred.append(buffer.shape[0])
+            # 按 OverlapAddWriter 的规则：非最后一个窗口的末尾 overlap 帧与下一窗口重叠
+            output.append(buffer if is_last else buffer[:-overlap])
+
+        # 第一个区间两个窗口（一处重叠），第二个区间一个窗口；区间之外都是直通块
+        self.assertEqual(inferred, [1000, 600, 500])
+        np.testing.assert_array_equal(np.concatenate(output), samples)
+
+
+class ASRChunkingTests(SimpleTestCase):
+    """长音频分块识别：静音切分与时间戳拼接"""
+
+    def test_short_audio_single_chunk(self):
+        self.assertEqual(plan_chunks(200, [], max_seconds=240), [(0.0, 200)])
+
+    def test_cut_at_last_silence_before_limit(self):
+        silences = [(100, 101), (230, 232), (400, 402)]
+        self.assertEqual(
+            plan_chunks(600, silences, max_seconds=240, min_seconds=30),
+            [(0.0, 231.0), (231.0, 401.0), (401.0, 600)]
+        )
+
+    def test_hard_cut_without_silence(self):
+        # 起点附近（不足 min_seconds）的静音不作为切点
+        self.assertEqual(
+            plan_chunks(500, [(10, 11)], max_seconds=240, min_seconds=30),
+            [(0.0, 240.0), (240.0, 480.0), (480.0, 500)]
+        )
+
+    def test_chunks_are_contiguous(self):
+        chunks = plan_chunks(3600, [(i * 37.0, i * 37.0 + 0.5) for i in range(1, 97)], max_seconds=240)
+        self.assertEqual(chunks[0][0], 0.0)
+        self.assertEqual(chunks[-1][1], 3600)
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+        self.assertTrue(all(end - start <= 240 for start, end in chunks))
+
+    def test_offsets_applied(self):
+        stitched = stitch_sentences([
+            (0.0, [{'begin_time': 500, 'end_time': 1500, 'text': '你好。'}]),
+            (120.0, [{'begin_time': 2000, 'end_time': 3000, 'text': '再见。'}]),
+        ])
+        self.assertEqual(
+            [(s['begin_time'], s['end_time'], s['text']) for s in stitched],
+            [(500, 1500, '你好。'), (122000, 123000, '再见。')]
+        )
+
+    def test_sentence_cut_at_boundary_is_joined(self):
+        first = [
+            {'begin_time': 0, 'end_time': 1000, 'text': '你好。'},
+            {'begin_time': 229000, 'end_time': 230900, 'text': '今天天气，'},
+        ]
+        second = [
+            {'begin_time': 100, 'end_time': 1500, 'text': '很好。'},
+            {'begin_time': 3000, 'end_time': 4000, 'text': '再见。'},
+        ]
+        stitched = stitch_sentences([(0.0, first), (231.0, second)])
+
+        self.assertEqual(
+            [(s['begin_time'], s['end_time'], s['text']) for s in stitched],
+            [(0, 1000, '你好。'), (229000, 232500, '今天天气很好。'), (234000, 235000, '再见。')]
+        )
+        # 输入不被修改
+        self.assertEqual(first[1]['text'], '今天天气，')
+        self.assertEqual(second[0]['begin_time'], 100)
+
+    def test_ascii_words_joined_with_space(self):
+        stitched = stitch_sentences([
+            (0.0, [{'begin_time': 0, 'end_time': 59900, 'text': 'Hello,'}]),
+            (60.0, [{'begin_time': 50, 'end_time': 900, 'text': 'world.'}]),
+        ])
+        self.assertEqual([s['text'] for s in stitched], ['Hello world.'])
+
+    def test_sentences_away_from_cut_not_joined(self):
+        stitched = stitch_sentences([
+            (0.0, [{'begin_time': 0, 'end_time': 58000, 'text': '第一句。'}]),
+            (60.0, [{'begin_time': 50, 'end_time': 900, 'text': '第二句。'}]),
+        ])
+        self.assertEqual(len(stitched), 2)
+
+
+class AliyunTokenManagerTests(SimpleTestCase):
+    """AccessToken 缓存与提前刷新"""
+
+    def setUp(self):
+        for name in ('_cache', '_refresh_locks'):
+            patcher = mock.patch.dict(getattr(AliyunTokenManager, name), clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(AliyunTokenManager, '_create_token')
+        self.create_token = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_hit(self):
+        self.create_token.return_value = ('token-1', time.time() + 3600)
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-1')
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-1')
+        self.create_token.assert_called_once_with('id', 'secret', 'cn-shanghai')
+
+    def test_refresh_before_expiry(self):
+        # 剩余有效期小于 TOKEN_REFRESH_MARGIN 时提前刷新
+        self.create_token.side_effect = [
+            ('token-1', time.time() + AliyunTokenManager.TOKEN_REFRESH_MARGIN - 1),
+            ('token-2', time.time() + 3600),
+        ]
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-1')
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-2')
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-2')
+        self.assertEqual(self.create_token.call_count, 2)
+
+    def test_invalidate(self):
+        self.create_token.side_effect = [('token-1', time.time() + 3600), ('token-2', time.time() + 3600)]
+        AliyunTokenManager.get_access_token('id', 'secret')
+        AliyunTokenManager.invalidate('id')
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-2')
+
+    def test_failure_not_cached(self):
+        self.create_token.side_effect = [None, ('token-1', time.time() + 3600)]
+        self.assertIsNone(AliyunTokenManager.get_access_token('id', 'secret'))
+        self.assertEqual(AliyunTokenManager.get_access_token('id', 'secret'), 'token-1')
+
+    def test_cached_per_key_and_region(self):
+        self.create_token.side_effect = lambda key_id, secret, region: (f'{key_id}-{region}', time.time() + 3600)
+        self.assertEqual(AliyunTokenManager.get_access_token('a', 's'), 'a-cn-shanghai')
+        self.assertEqual(AliyunTokenManager.get_access_token('b', 's'), 'b-cn-shanghai')
+        self.assertEqual(AliyunTokenManager.get_access_token('a', 's', region='cn-beijing'), 'a-cn-beijing')
+        self.assertEqual(self.create_token.call_count, 3)
+
+    def test_concurrent_requests_refresh_once(self):
+        def slow_create(key_id, secret, region):
+            time.sleep(0.05)
+            return 'token-1', time.time() + 3600
+
+        self.create_token.side_effect = slow_create
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(AliyunTokenManager.get_access_token('id', 'secret')))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['token-1'] * 5)
+        self.create_token.assert_called_once()
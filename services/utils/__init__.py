@@ -9,6 +9,12 @@ from .memory_monitor import (
     get_safe_batch_size,
     MemoryMonitor
 )
+from .admission import (
+    AdmissionController,
+    AdmissionTimeout,
+    admit,
+    estimate_job_cost
+)
 
 __all__ = [
     'require_memory',
@@ -17,4 +23,8 @@ __all__ = [
     'get_safe_demucs_jobs',
     'get_safe_batch_size',
     'MemoryMonitor',
+    'AdmissionController',
+    'AdmissionTimeout',
+    'admit',
+    'estimate_job_cost',
 ]
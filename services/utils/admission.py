@@ -0,0 +1,395 @@
+"""
+重任务资源准入控制
+
+人声分离（Demucs）、人脸检测、ffmpeg合成可能被不同用户同时触发，在8GB容器内并发运行容易被OOM Kill。
+准入控制器在任务开始前按预估CPU/内存成本申请资源，容量不足时排队等待：
+- 容量取自容器cgroup限制（CPU配额、内存上限），无cgroup时使用宿主机资源
+- 每类任务声明成本模型（基于音频时长、帧数等），见 estimate_job_cost
+- 资源账本是一个加文件锁（fcntl）的JSON文件，gunicorn多个worker进程共享；
+  进程退出或预约超时的记录会被自动清理，避免死锁
+- 先到先得（FIFO），单个任务成本超过总容量时在空闲时独占运行，不会永远排队
+"""
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+# 默认账本位置（容器内所有进程共享 /tmp）
+DEFAULT_LEDGER_PATH = os.path.join(tempfile.gettempdir(), 'minimax_dubbing_admission.json')
+
+# 为gunicorn、nginx等常驻进程预留的内存（GB）
+DEFAULT_MEMORY_RESERVE_GB = 1.5
+
+# 等待中的任务超过该时间未刷新视为已退出（秒）
+WAITING_STALE_SECONDS = 30
+
+
+def get_container_cpu_limit() -> float:
+    """
+    获取容器CPU配额（核数，可为小数）
+
+    Returns:
+        cgroup v2 / v1 的CPU配额；无限制时返回逻辑CPU数
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().strip().split()
+        if quota != 'max' and int(period) > 0:
+            return int(quota) / int(period)
+    except (FileNotFoundError, ValueError, PermissionError):
+        pass
+
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read().strip())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read().strip())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (FileNotFoundError, ValueError, PermissionError):
+        pass
+
+    return float(os.cpu_count() or 4)
+
+
+def get_container_memory_limit() -> int:
+    """
+    获取容器内存上限（字节）
+
+    Returns:
+        cgroup v2 / v1 的内存上限；无限制时返回物理内存总量
+    """
+    physical = None
+    try:
+        import psutil
+        physical = psutil.virtual_memory().total
+    except Exception:
+        pass
+
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max':
+                limit = int(value)
+                # cgroup v1 无限制时是一个接近 2^63 的值
+                if physical is None or limit < physical:
+                    return limit
+        except (FileNotFoundError, ValueError, PermissionError):
+            continue
+
+    return physical or 8 * GB
+
+
+def estimate_job_cost(job_type: str, duration: float = 0.0, **params) -> Dict[str, float]:
+    """
+    估算任务资源成本
+
+    Args:
+        job_type: 任务类型
+            - demucs: 人声分离，params: jobs（并行进程数，分块模式下为工作进程数）, device, chunk_seconds（分块模式的窗口长度）
+            - face_detection: 人脸检测+特征提取，params: num_frames, width, height
+            - ffmpeg_mux: ffmpeg音视频合成（视频流复制 + 音频编码），params: audio_tracks（编码的音轨数）
+            - ffmpeg_extract: ffmpeg音频提取
+        duration: 媒体时长（秒）
+        **params: 各任务类型的额外参数
+
+    Returns:
+        {'cpu': 核数, 'memory_gb': 内存GB, 'expected_seconds': 预计耗时}
+    """
+    if job_type == 'demucs':
+        from services.audio_separator.utils import estimate_processing_time
+
+        jobs = max(1, int(params.get('jobs') or 1))
+        device = params.get('device', 'cpu')
+        # 模型权重约1.5GB；Demucs对整段音频做float32推理：输入 + 4个音源输出，44.1kHz双声道
+        # 分块模式只有一个窗口（加上重叠区和交叉淡化缓冲）常驻内存，与音频总时长无关
+        chunk_seconds = params.get('chunk_seconds')
+        resident_seconds = min(duration, float(chunk_seconds) * 1.5) if chunk_seconds else duration
+        waveform_gb = resident_seconds * 44100 * 2 * 4 * 5 / GB
+        if chunk_seconds:
+            # 分块并行：每个工作进程各加载一份模型、各处理一个窗口
+            memory_gb = jobs * (1.5 + waveform_gb)
+        else:
+            # 每个并行进程额外约0.5GB（与 get_safe_demucs_jobs 的每job 2GB 相比是实测的常驻增量）
+            memory_gb = 1.5 + waveform_gb + 0.5 * jobs
+        cpu = float(jobs) if device == 'cpu' else 1.0
+        expected = estimate_processing_time(duration, device) or 60
+
+    elif job_type == 'face_detection':
+        num_frames = int(params.get('num_frames') or 0)
+        width = int(params.get('width') or 1920)
+        height = int(params.get('height') or 1080)
+        # MTCNN + InceptionResnetV1 约1GB；抽取的关键帧全部保存在内存中（BGR + RGB副本）
+        frames_gb = num_frames * width * height * 3 * 2 / GB
+        memory_gb = 1.0 + frames_gb
+        cpu = float(params.get('cpu') or 2)
+        expected = max(60, num_frames * 0.2)
+
+    elif job_type == 'ffmpeg_mux':
+        # 视频流复制几乎不占CPU，成本主要来自每条音轨的混音和AAC编码
+        tracks = max(1, int(params.get('audio_tracks') or 1))
+        memory_gb = 0.3 + 0.05 * (tracks - 1)
+        cpu = 1.0 + 0.25 * (tracks - 1)
+        expected = max(30, duration * 0.2 * tracks)
+
+    elif job_type == 'ffmpeg_extract':
+        memory_gb = 0.2
+        cpu = 1.0
+        expected = max(30, duration * 0.1)
+
+    else:
+        memory_gb = float(params.get('memory_gb', 0.5))
+        cpu = float(params.get('cpu', 1))
+        expected = float(params.get('expected_seconds', 300))
+
+    return {'cpu': round(cpu, 2), 'memory_gb': round(memory_gb, 2), 'expected_seconds': int(expected)}
+
+
+class AdmissionTimeout(Exception):
+    """排队超时"""
+    pass
+
+
+class AdmissionController:
+    """跨进程资源准入控制器"""
+
+    def __init__(
+        self,
+        ledger_path: str = DEFAULT_LEDGER_PATH,
+        cpu_capacity: Optional[float] = None,
+        memory_capacity_gb: Optional[float] = None,
+        memory_reserve_gb: float = DEFAULT_MEMORY_RESERVE_GB,
+        poll_interval: float = 1.0
+    ):
+        """
+        Args:
+            ledger_path: 资源账本文件路径
+            cpu_capacity: CPU容量（核），默认读取cgroup
+            memory_capacity_gb: 内存容量（GB），默认读取cgroup并扣除预留
+            memory_reserve_gb: 为常驻进程预留的内存（GB）
+            poll_interval: 排队时的检查间隔（秒）
+        """
+        self.ledger_path = ledger_path
+        self.cpu_capacity = cpu_capacity or get_container_cpu_limit()
+        if memory_capacity_gb is None:
+            memory_capacity_gb = max(1.0, get_container_memory_limit() / GB - memory_reserve_gb)
+        self.memory_capacity_gb = memory_capacity_gb
+        self.poll_interval = poll_interval
+
+    @contextmanager
+    def _locked_ledger(self):
+        """加排他锁读写账本"""
+        fd = os.open(self.ledger_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with os.fdopen(os.dup(fd), 'r+') as f:
+                content = f.read()
+                try:
+                    ledger = json.loads(content) if content else {}
+                except ValueError:
+                    logger.warning("[准入控制] 资源账本损坏，已重置")
+                    ledger = {}
+                ledger.setdefault('running', {})
+                ledger.setdefault('waiting', {})
+
+                yield ledger
+
+                f.seek(0)
+                f.truncate()
+                json.dump(ledger, f)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _purge(self, ledger: dict):
+        """清理进程已退出或超时的记录"""
+        now = time.time()
+        for ticket, entry in list(ledger['running'].items()):
+            if not self._pid_alive(entry['pid']) or now > entry['expires_at']:
+                logger.warning(f"[准入控制] 清理失效的资源预约: {entry['label']} (pid={entry['pid']})")
+                del ledger['running'][ticket]
+        for ticket, entry in list(ledger['waiting'].items()):
+            if not self._pid_alive(entry['pid']) or now - entry['seen_at'] > WAITING_STALE_SECONDS:
+                del ledger['waiting'][ticket]
+
+    def _usage(self, ledger: dict):
+        cpu = sum(e['cpu'] for e in ledger['running'].values())
+        memory = sum(e['memory_gb'] for e in ledger['running'].values())
+        return cpu, memory
+
+    def _fits(self, ledger: dict, cost: Dict[str, float]) -> bool:
+        if not ledger['running']:
+            # 空闲时总是放行（单个任务超过容量时独占运行）
+            return True
+        cpu, memory = self._usage(ledger)
+        return (cpu + cost['cpu'] <= self.cpu_capacity and
+                memory + cost['memory_gb'] <= self.memory_capacity_gb)
+
+    def try_acquire(self, ticket: str, job_type: str, cost: Dict[str, float], label: str,
+                    enqueued_at: float) -> Optional[int]:
+        """
+        尝试获取资源
+
+        Returns:
+            None 表示已获取；否则返回排队位置（从1开始）
+        """
+        now = time.time()
+        with self._locked_ledger() as ledger:
+            self._purge(ledger)
+            ledger['waiting'].pop(ticket, None)
+
+            earlier = [e for e in ledger['waiting'].values() if e['enqueued_at'] < enqueued_at]
+            if not earlier and self._fits(ledger, cost):
+                ledger['running'][ticket] = {
+                    'job_type': job_type,
+                    'label': label,
+                    'pid': os.getpid(),
+                    'cpu': cost['cpu'],
+                    'memory_gb': cost['memory_gb'],
+                    'started_at': now,
+                    # 预约最长有效期：预计耗时的3倍（至少1小时），防止异常退出后永久占用
+                    'expires_at': now + max(3600, cost.get('expected_seconds', 0) * 3)
+                }
+                return None
+
+            ledger['waiting'][ticket] = {
+                'job_type': job_type,
+                'label': label,
+                'pid': os.getpid(),
+                'cpu': cost['cpu'],
+                'memory_gb': cost['memory_gb'],
+                'enqueued_at': enqueued_at,
+                'seen_at': now
+            }
+            return len(earlier) + 1
+
+    def release(self, ticket: str):
+        """释放资源"""
+        with self._locked_ledger() as ledger:
+            ledger['running'].pop(ticket, None)
+            ledger['waiting'].pop(ticket, None)
+
+    def status(self) -> dict:
+        """当前资源占用和排队情况"""
+        with self._locked_ledger() as ledger:
+            self._purge(ledger)
+            cpu, memory = self._usage(ledger)
+            return {
+                'cpu_capacity': self.cpu_capacity,
+                'memory_capacity_gb': round(self.memory_capacity_gb, 2),
+                'cpu_used': cpu,
+                'memory_used_gb': round(memory, 2),
+                'running': list(ledger['running'].values()),
+                'waiting': sorted(ledger['waiting'].values(), key=lambda e: e['enqueued_at'])
+            }
+
+    @contextmanager
+    def admit(
+        self,
+        job_type: str,
+        cost: Dict[str, float],
+        label: str = '',
+        timeout: Optional[float] = None,
+        cancel_token=None,
+        on_wait: Optional[Callable[[int], None]] = None
+    ):
+        """
+        申请资源，容量不足时排队等待；退出上下文时释放
+
+        Args:
+            job_type: 任务类型
+            cost: estimate_job_cost 的返回值
+            label: 任务描述（日志用）
+            timeout: 最长排队时间（秒），None表示一直等待
+            cancel_token: 取消令牌，排队期间可取消
+            on_wait: 排队回调 on_wait(position)，用于更新任务进度提示
+
+        Raises:
+            AdmissionTimeout: 排队超时
+            OperationCancelled: 排队期间任务被取消
+        """
+        ticket = uuid.uuid4().hex
+        label = label or job_type
+        enqueued_at = time.time()
+        last_position = None
+
+        try:
+            while True:
+                position = self.try_acquire(ticket, job_type, cost, label, enqueued_at)
+                if position is None:
+                    break
+
+                if position != last_position:
+                    logger.info(
+                        f"[准入控制] {label} 排队中（第{position}位），"
+                        f"需要 CPU {cost['cpu']}核 / 内存 {cost['memory_gb']}GB"
+                    )
+                    if on_wait:
+                        on_wait(position)
+                    last_position = position
+
+                if timeout is not None and time.time() - enqueued_at > timeout:
+                    raise AdmissionTimeout(f"{label} 排队超时（{timeout:.0f}秒）")
+
+                if cancel_token is not None:
+                    cancel_token.sleep(self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            self.release(ticket)
+            raise
+
+        waited = time.time() - enqueued_at
+        logger.info(
+            f"[准入控制] {label} 获得资源（CPU {cost['cpu']}核 / 内存 {cost['memory_gb']}GB），"
+            f"排队 {waited:.1f}s"
+        )
+        try:
+            yield
+        finally:
+            self.release(ticket)
+            logger.info(f"[准入控制] {label} 释放资源")
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器（容量按需从cgroup读取一次）"""
+    global _controller
+    if _controller is None:
+        from django.conf import settings
+        _controller = AdmissionController(
+            ledger_path=getattr(settings, 'ADMISSION_LEDGER_PATH', DEFAULT_LEDGER_PATH),
+            memory_reserve_gb=getattr(settings, 'ADMISSION_MEMORY_RESERVE_GB', DEFAULT_MEMORY_RESERVE_GB)
+        )
+        logger.info(
+            f"[准入控制] 容量: CPU {_controller.cpu_capacity:.1f}核, "
+            f"内存 {_controller.memory_capacity_gb:.1f}GB"
+        )
+    return _controller
+
+
+def admit(job_type: str, cost: Dict[str, float], label: str = '', **kwargs):
+    """使用全局准入控制器申请资源，参数见 AdmissionController.admit"""
+    return get_admission_controller().admit(job_type, cost, label, **kwargs)
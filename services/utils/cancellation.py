@@ -0,0 +1,258 @@
+"""
+协作式任务取消
+
+后台任务线程无法被强制终止，只能在安全点检查取消信号。CancellationToken 将取消信号传递到：
+- MiniMaxClient：限流/重试等待立即返回，进行中的HTTP请求的连接被关闭
+- TimestampAligner：每个对齐步骤之间检查
+- DemucsSeparator / VideoProcessor：注册回调，取消时直接杀掉子进程组
+- 说话人识别Pipeline：每个阶段、每个批次之间检查
+
+停止接口可能落在另一个gunicorn worker上，因此令牌可以绑定一个取消状态检查函数（如查询数据库中任务状态），
+由每个进程一个的共享巡检线程定期调用，检测到取消后触发本进程内的令牌。
+"""
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OperationCancelled(Exception):
+    """任务已被取消"""
+    pass
+
+
+class CancellationToken:
+    """取消令牌"""
+
+    def __init__(self, task_id: Optional[str] = None, source: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            task_id: 任务ID（日志用）
+            source: 跨进程取消状态检查函数，返回True表示任务已被取消
+        """
+        self.task_id = task_id
+        self.source = source
+        self.reason = ''
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = '用户取消') -> None:
+        """触发取消：设置信号并执行所有已注册的回调（如终止子进程）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+
+        logger.info(f"[任务取消] 任务 {self.task_id} 已取消: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[任务取消] 执行取消回调失败: {e}")
+
+    def raise_if_cancelled(self) -> None:
+        """已取消时抛出 OperationCancelled"""
+        if self._event.is_set():
+            raise OperationCancelled(self.reason or '任务已取消')
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待取消信号（可替代 time.sleep，取消时提前返回）
+
+        Returns:
+            是否已取消
+        """
+        return self._event.wait(timeout)
+
+    def sleep(self, seconds: float) -> None:
+        """可被取消打断的等待，取消时抛出 OperationCancelled"""
+        if seconds > 0 and self._event.wait(seconds):
+            self.raise_if_cancelled()
+        self.raise_if_cancelled()
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        注册取消回调；令牌已取消时立即执行
+
+        Returns:
+            注销函数
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+
+        if not registered:
+            callback()
+            return lambda: None
+
+        def unregister():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unregister
+
+
+class CancellationRegistry:
+    """进程内取消令牌登记表"""
+
+    def __init__(self, poll_interval: float = 2.0):
+        """
+        Args:
+            poll_interval: 巡检线程检查跨进程取消状态的间隔（秒）
+        """
+        self.poll_interval = poll_interval
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def create(self, task_id: str, source: Optional[Callable[[], bool]] = None) -> CancellationToken:
+        """为任务创建并登记取消令牌"""
+        token = CancellationToken(task_id, source)
+        with self._lock:
+            self._tokens[task_id] = token
+            if source is not None and (self._watcher is None or not self._watcher.is_alive()):
+                self._watcher = threading.Thread(target=self._watch, daemon=True, name='cancellation-watcher')
+                self._watcher.start()
+        return token
+
+    def get(self, task_id: str) -> Optional[CancellationToken]:
+        with self._lock:
+            return self._tokens.get(task_id)
+
+    def cancel(self, task_id: str, reason: str = '用户取消') -> bool:
+        """
+        取消本进程内的任务
+
+        Returns:
+            任务是否在本进程内运行
+        """
+        token = self.get(task_id)
+        if token is None:
+            return False
+        token.cancel(reason)
+        return True
+
+    def remove(self, task_id: str) -> None:
+        """任务结束后注销令牌"""
+        with self._lock:
+            self._tokens.pop(task_id, None)
+
+    def _watch(self):
+        """巡检线程：定期调用各令牌的跨进程取消检查函数"""
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                with self._lock:
+                    tokens = [t for t in self._tokens.values() if t.source is not None and not t.is_cancelled]
+                    if not any(t.source is not None for t in self._tokens.values()):
+                        self._watcher = None
+                        return
+                for token in tokens:
+                    try:
+                        if token.source():
+                            token.cancel('任务已在其他进程中被取消')
+                    except Exception as e:
+                        logger.warning(f"[任务取消] 检查任务 {token.task_id} 取消状态失败: {e}")
+        finally:
+            try:
+                from django.db import connection
+                connection.close()
+            except Exception:
+                pass
+
+
+def terminate_process_group(process: subprocess.Popen, grace_seconds: float = 3.0) -> None:
+    """
+    终止子进程及其所有子孙进程（子进程需以 start_new_session=True 启动）
+
+    Args:
+        process: 子进程
+        grace_seconds: SIGTERM 后等待退出的时间，超时后 SIGKILL
+    """
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        process.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    logger.info(f"[任务取消] 已终止子进程组 {process.pid}")
+
+
+def run_cancellable(
+    cmd: List[str],
+    cancel_token: Optional[CancellationToken] = None,
+    timeout: Optional[float] = None,
+    **kwargs
+) -> subprocess.CompletedProcess:
+    """
+    subprocess.run 的可取消版本：子进程在独立进程组中运行，取消时整个进程组被终止
+
+    Args:
+        cmd: 命令
+        cancel_token: 取消令牌
+        timeout: 超时时间（秒）
+        **kwargs: 传给 Popen 的其他参数（capture_output / text 等）
+
+    Returns:
+        CompletedProcess
+
+    Raises:
+        OperationCancelled: 任务被取消
+        subprocess.TimeoutExpired: 超时
+    """
+    check = kwargs.pop('check', False)
+    if kwargs.pop('capture_output', False):
+        kwargs['stdout'] = subprocess.PIPE
+        kwargs['stderr'] = subprocess.PIPE
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+    process = subprocess.Popen(cmd, start_new_session=True, **kwargs)
+    unregister = cancel_token.register(lambda: terminate_process_group(process)) if cancel_token else None
+    try:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            terminate_process_group(process)
+            process.communicate()
+            raise
+    finally:
+        if unregister:
+            unregister()
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+    result = subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+    if check:
+        result.check_returncode()
+    return result
+
+
+# 全局登记表（每个进程一个）
+cancellation_registry = CancellationRegistry()
@@ -0,0 +1,225 @@
+"""
+ffmpeg 执行器：进度解析、按时长计算超时、有界 stderr
+
+subprocess.run(capture_output=True, timeout=固定值) 的问题：
+- stderr 全部缓存在内存中（长视频的编码日志可达数MB）
+- 没有进度，前端只能看到"处理中"
+- 固定超时会让长视频必然失败，短视频卡死时又要等很久
+
+run_ffmpeg 以 -progress pipe:1 启动 ffmpeg，逐行解析 key=value 进度输出：
+- 进度（已处理时长 / 总时长、编码速度）通过回调推送到任务进度
+- 超时 = 基础时间 + 媒体时长 / 最低速度；另有停滞超时：长时间没有进度输出即终止
+- stderr 只保留最后 N 行，用于错误信息
+"""
+import collections
+import logging
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .cancellation import CancellationToken, terminate_process_group
+
+logger = logging.getLogger(__name__)
+
+# 默认最低处理速度（相对实时的倍数），用于计算超时：编码慢于该速度视为异常
+DEFAULT_MIN_SPEED = 0.25
+# 基础超时（秒）：覆盖启动、探测、写文件尾等与时长无关的开销
+DEFAULT_BASE_TIMEOUT = 120.0
+# 停滞超时（秒）：超过该时间没有新的进度输出即终止
+DEFAULT_STALL_TIMEOUT = 180.0
+# stderr 保留行数
+STDERR_TAIL_LINES = 50
+
+
+def probe_duration(path: str, ffprobe_path: str = 'ffprobe') -> float:
+    """
+    用 ffprobe 获取媒体时长（秒）
+
+    Returns:
+        时长；获取失败返回 0.0
+    """
+    try:
+        result = subprocess.run(
+            [ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        return float(result.stdout.strip()) if result.returncode == 0 else 0.0
+    except (ValueError, subprocess.TimeoutExpired, OSError) as e:
+        logger.warning(f"[ffmpeg] 获取媒体时长失败 {path}: {e}")
+        return 0.0
+
+
+def compute_timeout(
+    duration: float,
+    min_speed: float = DEFAULT_MIN_SPEED,
+    base_timeout: float = DEFAULT_BASE_TIMEOUT
+) -> Optional[float]:
+    """
+    按媒体时长计算超时
+
+    Args:
+        duration: 媒体时长（秒），未知时为0
+        min_speed: 最低处理速度（实时倍数）
+        base_timeout: 基础超时
+
+    Returns:
+        超时秒数；时长未知时返回 None（只依赖停滞超时）
+    """
+    if duration <= 0:
+        return None
+    return base_timeout + duration / min_speed
+
+
+def _parse_out_time(fields: Dict[str, str]) -> Optional[float]:
+    """从进度字段中取已处理时长（秒）"""
+    # out_time_us 是标准字段；旧版本 ffmpeg 的 out_time_ms 实际单位也是微秒
+    for key in ('out_time_us', 'out_time_ms'):
+        value = fields.get(key)
+        if value and value.lstrip('-').isdigit():
+            return max(0.0, int(value) / 1_000_000)
+    value = fields.get('out_time')
+    if value and ':' in value:
+        try:
+            h, m, s = value.split(':')
+            return max(0.0, int(h) * 3600 + int(m) * 60 + float(s))
+        except ValueError:
+            return None
+    return None
+
+
+def run_ffmpeg(
+    cmd: List[str],
+    duration: float = 0.0,
+    cancel_token: Optional[CancellationToken] = None,
+    progress_callback: Optional[Callable[[float, Dict[str, str]], None]] = None,
+    timeout: Optional[float] = None,
+    min_speed: float = DEFAULT_MIN_SPEED,
+    stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    progress_interval: float = 1.0
+) -> subprocess.CompletedProcess:
+    """
+    执行 ffmpeg 并解析进度
+
+    Args:
+        cmd: ffmpeg 命令（cmd[0] 为 ffmpeg 可执行文件，会自动插入 -progress 参数）
+        duration: 输出媒体预计时长（秒），用于计算进度和超时
+        cancel_token: 取消令牌，取消时终止进程组
+        progress_callback: 进度回调 callback(比例0-1, 进度字段)，最多每 progress_interval 秒一次
+        timeout: 总超时（秒）；为 None 时按 duration 和 min_speed 计算
+        min_speed: 最低处理速度（实时倍数）
+        stall_timeout: 停滞超时（秒）
+        progress_interval: 进度回调最小间隔（秒）
+
+    Returns:
+        CompletedProcess（stdout 为 None，stderr 为最后 STDERR_TAIL_LINES 行）
+
+    Raises:
+        OperationCancelled: 任务被取消
+        subprocess.TimeoutExpired: 超时或停滞
+    """
+    if timeout is None:
+        timeout = compute_timeout(duration, min_speed)
+
+    full_cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', '-nostdin'] + list(cmd[1:])
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+    process = subprocess.Popen(
+        full_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace',
+        start_new_session=True
+    )
+    unregister = cancel_token.register(lambda: terminate_process_group(process)) if cancel_token else None
+
+    stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+    state = {'last_activity': time.monotonic(), 'last_callback': 0.0}
+
+    def read_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip('\n'))
+
+    def read_progress():
+        fields: Dict[str, str] = {}
+        for line in process.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            fields[key] = value
+            if key != 'progress':
+                continue
+
+            # 每个进度块以 progress=continue/end 结尾
+            state['last_activity'] = time.monotonic()
+            if progress_callback is not None:
+                now = time.monotonic()
+                if value == 'end' or now - state['last_callback'] >= progress_interval:
+                    state['last_callback'] = now
+                    out_time = _parse_out_time(fields)
+                    fraction = 1.0 if value == 'end' else (
+                        min(1.0, out_time / duration) if out_time is not None and duration > 0 else 0.0
+                    )
+                    try:
+                        progress_callback(fraction, dict(fields))
+                    except Exception as e:
+                        logger.warning(f"[ffmpeg] 进度回调失败: {e}")
+            fields = {}
+
+    readers = [
+        threading.Thread(target=read_stderr, daemon=True, name='ffmpeg-stderr'),
+        threading.Thread(target=read_progress, daemon=True, name='ffmpeg-progress'),
+    ]
+    for reader in readers:
+        reader.start()
+
+    started = time.monotonic()
+    timed_out = None
+    try:
+        while True:
+            try:
+                process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            if timeout is not None and now - started > timeout:
+                timed_out = timeout
+                break
+            if now - state['last_activity'] > stall_timeout:
+                timed_out = stall_timeout
+                logger.error(f"[ffmpeg] 超过 {stall_timeout:.0f}s 没有进度输出，判定为停滞")
+                break
+
+        if timed_out is not None:
+            terminate_process_group(process)
+            process.wait()
+    finally:
+        if unregister:
+            unregister()
+        for reader in readers:
+            reader.join(timeout=5)
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+    stderr = '\n'.join(stderr_tail)
+    if timed_out is not None:
+        raise subprocess.TimeoutExpired(full_cmd, timed_out, stderr=stderr)
+
+    return subprocess.CompletedProcess(full_cmd, process.returncode, None, stderr)
+
+
+def format_progress(fraction: float, fields: Dict[str, str]) -> str:
+    """进度描述文本，如 "45% (2.3x)" """
+    speed = fields.get('speed', '').strip()
+    text = f"{int(fraction * 100)}%"
+    if speed and speed != 'N/A':
+        text += f" ({speed})"
+    return text
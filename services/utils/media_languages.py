@@ -0,0 +1,68 @@
+"""
+媒体容器语言标签
+
+项目语言使用 MiniMax 的语言名（如 "Chinese"），写入媒体文件时需要转换为标准语言代码：
+- HLS 播放列表 LANGUAGE 属性使用 RFC 5646（BCP 47），如 zh、en
+- MP4/MKV 音轨 language 元数据使用 ISO 639-2，如 chi、eng
+"""
+
+# 语言名 -> (BCP 47, ISO 639-2)
+LANGUAGE_CODES = {
+    'Chinese': ('zh', 'chi'),
+    'Chinese,Yue': ('yue', 'chi'),
+    'English': ('en', 'eng'),
+    'Spanish': ('es', 'spa'),
+    'French': ('fr', 'fre'),
+    'Russian': ('ru', 'rus'),
+    'German': ('de', 'ger'),
+    'Portuguese': ('pt', 'por'),
+    'Arabic': ('ar', 'ara'),
+    'Italian': ('it', 'ita'),
+    'Japanese': ('ja', 'jpn'),
+    'Korean': ('ko', 'kor'),
+    'Indonesian': ('id', 'ind'),
+    'Vietnamese': ('vi', 'vie'),
+    'Turkish': ('tr', 'tur'),
+    'Dutch': ('nl', 'dut'),
+    'Ukrainian': ('uk', 'ukr'),
+    'Thai': ('th', 'tha'),
+    'Polish': ('pl', 'pol'),
+    'Romanian': ('ro', 'rum'),
+    'Greek': ('el', 'gre'),
+    'Czech': ('cs', 'cze'),
+    'Finnish': ('fi', 'fin'),
+    'Hindi': ('hi', 'hin'),
+    'Bulgarian': ('bg', 'bul'),
+    'Danish': ('da', 'dan'),
+    'Hebrew': ('he', 'heb'),
+    'Malay': ('ms', 'may'),
+    'Persian': ('fa', 'per'),
+    'Slovak': ('sk', 'slo'),
+    'Swedish': ('sv', 'swe'),
+    'Croatian': ('hr', 'hrv'),
+    'Filipino': ('fil', 'fil'),
+    'Hungarian': ('hu', 'hun'),
+    'Norwegian': ('no', 'nor'),
+    'Slovenian': ('sl', 'slv'),
+    'Catalan': ('ca', 'cat'),
+    'Nynorsk': ('nn', 'nno'),
+    'Tamil': ('ta', 'tam'),
+    'Afrikaans': ('af', 'afr'),
+}
+
+
+def language_tag(language: str, iso639_2: bool = False) -> str:
+    """
+    项目语言名转换为语言代码
+
+    Args:
+        language: 项目语言名（Project.LANGUAGE_CHOICES 中的值）
+        iso639_2: True 返回 ISO 639-2 三字母代码（容器音轨元数据），否则返回 BCP 47（HLS）
+
+    Returns:
+        语言代码；未知语言返回 und
+    """
+    codes = LANGUAGE_CODES.get(language)
+    if codes is None:
+        return 'und'
+    return codes[1] if iso639_2 else codes[0]
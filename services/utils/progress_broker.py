@@ -0,0 +1,338 @@
+"""
+任务进度推送（Server-Sent Events）
+
+进程内发布/订阅：后台任务线程发布进度，SSE连接订阅进度。
+- 同一任务的多个订阅者共享一个频道，进度只在内存中合并
+- 每个订阅者按 max_updates_per_second 合并推送，避免高频刷新
+- 协议为 snapshot + delta：首帧推送完整快照，之后只推送变化的字段
+- 任务不在本进程运行时（gunicorn多worker），每个任务只启动一个共享轮询线程读取数据库，
+  无论打开多少个浏览器标签页，数据库读取次数都与订阅者数量无关
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled', 'timeout')
+
+
+class ProgressChannel:
+    """单个任务的进度频道"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.state: Dict[str, Any] = {}
+        self.seq = 0
+        self.closed = False
+        self.has_publisher = False  # 本进程内是否有任务线程在发布
+        self.subscribers = 0
+        self.poller: Optional[threading.Thread] = None
+        self.last_activity = time.monotonic()
+        self.condition = threading.Condition()
+
+
+class ProgressBroker:
+    """进程内进度发布/订阅中心"""
+
+    def __init__(
+        self,
+        max_updates_per_second: float = 2.0,
+        poll_interval: float = 2.0,
+        heartbeat_interval: float = 15.0,
+        channel_ttl: float = 600.0
+    ):
+        """
+        Args:
+            max_updates_per_second: 每个订阅者每秒最多推送的更新次数
+            poll_interval: 任务不在本进程时，共享轮询线程读取数据库的间隔（秒）
+            heartbeat_interval: 无更新时发送心跳的间隔（秒），防止代理断开空闲连接
+            channel_ttl: 已结束或无活动频道的保留时间（秒）
+        """
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.channel_ttl = channel_ttl
+        self._channels: Dict[str, ProgressChannel] = {}
+        self._lock = threading.Lock()
+
+    def _get_channel(self, task_id: str, create: bool = True) -> Optional[ProgressChannel]:
+        with self._lock:
+            self._cleanup_locked()
+            channel = self._channels.get(task_id)
+            if channel is None and create:
+                channel = ProgressChannel(task_id)
+                self._channels[task_id] = channel
+            return channel
+
+    def _cleanup_locked(self):
+        """清理已结束且无人订阅、或长期无活动的频道"""
+        now = time.monotonic()
+        expired = [
+            task_id for task_id, channel in self._channels.items()
+            if channel.subscribers == 0 and now - channel.last_activity > self.channel_ttl
+        ]
+        for task_id in expired:
+            del self._channels[task_id]
+
+    def _apply(self, channel: ProgressChannel, fields: Dict[str, Any]) -> bool:
+        """合并字段到频道状态，有变化时唤醒订阅者"""
+        with channel.condition:
+            changed = {k: v for k, v in fields.items() if channel.state.get(k) != v}
+            if not changed and channel.seq > 0:
+                return False
+            channel.state.update(changed)
+            channel.seq += 1
+            channel.last_activity = time.monotonic()
+            if channel.state.get('status') in TERMINAL_STATUSES:
+                channel.closed = True
+            channel.condition.notify_all()
+            return True
+
+    def publish(self, task_id: str, **fields) -> None:
+        """
+        发布任务进度（只写内存，开销极小）
+
+        只应由本进程内运行任务的线程调用（ProgressReporter）：调用后本进程视为任务所在进程，
+        订阅者不再轮询数据库。
+
+        Args:
+            task_id: 任务ID
+            **fields: 变化的进度字段，如 status、completed、current_step
+        """
+        channel = self._get_channel(task_id)
+        channel.has_publisher = True
+        self._apply(channel, fields)
+
+    def notify(self, task_id: str, **fields) -> None:
+        """
+        将已保存到数据库的进度同步给本进程的订阅者，不声明任务在本进程运行
+
+        模型 save() 使用：提交任务、取消任务的请求也会保存进度行，但任务可能在其他进程（媒体worker）执行，
+        这些进程的订阅者仍需轮询数据库获取后续进度。没有订阅者（频道不存在）时不做任何事。
+
+        Args:
+            task_id: 任务ID
+            **fields: 进度字段
+        """
+        channel = self._get_channel(task_id, create=False)
+        if channel is None:
+            return
+        self._apply(channel, fields)
+
+    def get_snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取本进程内发布的最新进度快照
+
+        Returns:
+            进度字典；任务不在本进程运行时返回 None
+        """
+        channel = self._get_channel(task_id, create=False)
+        if channel is None or not channel.has_publisher:
+            return None
+        with channel.condition:
+            return dict(channel.state)
+
+    def _start_poller(self, channel: ProgressChannel, loader: Callable[[], Optional[Dict[str, Any]]]):
+        """为不在本进程运行的任务启动共享轮询线程（每个任务最多一个）"""
+        if channel.poller is not None and channel.poller.is_alive():
+            return
+
+        def poll():
+            try:
+                while True:
+                    with channel.condition:
+                        channel.condition.wait(timeout=self.poll_interval)
+                        if channel.closed or channel.has_publisher or channel.subscribers == 0:
+                            break
+                    try:
+                        state = loader()
+                    except Exception as e:
+                        logger.warning(f"[进度推送] 读取任务 {channel.task_id} 进度失败: {e}")
+                        continue
+                    if state is None:
+                        self._apply(channel, {'status': 'failed', 'error_message': '任务不存在或已过期'})
+                        break
+                    self._apply(channel, state)
+            finally:
+                # 轮询线程独占一个数据库连接，退出时关闭
+                try:
+                    from django.db import connection
+                    connection.close()
+                except Exception:
+                    pass
+
+        channel.poller = threading.Thread(target=poll, daemon=True, name=f"progress-poll-{channel.task_id}")
+        channel.poller.start()
+
+    def subscribe(
+        self,
+        task_id: str,
+        loader: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+        max_duration: float = 300.0
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        订阅任务进度
+
+        Args:
+            task_id: 任务ID
+            loader: 从数据库读取进度快照的函数，任务不在本进程运行时使用
+            max_duration: 单个连接最长持续时间（秒），到期后客户端自动重连
+
+        Yields:
+            (event, data)：event 为 snapshot / delta / heartbeat / end
+        """
+        channel = self._get_channel(task_id)
+        with channel.condition:
+            channel.subscribers += 1
+            channel.last_activity = time.monotonic()
+
+        try:
+            if not channel.has_publisher and loader is not None:
+                if channel.poller is None or not channel.poller.is_alive():
+                    state = loader()
+                    if state is None:
+                        yield 'end', {'status': 'not_found', 'error_message': '任务不存在或已过期'}
+                        return
+                    self._apply(channel, state)
+                if not channel.closed:
+                    self._start_poller(channel, loader)
+
+            with channel.condition:
+                last_seq = channel.seq
+                last_sent = dict(channel.state)
+            yield 'snapshot', dict(last_sent, seq=last_seq)
+
+            deadline = time.monotonic() + max_duration
+            last_sent_at = time.monotonic()
+
+            while not channel.closed or last_seq != channel.seq:
+                with channel.condition:
+                    if channel.seq == last_seq and not channel.closed:
+                        channel.condition.wait(timeout=self.heartbeat_interval)
+                    has_update = channel.seq != last_seq
+
+                if not has_update:
+                    if time.monotonic() >= deadline:
+                        return
+                    yield 'heartbeat', {}
+                    continue
+
+                # 合并推送：距离上一次推送不足 min_interval 时先等待，期间的多次更新合并为一个 delta
+                wait = self.min_interval - (time.monotonic() - last_sent_at)
+                if wait > 0 and not channel.closed:
+                    time.sleep(wait)
+
+                with channel.condition:
+                    last_seq = channel.seq
+                    current = dict(channel.state)
+
+                delta = {k: v for k, v in current.items() if last_sent.get(k) != v}
+                last_sent = current
+                last_sent_at = time.monotonic()
+                if delta:
+                    yield 'delta', dict(delta, seq=last_seq)
+
+                if time.monotonic() >= deadline and not channel.closed:
+                    return
+
+            yield 'end', {'status': last_sent.get('status'), 'seq': last_seq}
+
+        finally:
+            with channel.condition:
+                channel.subscribers -= 1
+                channel.last_activity = time.monotonic()
+                channel.condition.notify_all()
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """
+    格式化为 Server-Sent Events 报文
+
+    Args:
+        event: 事件名
+        data: 事件数据
+        event_id: 事件序号
+
+    Returns:
+        SSE 文本帧
+    """
+    if event == 'heartbeat':
+        return ': keepalive\n\n'
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def progress_event_stream(
+    task_id: str,
+    loader: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+    retry_ms: int = 3000
+) -> Iterator[str]:
+    """
+    生成SSE文本流
+
+    Args:
+        task_id: 任务ID
+        loader: 数据库快照读取函数
+        retry_ms: 客户端断线重连间隔（毫秒）
+
+    Yields:
+        SSE 文本帧
+    """
+    yield f"retry: {retry_ms}\n\n"
+    for event, data in progress_broker.subscribe(task_id, loader=loader):
+        yield format_sse(event, data, data.get('seq'))
+
+
+def sse_response(task_id: str, loader: Optional[Callable[[], Optional[Dict[str, Any]]]] = None):
+    """
+    构建SSE流式响应
+
+    Args:
+        task_id: 任务ID
+        loader: 数据库快照读取函数
+
+    Returns:
+        StreamingHttpResponse
+    """
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(
+        progress_event_stream(task_id, loader),
+        content_type='text/event-stream; charset=utf-8'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲，保证实时推送
+    return response
+
+
+try:
+    from rest_framework.renderers import BaseRenderer
+
+    class EventStreamRenderer(BaseRenderer):
+        """
+        text/event-stream 渲染器
+
+        EventSource 请求带 Accept: text/event-stream，DRF内容协商需要匹配的渲染器；
+        出错时（如404）将错误信息渲染为单个 error 事件。
+        """
+        media_type = 'text/event-stream'
+        format = 'event-stream'
+        charset = 'utf-8'
+
+        def render(self, data, accepted_media_type=None, renderer_context=None):
+            if isinstance(data, (bytes, str)):
+                return data
+            return format_sse('error', data if isinstance(data, dict) else {'detail': data})
+except ImportError:  # pragma: no cover
+    EventStreamRenderer = None
+
+
+# 全局进度中心实例（每个进程一个）
+progress_broker = ProgressBroker()
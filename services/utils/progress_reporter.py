@@ -0,0 +1,146 @@
+"""
+任务进度写入合并
+
+后台任务每处理一个段落都会更新进度，直接 save() 会频繁写库，在SQLite上与其他写操作串行竞争。
+ProgressReporter 在内存中合并计数和步骤变化：
+- 每次 update() 立即推送到进程内进度中心（SSE订阅者实时可见，不写库）
+- 数据库最多每 flush_interval_ms 写一次，且只写变化的字段（update_fields）
+- 状态变化（如 running -> completed）立即写库
+"""
+import logging
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """任务进度写入合并器"""
+
+    def __init__(
+        self,
+        instance,
+        flush_interval_ms: int = 1000,
+        immediate_fields: Iterable[str] = ('status',)
+    ):
+        """
+        Args:
+            instance: 进度模型实例（TaskMonitor / SpeakerDiarizationTask），
+                      需提供 progress_channel 和 progress_snapshot()
+            flush_interval_ms: 两次写库的最小间隔（毫秒）
+            immediate_fields: 变化时立即写库的字段（状态迁移）
+        """
+        self.instance = instance
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.immediate_fields = set(immediate_fields)
+        self.writes = 0  # 实际写库次数
+        self.updates = 0  # update() 调用次数
+
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        field_names = {f.name for f in instance._meta.concrete_fields}
+        self._touch_fields = ['updated_at'] if 'updated_at' in field_names else []
+
+    def update(self, **fields: Any) -> None:
+        """
+        更新进度字段
+
+        Args:
+            **fields: 模型字段及新值，如 completed_segments=10, current_step='...'
+        """
+        with self._lock:
+            changed = []
+            for name, value in fields.items():
+                if getattr(self.instance, name) != value:
+                    setattr(self.instance, name, value)
+                    changed.append(name)
+            self.updates += 1
+            if not changed:
+                return
+            self._dirty.update(changed)
+
+            force = bool(self.immediate_fields.intersection(changed))
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if force or due:
+                self._flush_locked()
+                return
+
+        self._publish()
+
+    def increment(self, field: str, amount: int = 1) -> None:
+        """计数字段自增"""
+        self.update(**{field: getattr(self.instance, field) + amount})
+
+    def flush(self) -> None:
+        """立即写入所有未保存的变化"""
+        with self._lock:
+            self._flush_locked()
+
+    def finish(self, status: str, expected_status: Optional[str] = None, **fields: Any) -> bool:
+        """
+        任务结束：更新最终状态并立即写库
+
+        Args:
+            status: 最终状态（completed / failed / cancelled）
+            expected_status: 仅当数据库中的当前状态仍为该值时写入（条件 UPDATE），
+                             避免覆盖其他进程在此期间写入的状态（如取消接口写入的 cancelled）
+            **fields: 其他需要一起保存的字段
+
+        Returns:
+            是否写入；expected_status 不匹配时返回 False，实例状态与数据库重新同步
+        """
+        if expected_status is None:
+            self.update(status=status, **fields)
+            self.flush()
+            return True
+
+        from django.utils import timezone
+
+        with self._lock:
+            for name, value in dict(fields, status=status).items():
+                setattr(self.instance, name, value)
+                self._dirty.add(name)
+            values = {name: getattr(self.instance, name) for name in self._dirty}
+            for name in self._touch_fields:
+                values[name] = timezone.now()
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+
+            written = type(self.instance).objects.filter(
+                pk=self.instance.pk, status=expected_status
+            ).update(**values)
+            if written:
+                self.writes += 1
+            else:
+                self.instance.refresh_from_db()
+
+        if written:
+            self._publish()
+        return bool(written)
+
+    def _flush_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return
+        update_fields = list(self._dirty) + self._touch_fields
+        self._dirty.clear()
+        # 先以任务所在进程身份发布（save() 内部只同步给已有订阅者，不声明归属）
+        self._publish()
+        self.instance.save(update_fields=update_fields)
+        self.writes += 1
+
+    def _publish(self) -> None:
+        from services.utils.progress_broker import progress_broker
+        progress_broker.publish(self.instance.progress_channel, **self.instance.progress_snapshot())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"[进度写入] 保存任务进度失败: {e}")
+        return False
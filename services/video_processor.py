@@ -6,8 +6,11 @@ import os
 import logging
 import subprocess
 import tempfile
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from django.conf import settings
+from services.utils.admission import AdmissionTimeout, admit, estimate_job_cost
+from services.utils.cancellation import CancellationToken, OperationCancelled
+from services.utils.ffmpeg_runner import format_progress, probe_duration, run_ffmpeg
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +18,44 @@ logger = logging.getLogger(__name__)
 class VideoProcessor:
     """视频处理器"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        cancel_token: Optional[CancellationToken] = None,
+        progress_callback: Optional[Callable[[float, str], None]] = None
+    ):
+        """
+        Args:
+            cancel_token: 取消令牌：取消时终止 ffmpeg 进程组
+            progress_callback: ffmpeg 进度回调 callback(比例0-1, 进度描述)
+        """
         self.temp_dir = getattr(settings, 'MEDIA_ROOT', tempfile.gettempdir())
         self.ffmpeg_path = 'ffmpeg'  # 假设 ffmpeg 在 PATH 中
+        self.cancel_token = cancel_token
+        self.progress_callback = progress_callback
+
+    def _run_ffmpeg(self, cmd, duration: float, trace_id: Optional[str] = None):
+        """
+        执行 ffmpeg：进度推送到 progress_callback，超时按媒体时长计算，只保留 stderr 末尾
+
+        Args:
+            cmd: ffmpeg 命令
+            duration: 输出预计时长（秒），未知时为0
+            trace_id: 追踪ID
+        """
+        def on_progress(fraction, fields):
+            logger.debug(f"[{trace_id}] ffmpeg 进度: {format_progress(fraction, fields)}")
+            if self.progress_callback:
+                self.progress_callback(fraction, format_progress(fraction, fields))
+
+        return run_ffmpeg(cmd, duration=duration, cancel_token=self.cancel_token, progress_callback=on_progress)
+
+    def _remove_partial_output(self, path: str):
+        """删除被中断任务留下的不完整输出文件"""
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
 
     def check_ffmpeg(self) -> bool:
         """
@@ -90,6 +128,7 @@ class VideoProcessor:
                 '-c:v', 'copy',        # 视频直接复制
                 '-c:a', 'aac',         # 音频编码为 AAC
                 '-b:a', '192k',        # 音频比特率
+                '-movflags', '+faststart',  # moov 前置：播放器无需下载完整文件即可开始播放
                 '-shortest',           # 以较短的流为准
                 '-y',                  # 覆盖输出文件
                 output_path
@@ -97,13 +136,15 @@ class VideoProcessor:
 
             logger.info(f"[{trace_id}] ffmpeg 命令: {' '.join(cmd)}")
 
-            # 执行命令
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10分钟超时
-            )
+            # -shortest：输出时长取视频和音频中较短的
+            duration = min(filter(None, (probe_duration(video_path), probe_duration(audio_path))), default=0.0)
+
+            # 执行命令（在独立进程组中运行，取消时整组终止）；与人声分离等重任务共享容器资源，需先获得准入
+            with admit(
+                'ffmpeg_mux', estimate_job_cost('ffmpeg_mux', duration),
+                label=f"视频合成({trace_id})", timeout=1800, cancel_token=self.cancel_token
+            ):
+                result = self._run_ffmpeg(cmd, duration, trace_id)
 
             if result.returncode != 0:
                 error_msg = result.stderr
@@ -120,13 +161,497 @@ class VideoProcessor:
 
             return True, ""
 
-        except subprocess.TimeoutExpired:
-            logger.error(f"[{trace_id}] ffmpeg 执行超时")
+        except OperationCancelled:
+            logger.info(f"[{trace_id}] 视频合成已取消")
+            self._remove_partial_output(output_path)
+            return False, "任务已取消"
+        except AdmissionTimeout:
+            logger.error(f"[{trace_id}] 等待计算资源超时")
+            return False, "服务器繁忙，视频合成排队超时，请稍后重试"
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"[{trace_id}] ffmpeg 执行超时（{e.timeout:.0f}s）: {e.stderr}")
+            self._remove_partial_output(output_path)
             return False, "视频合成超时"
         except Exception as e:
             logger.error(f"[{trace_id}] 视频合成失败: {e}", exc_info=True)
             return False, f"视频合成失败: {str(e)}"
 
+    def mix_and_mux(
+        self,
+        video_path: str,
+        voice_audio_path: str,
+        background_audio_path: str,
+        output_path: str,
+        voice_volume: float = 1.0,
+        background_volume: float = 0.3,
+        mixed_audio_output_path: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        pcm_cache_dir: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """
+        单次 ffmpeg 调用完成混音和合成：volume/amix 滤镜混合配音和背景音，直接编码为 AAC 写入视频容器
+
+        与 mix_audio_tracks + replace_audio 相比，省去中间 MP3 文件和一次有损编码/解码。
+
+        Args:
+            video_path: 原始视频路径
+            voice_audio_path: 翻译配音路径（拼接后的完整音频）
+            background_audio_path: 背景音路径
+            output_path: 输出视频路径
+            voice_volume: 配音音量（0.0-1.0）
+            background_volume: 背景音音量（0.0-1.0）
+            mixed_audio_output_path: 可选，同一次调用中额外输出混合音频（用于预览区试听）
+            trace_id: 追踪ID
+            pcm_cache_dir: 解码 PCM 缓存目录（项目级）；指定时配音和背景音以裸 PCM 输入，只调整音量时无需重新解码
+
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            logger.info(f"[{trace_id}] 开始单次合成视频（混音+合成）")
+
+            for path, name in ((video_path, '视频'), (voice_audio_path, '配音'), (background_audio_path, '背景音')):
+                if not os.path.exists(path):
+                    return False, f"{name}文件不存在: {path}"
+
+            output_dir = os.path.dirname(output_path)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir, exist_ok=True)
+
+            # 音量按 dB 调整：20 * (音量 - 1)，与 AudioProcessor.mix_audio_tracks 一致
+            voice_db = 20 * (voice_volume - 1)
+            background_db = 20 * (background_volume - 1)
+
+            # amix: duration=first 以配音时长为准（背景音较长时截断、较短时补静音），normalize=0 直接相加不做衰减
+            filtergraph = (
+                f"[1:a]volume={voice_db:.2f}dB[voice];"
+                f"[2:a]volume={background_db:.2f}dB[bg];"
+                f"[voice][bg]amix=inputs=2:duration=first:dropout_transition=0:normalize=0"
+            )
+            if mixed_audio_output_path:
+                filtergraph += ",asplit=2[aout][apreview]"
+            else:
+                filtergraph += "[aout]"
+
+            voice_input = ['-i', voice_audio_path]
+            background_input = ['-i', background_audio_path]
+            if pcm_cache_dir:
+                from services.audio_engine.pcm_cache import get_cached_pcm
+                voice_track = get_cached_pcm(voice_audio_path, pcm_cache_dir, cancel_token=self.cancel_token)
+                background_track = get_cached_pcm(background_audio_path, pcm_cache_dir, cancel_token=self.cancel_token)
+                if voice_track:
+                    voice_input = voice_track.ffmpeg_input_args()
+                if background_track:
+                    background_input = background_track.ffmpeg_input_args()
+
+            cmd = [
+                self.ffmpeg_path,
+                '-i', video_path,
+                *voice_input,
+                *background_input,
+                '-filter_complex', filtergraph,
+                '-map', '0:v',
+                '-map', '[aout]',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                '-movflags', '+faststart',
+                '-shortest',
+                '-y',
+                output_path
+            ]
+            if mixed_audio_output_path:
+                os.makedirs(os.path.dirname(mixed_audio_output_path), exist_ok=True)
+                cmd += ['-map', '[apreview]', '-c:a', 'libmp3lame', '-b:a', '192k', '-y', mixed_audio_output_path]
+
+            logger.info(f"[{trace_id}] ffmpeg 命令: {' '.join(cmd)}")
+
+            # amix 以配音时长为准，-shortest 再与视频取较短者
+            duration = min(filter(None, (probe_duration(video_path), probe_duration(voice_audio_path))), default=0.0)
+
+            with admit(
+                'ffmpeg_mux', estimate_job_cost('ffmpeg_mux', duration),
+                label=f"视频合成({trace_id})", timeout=1800, cancel_token=self.cancel_token
+            ):
+                result = self._run_ffmpeg(cmd, duration, trace_id)
+
+            if result.returncode != 0:
+                error_msg = result.stderr
+                logger.error(f"[{trace_id}] ffmpeg 执行失败: {error_msg}")
+                return False, f"视频合成失败: {error_msg}"
+
+            if not os.path.exists(output_path):
+                return False, "输出文件未生成"
+
+            file_size = os.path.getsize(output_path)
+            logger.info(f"[{trace_id}] 视频合成成功，输出文件大小: {file_size / 1024 / 1024:.2f} MB")
+            return True, ""
+
+        except OperationCancelled:
+            logger.info(f"[{trace_id}] 视频合成已取消")
+            self._remove_partial_output(output_path)
+            self._remove_partial_output(mixed_audio_output_path)
+            return False, "任务已取消"
+        except AdmissionTimeout:
+            logger.error(f"[{trace_id}] 等待计算资源超时")
+            return False, "服务器繁忙，视频合成排队超时，请稍后重试"
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"[{trace_id}] ffmpeg 执行超时（{e.timeout:.0f}s）: {e.stderr}")
+            self._remove_partial_output(output_path)
+            return False, "视频合成超时"
+        except Exception as e:
+            logger.error(f"[{trace_id}] 视频合成失败: {e}", exc_info=True)
+            return False, f"视频合成失败: {str(e)}"
+
+    def mux_multilang(
+        self,
+        video_path: str,
+        background_audio_path: str,
+        voice_tracks: List[Dict],
+        output_path: str,
+        voice_volume: float = 1.0,
+        background_volume: float = 0.3,
+        original_audio_language: Optional[str] = None,
+        trace_id: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """
+        单次 ffmpeg 调用生成多语言视频：每种语言的配音与同一背景音混合，作为带语言标签的独立音轨
+
+        视频流只复制一次；背景音只解码一次，经 asplit 分给各语言的 amix。
+
+        Args:
+            video_path: 原始视频路径
+            background_audio_path: 背景音路径（各语言共用）
+            voice_tracks: 配音音轨列表（第一条为默认音轨），每项为
+                {'path': 配音路径, 'language': ISO 639-2 语言代码, 'title': 音轨名称}
+            output_path: 输出视频路径
+            voice_volume: 配音音量（0.0-1.0）
+            background_volume: 背景音音量（0.0-1.0）
+            original_audio_language: 指定时附加原视频音轨（ISO 639-2 语言代码），放在配音音轨之后
+            trace_id: 追踪ID
+
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            logger.info(f"[{trace_id}] 开始多语言合成: {len(voice_tracks)} 条配音音轨")
+
+            paths = [(video_path, '视频'), (background_audio_path, '背景音')]
+            paths += [(track['path'], f"{track.get('title', '')}配音") for track in voice_tracks]
+            for path, name in paths:
+                if not os.path.exists(path):
+                    return False, f"{name}文件不存在: {path}"
+            if not voice_tracks:
+                return False, "没有配音音轨"
+
+            output_dir = os.path.dirname(output_path)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir, exist_ok=True)
+
+            voice_db = 20 * (voice_volume - 1)
+            background_db = 20 * (background_volume - 1)
+            count = len(voice_tracks)
+
+            # 输入: 0=视频, 1=背景音, 2..=各语言配音
+            bg_labels = ''.join(f"[bg{i}]" for i in range(count))
+            filters = [f"[1:a]volume={background_db:.2f}dB,asplit={count}{bg_labels}" if count > 1
+                       else f"[1:a]volume={background_db:.2f}dB[bg0]"]
+            for i in range(count):
+                filters.append(
+                    f"[{i + 2}:a]volume={voice_db:.2f}dB[voice{i}];"
+                    f"[voice{i}][bg{i}]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout{i}]"
+                )
+
+            cmd = [self.ffmpeg_path, '-i', video_path, '-i', background_audio_path]
+            for track in voice_tracks:
+                cmd += ['-i', track['path']]
+            cmd += ['-filter_complex', ';'.join(filters), '-map', '0:v']
+            for i in range(count):
+                cmd += ['-map', f'[aout{i}]']
+            if original_audio_language:
+                cmd += ['-map', '0:a:0']
+
+            cmd += ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
+            if original_audio_language and self.probe_audio_codec(video_path) == 'aac':
+                cmd += [f'-c:a:{count}', 'copy']
+
+            # 音轨语言标签和默认音轨
+            for i, track in enumerate(voice_tracks):
+                cmd += [
+                    f'-metadata:s:a:{i}', f"language={track.get('language', 'und')}",
+                    f'-metadata:s:a:{i}', f"title={track.get('title', '')}",
+                    f'-disposition:a:{i}', 'default' if i == 0 else '0'
+                ]
+            if original_audio_language:
+                cmd += [
+                    f'-metadata:s:a:{count}', f"language={original_audio_language}",
+                    f'-metadata:s:a:{count}', "title=Original",
+                    f'-disposition:a:{count}', '0'
+                ]
+
+            cmd += ['-movflags', '+faststart', '-shortest', '-y', output_path]
+
+            logger.info(f"[{trace_id}] ffmpeg 命令: {' '.join(cmd)}")
+
+            duration = min(filter(None, (probe_duration(video_path), probe_duration(voice_tracks[0]['path']))), default=0.0)
+            with admit(
+                'ffmpeg_mux', estimate_job_cost('ffmpeg_mux', duration, audio_tracks=count),
+                label=f"多语言合成({trace_id})", timeout=1800, cancel_token=self.cancel_token
+            ):
+                result = self._run_ffmpeg(cmd, duration, trace_id)
+
+            if result.returncode != 0:
+                logger.error(f"[{trace_id}] ffmpeg 执行失败: {result.stderr}")
+                self._remove_partial_output(output_path)
+                return False, f"多语言合成失败: {result.stderr}"
+            if not os.path.exists(output_path):
+                return False, "输出文件未生成"
+
+            logger.info(
+                f"[{trace_id}] 多语言合成成功，输出文件大小: {os.path.getsize(output_path) / 1024 / 1024:.2f} MB"
+            )
+            return True, ""
+
+        except OperationCancelled:
+            logger.info(f"[{trace_id}] 多语言合成已取消")
+            self._remove_partial_output(output_path)
+            return False, "任务已取消"
+        except AdmissionTimeout:
+            logger.error(f"[{trace_id}] 等待计算资源超时")
+            return False, "服务器繁忙，视频合成排队超时，请稍后重试"
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"[{trace_id}] ffmpeg 执行超时（{e.timeout:.0f}s）: {e.stderr}")
+            self._remove_partial_output(output_path)
+            return False, "多语言合成超时"
+        except Exception as e:
+            logger.error(f"[{trace_id}] 多语言合成失败: {e}", exc_info=True)
+            return False, f"多语言合成失败: {str(e)}"
+
+    def find_keyframe_before(self, video_path: str, position: float, search_window: float = 10.0) -> Optional[float]:
+        """
+        查找 position 之前（含）最近的视频关键帧时间
+
+        只解码 [position - search_window, position] 区间的关键帧，耗时与视频总长度无关。
+
+        Returns:
+            关键帧时间（秒）；区间内没有关键帧或探测失败返回 None
+        """
+        try:
+            result = subprocess.run(
+                [
+                    'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+                    '-read_intervals', f"{max(0.0, position - search_window):.3f}%{position + 0.001:.3f}",
+                    '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', video_path
+                ],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            times = []
+            for line in result.stdout.splitlines():
+                try:
+                    times.append(float(line.strip().rstrip(',')))
+                except ValueError:
+                    continue
+            candidates = [t for t in times if t <= position + 0.001]
+            return max(candidates) if candidates else None
+        except (subprocess.TimeoutExpired, OSError) as e:
+            logger.warning(f"查找关键帧失败 {video_path}: {e}")
+            return None
+
+    def render_preview(
+        self,
+        video_path: str,
+        voice_audio_path: str,
+        background_audio_path: str,
+        output_path: str,
+        start: float,
+        duration: float,
+        voice_volume: float = 1.0,
+        background_volume: float = 0.3,
+        copy_video: bool = True,
+        trace_id: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """
+        渲染时间窗口预览视频
+
+        视频和背景音都用输入端 -ss 快速定位（只读取窗口附近的数据），与窗口配音混音后输出短 MP4。
+
+        Args:
+            video_path: 原始视频路径
+            voice_audio_path: 窗口配音（从 start 开始，时长 duration）
+            background_audio_path: 完整背景音路径
+            output_path: 输出视频路径
+            start: 窗口起点（秒）；copy_video 时应为关键帧时间，否则画面会与声音错位
+            duration: 窗口时长（秒）
+            voice_volume: 配音音量（0.0-1.0）
+            background_volume: 背景音音量（0.0-1.0）
+            copy_video: 视频流直接复制；为 False 时以 ultrafast 重新编码（起点不在关键帧时）
+            trace_id: 追踪ID
+
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            voice_db = 20 * (voice_volume - 1)
+            background_db = 20 * (background_volume - 1)
+            filtergraph = (
+                f"[2:a]volume={voice_db:.2f}dB[voice];"
+                f"[1:a]volume={background_db:.2f}dB[bg];"
+                f"[voice][bg]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout]"
+            )
+            if copy_video:
+                video_args = ['-c:v', 'copy']
+            else:
+                video_args = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '26', '-pix_fmt', 'yuv420p']
+
+            cmd = [
+                self.ffmpeg_path,
+                '-ss', f"{start:.3f}", '-t', f"{duration:.3f}", '-i', video_path,
+                '-ss', f"{start:.3f}", '-t', f"{duration:.3f}", '-i', background_audio_path,
+                '-i', voice_audio_path,
+                '-filter_complex', filtergraph,
+                '-map', '0:v:0',
+                '-map', '[aout]',
+                *video_args,
+                '-c:a', 'aac',
+                '-b:a', '128k',
+                '-movflags', '+faststart',
+                '-shortest',
+                '-y',
+                output_path
+            ]
+
+            logger.info(f"[{trace_id}] 预览渲染命令: {' '.join(cmd)}")
+            result = self._run_ffmpeg(cmd, duration, trace_id)
+
+            if result.returncode != 0:
+                logger.error(f"[{trace_id}] 预览渲染失败: {result.stderr}")
+                self._remove_partial_output(output_path)
+                return False, f"预览渲染失败: {result.stderr}"
+            if not os.path.exists(output_path):
+                return False, "输出文件未生成"
+            return True, ""
+
+        except OperationCancelled:
+            self._remove_partial_output(output_path)
+            return False, "任务已取消"
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"[{trace_id}] 预览渲染超时（{e.timeout:.0f}s）: {e.stderr}")
+            self._remove_partial_output(output_path)
+            return False, "预览渲染超时"
+        except Exception as e:
+            logger.error(f"[{trace_id}] 预览渲染失败: {e}", exc_info=True)
+            return False, f"预览渲染失败: {str(e)}"
+
+    def probe_audio_codec(self, path: str) -> Optional[str]:
+        """
+        获取文件第一条音轨的编码名（如 aac、mp3）
+
+        Returns:
+            编码名；没有音轨或探测失败返回 None
+        """
+        try:
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                 '-show_entries', 'stream=codec_name', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            codec = result.stdout.strip()
+            return codec or None
+        except (subprocess.TimeoutExpired, OSError) as e:
+            logger.warning(f"获取音频编码失败 {path}: {e}")
+            return None
+
+    def package_hls(
+        self,
+        video_path: str,
+        audio_renditions: List[Dict],
+        output_dir: str,
+        segment_seconds: int = 6,
+        trace_id: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """
+        打包为 fMP4 分片的 HLS：一路视频 + 多路可切换的音轨（如配音和原声）
+
+        视频流直接复制（不重新编码），各音轨作为同一 audio group 中的独立 rendition，
+        切换音轨无需重新封装视频。AAC 音轨直接复制，其他编码转为 AAC。
+
+        Args:
+            video_path: 提供视频流的文件（通常为最终合成视频）
+            audio_renditions: 音轨列表，每项为
+                {'path': 文件路径, 'name': 名称, 'language': BCP 47 语言代码, 'default': 是否默认}
+            output_dir: 输出目录，生成 master.m3u8 和每路流的子目录
+            segment_seconds: 分片时长（秒），实际按关键帧切分
+            trace_id: 追踪ID
+
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            if not audio_renditions:
+                return False, "没有可打包的音轨"
+            os.makedirs(output_dir, exist_ok=True)
+
+            inputs = [video_path]
+            maps = ['-map', '0:v:0']
+            codec_args = ['-c:v', 'copy']
+            stream_map = ['v:0,agroup:audio,name:video']
+            for index, rendition in enumerate(audio_renditions):
+                path = rendition['path']
+                if path not in inputs:
+                    inputs.append(path)
+                maps += ['-map', f"{inputs.index(path)}:a:0"]
+                if self.probe_audio_codec(path) == 'aac':
+                    codec_args += [f'-c:a:{index}', 'copy']
+                else:
+                    codec_args += [f'-c:a:{index}', 'aac', f'-b:a:{index}', '192k']
+                entry = f"a:{index},agroup:audio,name:{rendition['name']},language:{rendition.get('language', 'und')}"
+                if rendition.get('default'):
+                    entry += ',default:yes'
+                stream_map.append(entry)
+
+            cmd = [self.ffmpeg_path]
+            for path in inputs:
+                cmd += ['-i', path]
+            cmd += maps + codec_args + [
+                '-f', 'hls',
+                '-hls_time', str(segment_seconds),
+                '-hls_playlist_type', 'vod',
+                '-hls_segment_type', 'fmp4',
+                '-hls_flags', 'independent_segments',
+                '-hls_fmp4_init_filename', 'init.mp4',
+                '-hls_segment_filename', os.path.join(output_dir, '%v', 'seg_%05d.m4s'),
+                '-master_pl_name', 'master.m3u8',
+                '-var_stream_map', ' '.join(stream_map),
+                '-y',
+                os.path.join(output_dir, '%v', 'index.m3u8')
+            ]
+
+            logger.info(f"[{trace_id}] HLS 打包命令: {' '.join(cmd)}")
+            result = self._run_ffmpeg(cmd, probe_duration(video_path), trace_id)
+
+            if result.returncode != 0:
+                logger.error(f"[{trace_id}] HLS 打包失败: {result.stderr}")
+                return False, f"HLS 打包失败: {result.stderr}"
+            if not os.path.exists(os.path.join(output_dir, 'master.m3u8')):
+                return False, "主播放列表未生成"
+
+            logger.info(f"[{trace_id}] HLS 打包完成: {output_dir}（{len(audio_renditions)} 路音轨）")
+            return True, ""
+
+        except OperationCancelled:
+            logger.info(f"[{trace_id}] HLS 打包已取消")
+            return False, "任务已取消"
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"[{trace_id}] HLS 打包超时（{e.timeout:.0f}s）: {e.stderr}")
+            return False, "HLS 打包超时"
+        except Exception as e:
+            logger.error(f"[{trace_id}] HLS 打包失败: {e}", exc_info=True)
+            return False, f"HLS 打包失败: {str(e)}"
+
     def get_video_info(
         self,
         video_path: str,
@@ -200,12 +725,7 @@ class VideoProcessor:
                 output_audio_path
             ]
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
+            result = self._run_ffmpeg(cmd, probe_duration(video_path), trace_id)
 
             if result.returncode != 0:
                 return False, f"音频提取失败: {result.stderr}"
@@ -216,6 +736,10 @@ class VideoProcessor:
             logger.info(f"[{trace_id}] 音频提取成功: {output_audio_path}")
             return True, ""
 
+        except OperationCancelled:
+            logger.info(f"[{trace_id}] 音频提取已取消")
+            self._remove_partial_output(output_audio_path)
+            return False, "任务已取消"
         except Exception as e:
             logger.error(f"[{trace_id}] 音频提取失败: {e}")
             return False, str(e)
@@ -114,6 +114,27 @@ class SpeakerDiarizationTask(models.Model):
     def __str__(self):
         return f"Task {self.id} - {self.project.name} - {self.get_status_display()}"
 
+    @property
+    def progress_channel(self):
+        """进度推送频道ID"""
+        return f"diarization_{self.id}"
+
+    def progress_snapshot(self):
+        """进度快照（进度轮询接口和SSE推送共用的格式）"""
+        return {
+            'task_id': str(self.id),
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error_message': self.error_message
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # 保存后同步给本进程的SSE订阅者；任务归属由运行任务的 ProgressReporter 声明
+        from services.utils.progress_broker import progress_broker
+        progress_broker.notify(self.progress_channel, **self.progress_snapshot())
+
 
 class SpeakerProfile(models.Model):
     """说话人档案"""
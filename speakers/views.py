@@ -10,6 +10,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from .models import SpeakerDiarizationTask, SpeakerProfile
 from projects.models import Project
 from segments.models import Segment
@@ -20,6 +21,9 @@ from .serializers import (
     ApplySpeakersSerializer
 )
 from services.speaker_diarization.pipeline import process_speaker_diarization
+from services.utils.progress_broker import EventStreamRenderer, sse_response
+from services.utils.progress_reporter import ProgressReporter
+from services.utils.cancellation import cancellation_registry
 from backend.exceptions import ValidationError, handle_business_logic_error
 
 logger = logging.getLogger(__name__)
@@ -104,6 +108,11 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
 
     def _run_diarization_task(self, task_id, project_id, api_key):
         """在后台线程中执行说话人识别任务"""
+        # 取消令牌：取消接口触发，或由巡检线程发现其他进程写入的取消状态
+        cancel_token = cancellation_registry.create(
+            str(task_id),
+            source=lambda: SpeakerDiarizationTask.objects.filter(id=task_id, status='cancelled').exists()
+        )
         try:
             task = SpeakerDiarizationTask.objects.get(id=task_id)
             project = Project.objects.get(id=project_id)
@@ -126,11 +135,11 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
             # 获取segments
             segments = project.segments.all().order_by('index')
 
-            # 定义进度回调
+            # 定义进度回调（写入合并：进度实时推送，数据库按间隔批量写入）
+            reporter = ProgressReporter(task)
+
             def progress_callback(progress, msg):
-                task.progress = progress
-                task.message = msg
-                task.save(update_fields=['progress', 'message'])
+                reporter.update(progress=progress, message=msg)
                 logger.info(f"任务 {task_id} 进度: {progress}% - {msg}")
 
             # 执行Pipeline
@@ -139,10 +148,16 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
                 segments=segments,
                 output_dir=output_dir,
                 dashscope_api_key=api_key,
-                progress_callback=progress_callback
+                progress_callback=progress_callback,
+                cancel_token=cancel_token
             )
 
-            if result['success']:
+            if result.get('cancelled'):
+                # 已取消：状态由取消接口写入，不保存结果
+                reporter.flush()
+                logger.info(f"任务 {task_id} 已取消，停止执行")
+
+            elif result['success']:
                 # 保存结果到数据库
                 with transaction.atomic():
                     task.status = 'completed'
@@ -210,6 +225,8 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
                 task.save(update_fields=['status', 'error_message'])
             except Exception as save_error:
                 logger.error(f"保存任务错误状态失败: {str(save_error)}")
+        finally:
+            cancellation_registry.remove(str(task_id))
 
     @handle_business_logic_error
     @action(detail=True, methods=['get'])
@@ -224,6 +241,23 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
             'error_message': task.error_message if task.status == 'failed' else None
         })
 
+    @handle_business_logic_error
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def progress_stream(self, request, pk=None):
+        """
+        订阅任务进度（Server-Sent Events）
+
+        首帧推送完整快照（snapshot），之后只推送变化字段（delta），任务结束时推送 end 事件。
+        """
+        task = self.get_object()
+        task_pk = task.id
+
+        def load_snapshot():
+            current = SpeakerDiarizationTask.objects.filter(id=task_pk).first()
+            return current.progress_snapshot() if current else None
+
+        return sse_response(task.progress_channel, load_snapshot)
+
     def _apply_task_results(self, task):
         """
         内部方法：应用任务结果到项目
@@ -317,11 +351,12 @@ class SpeakerDiarizationTaskViewSet(viewsets.ModelViewSet):
         if task.status not in ['pending', 'running']:
             raise ValidationError("只能取消未完成的任务")
 
-        # 注意：由于使用Threading，无法真正停止线程
-        # 只能标记为cancelled，线程会继续执行但不会保存结果
+        # 标记为cancelled后触发取消令牌：Pipeline在下一个阶段/批次边界停止，不保存结果
+        # 任务不在本进程时，由任务所在进程的巡检线程发现取消状态
         task.status = 'cancelled'
         task.error_message = '用户取消'
         task.save(update_fields=['status', 'error_message'])
+        cancellation_registry.cancel(str(task.id))
 
         logger.info(f"任务 {task.id} 已被取消")
 
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system_monitor', '0003_systemconfig_cleanup_execution_time_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmonitor',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, help_text='媒体任务的输入参数', verbose_name='任务参数'),
+        ),
+        migrations.AddField(
+            model_name='taskmonitor',
+            name='result',
+            field=models.JSONField(blank=True, default=dict, help_text='媒体任务的输出（如文件URL）', verbose_name='任务结果'),
+        ),
+        migrations.AddField(
+            model_name='taskmonitor',
+            name='worker_id',
+            field=models.CharField(blank=True, help_text='认领该任务的媒体worker', max_length=100, verbose_name='执行进程'),
+        ),
+    ]
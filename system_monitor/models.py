@@ -154,6 +154,11 @@ class TaskMonitor(models.Model):
     current_segment_text = models.TextField(blank=True, verbose_name="当前处理段落")
     error_message = models.TextField(blank=True, verbose_name="错误信息")
 
+    # 媒体任务（音频拼接、视频合成、ASR识别）由独立的媒体worker进程执行
+    payload = models.JSONField(default=dict, blank=True, verbose_name="任务参数", help_text="媒体任务的输入参数")
+    result = models.JSONField(default=dict, blank=True, verbose_name="任务结果", help_text="媒体任务的输出（如文件URL）")
+    worker_id = models.CharField(max_length=100, blank=True, verbose_name="执行进程", help_text="认领该任务的媒体worker")
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
@@ -179,3 +184,30 @@ class TaskMonitor(models.Model):
             return 0
         end_time = self.end_time or timezone.now()
         return int((end_time - self.start_time).total_seconds())
+
+    @property
+    def progress_channel(self):
+        """进度推送频道ID"""
+        return self.task_id
+
+    def progress_snapshot(self):
+        """进度快照（进度轮询接口和SSE推送共用的格式）"""
+        return {
+            'status': self.status,
+            'total': self.total_segments,
+            'completed': self.completed_segments,
+            'failed': self.failed_segments,
+            'silent': self.silent_segments,
+            'current_segment_text': self.current_segment_text or '',
+            'current_step': self.current_step or '',
+            'estimated_time_remaining': 0,
+            'error_message': self.error_message or '',
+            'error_messages': [self.error_message] if self.error_message else [],
+            'result': self.result or {}
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # 保存后同步给本进程的SSE订阅者；任务归属由运行任务的 ProgressReporter 声明
+        from services.utils.progress_broker import progress_broker
+        progress_broker.notify(self.progress_channel, **self.progress_snapshot())
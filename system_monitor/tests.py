@@ -1,3 +1,80 @@
+import uuid
+
 from django.test import TestCase
 
-# Create your tests here.
+from services.utils.progress_broker import progress_broker
+from services.utils.progress_reporter import ProgressReporter
+
+from .models import TaskMonitor
+
+
+class ProgressReporterTests(TestCase):
+    """进度写入合并：计数变化只推送，状态迁移立即写库"""
+
+    def setUp(self):
+        self.task = TaskMonitor.objects.create(
+            task_id=f'test-{uuid.uuid4().hex}',
+            project_id=1,
+            project_name='测试项目',
+            status='running',
+            total_segments=10
+        )
+
+    def _stored(self):
+        return TaskMonitor.objects.get(pk=self.task.pk)
+
+    def test_counter_updates_are_coalesced(self):
+        reporter = ProgressReporter(self.task, flush_interval_ms=60000)
+        for _ in range(5):
+            reporter.increment('completed_segments')
+
+        self.assertEqual(reporter.updates, 5)
+        self.assertEqual(reporter.writes, 0)
+        self.assertEqual(self._stored().completed_segments, 0)
+        # 未写库的进度已推送给本进程的订阅者
+        self.assertEqual(progress_broker.get_snapshot(self.task.progress_channel)['completed'], 5)
+
+        reporter.flush()
+        self.assertEqual(reporter.writes, 1)
+        self.assertEqual(self._stored().completed_segments, 5)
+
+    def test_unchanged_update_is_skipped(self):
+        reporter = ProgressReporter(self.task, flush_interval_ms=0)
+        reporter.update(completed_segments=0)
+        self.assertEqual(reporter.writes, 0)
+
+    def test_status_change_is_written_immediately(self):
+        reporter = ProgressReporter(self.task, flush_interval_ms=60000)
+        reporter.update(completed_segments=3)
+        reporter.update(status='failed', error_message='失败')
+
+        self.assertEqual(reporter.writes, 1)
+        stored = self._stored()
+        self.assertEqual(stored.status, 'failed')
+        # 之前合并的计数随状态一起写入
+        self.assertEqual(stored.completed_segments, 3)
+
+    def test_context_manager_flushes(self):
+        with ProgressReporter(self.task, flush_interval_ms=60000) as reporter:
+            reporter.update(current_step='翻译')
+        self.assertEqual(self._stored().current_step, '翻译')
+
+    def test_finish_with_expected_status(self):
+        reporter = ProgressReporter(self.task, flush_interval_ms=60000)
+        reporter.increment('completed_segments', 10)
+
+        self.assertTrue(reporter.finish('completed', expected_status='running', current_step='完成'))
+        stored = self._stored()
+        self.assertEqual(stored.status, 'completed')
+        self.assertEqual(stored.completed_segments, 10)
+        self.assertEqual(stored.current_step, '完成')
+
+    def test_finish_does_not_overwrite_cancelled(self):
+        reporter = ProgressReporter(self.task, flush_interval_ms=60000)
+        reporter.increment('completed_segments')
+        # 取消接口在另一个进程中写入了 cancelled
+        TaskMonitor.objects.filter(pk=self.task.pk).update(status='cancelled')
+
+        self.assertFalse(reporter.finish('completed', expected_status='running'))
+        self.assertEqual(self._stored().status, 'cancelled')
+        self.assertEqual(self.task.status, 'cancelled')